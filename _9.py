@@ -1,16 +1,117 @@
 from openpyxl import load_workbook
+from openpyxl.utils.cell import coordinate_from_string
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import parse_xml
+from docx.oxml import parse_xml, OxmlElement
 from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.table import Table, _Cell
+from lxml import etree
+from profiling import PipelineReport, OperationCounter, DeepProfiler, PROFILE_MODES, report_stage, report_progress, default_report_path, default_profile_dir
 import sys
 import traceback
 import os
 import re
+import copy
+import itertools
+import io
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import platform
 
+# 预编译的 XPath 表达式
+# 元素的 .xpath('...') 每次调用都会重新编译表达式，逐行、逐单元格的热点路径统一使用这里
+# 预编译并绑定 WordprocessingML 命名空间的表达式。带 $变量 的表达式在调用时传入参数，
+# 例如 XPATH['tr_at'](tbl, n=3)。
+W_NAMESPACES = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+
+def compile_xpath(expression):
+    """编译绑定了 w 命名空间的 XPath 表达式"""
+    return etree.XPath(expression, namespaces=W_NAMESPACES)
+
+XPATH = {name: compile_xpath(expression) for name, expression in {
+    'tblGrid': 'w:tblGrid',
+    'trPr': 'w:trPr',
+    'tcPr': 'w:tcPr',
+    'vAlign': 'w:vAlign',
+    'tr_at': './w:tr[$n]',
+    'numPr': './/w:numPr',
+    'pPr': './/w:pPr',
+    'rPr': './/w:rPr',
+    'b': './/w:b',
+    'numPr_bold': './/w:numPr//w:rPr//w:b',
+    'next_table': 'following-sibling::w:tbl[1]',
+    'paragraph_containing': '//w:p[contains(., $text)]',
+    'following_siblings_3': 'following-sibling::*[position()<=3]',
+    'preceding_siblings': 'preceding-sibling::*',
+    'following_siblings': 'following-sibling::*',
+}.items()}
+
+# 分级日志
+# log_status 仍可像以前一样直接调用 log_status(message)（INFO 级），也可以按级别调用，
+# 例如 log_status.debug("单元格 %s 的原始值: %s", coordinate, value)。消息只在该级别启用时
+# 才会格式化；需要额外计算的消息可以传入无参函数（log_status.debug(lambda: ...)），
+# 整段调试输出则先用 log_status.is_enabled(DEBUG) 判断。所有输出都经由 status_callback。
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+QUIET = 50  # 生产环境静默级别：不输出任何消息
+LOG_LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR, 'QUIET': QUIET}
+DEFAULT_LOG_LEVEL = os.environ.get('YASHIDU_LOG_LEVEL', 'INFO')
+
+def parse_log_level(level):
+    """将级别名称（如 'DEBUG'）或数值转换为数值级别"""
+    if level is None:
+        level = DEFAULT_LOG_LEVEL
+    if isinstance(level, str):
+        return LOG_LEVELS.get(level.strip().upper(), INFO)
+    return int(level)
+
+class StatusLogger:
+    """带级别的状态日志，输出经由 status_callback（未提供时使用 print）"""
+
+    def __init__(self, status_callback=None, level=None):
+        self.status_callback = status_callback or print
+        self.level = parse_log_level(level)
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        if level < self.level:
+            return
+        if callable(message):
+            message = message()
+        elif args:
+            message = message % args
+        self.status_callback(message)
+
+    def __call__(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+def as_status_logger(log_status=None, level=None):
+    """将普通回调（或 None）包装为 StatusLogger，已是 StatusLogger 时原样返回"""
+    if isinstance(log_status, StatusLogger):
+        return log_status
+    return StatusLogger(log_status, level)
+
 # 平台检测
 IS_WINDOWS = platform.system() == 'Windows'
 # 尝试导入pywin32，但不强制要求
@@ -22,6 +123,84 @@ if IS_WINDOWS:
         print("警告：未安装pywin32，Excel COM功能将不可用")
         pass
 
+class TemplateCache:
+    """按文件内容缓存解析好的 Word 模板，每次取出一份深拷贝供本次任务修改
+
+    同一份模板重复上传（路径不同、内容相同）时省去解压和 XML 解析；只保留最近使用的 max_entries 份。
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, word_path, key=None):
+        """word_path 可以是路径、二进制流或 bytes
+
+        key 为调用方已知的内容标识（例如已注册模板的摘要）时直接按 key 查找，命中时不再读取文件。
+        """
+        if key is not None:
+            with self._lock:
+                doc = self._entries.get(key)
+                if doc is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(doc)
+        if isinstance(word_path, bytes):
+            data = word_path
+        elif is_file_like(word_path):
+            word_path.seek(0)
+            data = word_path.read()
+        else:
+            with open(word_path, 'rb') as f:
+                data = f.read()
+        if key is None:
+            key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            doc = self._entries.get(key)
+            if doc is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if doc is None:
+            doc = Document(io.BytesIO(data))
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = doc
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return copy.deepcopy(doc)
+
+def is_file_like(target):
+    """判断输入/输出是二进制流（BytesIO、SpooledTemporaryFile 等）还是文件路径"""
+    return hasattr(target, 'read') or hasattr(target, 'write')
+
+
+def describe_target(target):
+    """日志中显示的文件名：路径原样返回，流显示为内存缓冲区"""
+    if isinstance(target, bytes) or is_file_like(target):
+        return getattr(target, 'name', None) or "<内存缓冲区>"
+    return target
+
+
+def open_docx(source):
+    """从路径或二进制流打开 docx，流总是从头读取"""
+    if is_file_like(source):
+        source.seek(0)
+    return Document(source)
+
+
+def save_docx(doc, target):
+    """保存到路径或二进制流（流先清空再写入），返回写入的字节数"""
+    if is_file_like(target):
+        target.seek(0)
+        target.truncate()
+        doc.save(target)
+        return target.tell()
+    doc.save(target)
+    return os.path.getsize(target)
+
 # 获取附表1的字体格式
 def get_heading_format(doc, heading):
     for para in doc.paragraphs:
@@ -29,6 +208,76 @@ def get_heading_format(doc, heading):
             return para.runs[0].font.name, para.runs[0].font.size, para.runs[0].bold
     return None, None, None  # Return None if not found
 
+def compile_template(doc):
+    """预编译模板：定位附表1标题段落和其下的表格，记录备注行位置和标题字体，并检查报告锚点
+
+    返回可序列化为 JSON 的字典，位置按正文子元素的下标记录；模板缺少附表1段落或其下的表格时抛出异常。
+    """
+    children = list(doc.element.body.iterchildren())
+    heading_index = table_index = None
+    for index, child in enumerate(children):
+        if child.tag == qn('w:p') and Paragraph(child, doc._body).text.startswith("附表1"):
+            following = XPATH['next_table'](child)
+            if following:
+                heading_index, table_index = index, children.index(following[0])
+                break
+    if heading_index is None:
+        raise ValueError("模板中未找到附表1段落或其下方的表格")
+
+    source_table = Table(children[table_index], doc._body)
+    if len(source_table.rows) < 2:
+        raise ValueError("附表1表格至少需要表头行和一行数据行")
+    remark_row_index = next((r_idx for r_idx, row in enumerate(source_table.rows)
+                             if len(row.cells) > 0 and "备注" in row.cells[0].text), None)
+    font_name, font_size, bold = get_heading_format(doc, "附表1")
+    anchors = build_anchor_index(doc)
+    warnings = []
+    if remark_row_index is None:
+        warnings.append("附表1表格中未找到备注行")
+    if ANCHOR_TABLE2_TITLE not in anchors:
+        warnings.append("未找到表2标题段落，汇总表不会更新")
+    if ANCHOR_CONCLUSION not in anchors:
+        warnings.append("未找到结论段落锚点，结论段落不会生成")
+    return {
+        'appendix_heading_index': heading_index,
+        'appendix_table_index': table_index,
+        'appendix_heading_text': Paragraph(children[heading_index], doc._body).text,
+        'remark_row_index': remark_row_index,
+        'heading_font': {'name': font_name, 'size_pt': font_size.pt if font_size is not None else None, 'bold': bold},
+        'warnings': warnings,
+    }
+
+
+def compiled_heading_format(compiled_template):
+    """预编译的附表1标题字体，返回值与 get_heading_format 相同"""
+    font = compiled_template['heading_font']
+    return font['name'], Pt(font['size_pt']) if font['size_pt'] is not None else None, font['bold']
+
+
+def locate_compiled_appendix(doc, compiled_template):
+    """按预编译的位置取出附表1标题段落和表格；位置已不符合时返回 None，由调用方重新查找
+
+    只检查两个位置上的元素类型和标题文本，不重新扫描正文：生成的附表都插入在附表1之后，
+    附表1之前的正文在生成过程中保持不变。
+    """
+    if not compiled_template:
+        return None
+    body = doc.element.body
+    heading_index = compiled_template['appendix_heading_index']
+    table_index = compiled_template['appendix_table_index']
+    if table_index >= len(body):
+        return None
+    heading, table = body[heading_index], body[table_index]
+    if heading.tag != qn('w:p') or table.tag != qn('w:tbl'):
+        return None
+    # 标题和表格之间不能再有其他表格，标题文本与预编译时一致
+    if any(child.tag == qn('w:tbl') for child in body[heading_index + 1:table_index]):
+        return None
+    paragraph = Paragraph(heading, doc._body)
+    if paragraph.text != compiled_template['appendix_heading_text']:
+        return None
+    return paragraph, Table(table, doc._body)
+
 def get_cell_display_value(cell):
     if cell.value is None:
         return ""  # 如果单元格为空，返回空字符串
@@ -48,6 +297,7 @@ def get_cell_display_value(cell):
 
 def copy_table_with_xml(source_table, target_table, log_status):
     """通过XML复制表格，确保格式完全一致"""
+    log_status = as_status_logger(log_status)
     try:
         log_status(f"开始XML复制表格，源表格行数: {len(source_table.rows)}, 目标表格行数: {len(target_table.rows)}")
         
@@ -77,11 +327,12 @@ def copy_table_with_xml(source_table, target_table, log_status):
         log_status("XML复制完成")
         
     except Exception as e:
-        log_status(f"XML复制表格时出错: {e}")
+        log_status.error(f"XML复制表格时出错: {e}")
         traceback.print_exc()
 
 def copy_table_with_clone(source_table, target_table, log_status):
     """通过克隆复制表格"""
+    log_status = as_status_logger(log_status)
     try:
         log_status("开始克隆复制表格")
         
@@ -107,11 +358,12 @@ def copy_table_with_clone(source_table, target_table, log_status):
         log_status("克隆复制完成")
         
     except Exception as e:
-        log_status(f"克隆复制表格时出错: {e}")
+        log_status.error(f"克隆复制表格时出错: {e}")
         traceback.print_exc()
 
 def copy_table_with_deep_copy(source_table, target_table, log_status):
     """深度复制表格"""
+    log_status = as_status_logger(log_status)
     try:
         log_status("开始深度复制表格")
         
@@ -126,9 +378,9 @@ def copy_table_with_deep_copy(source_table, target_table, log_status):
                 target_table._element.tblPr = source_table._element.tblPr
             
             # 复制表格网格
-            source_tblGrid = source_table._element.xpath('w:tblGrid')
+            source_tblGrid = XPATH['tblGrid'](source_table._element)
             if source_tblGrid:
-                target_tblGrid = target_table._element.xpath('w:tblGrid')
+                target_tblGrid = XPATH['tblGrid'](target_table._element)
                 if not target_tblGrid:
                     target_table._element.append(source_tblGrid[0])
                 else:
@@ -142,9 +394,9 @@ def copy_table_with_deep_copy(source_table, target_table, log_status):
                 
                 # 复制行属性
                 if hasattr(source_row, '_element') and hasattr(target_row, '_element'):
-                    source_trPr = source_row._element.xpath('w:trPr')
+                    source_trPr = XPATH['trPr'](source_row._element)
                     if source_trPr:
-                        target_trPr = target_row._element.xpath('w:trPr')
+                        target_trPr = XPATH['trPr'](target_row._element)
                         if not target_trPr:
                             target_row._element.insert(0, source_trPr[0])
                         else:
@@ -158,9 +410,9 @@ def copy_table_with_deep_copy(source_table, target_table, log_status):
                         
                         # 复制单元格属性
                         if hasattr(source_cell, '_element') and hasattr(target_cell, '_element'):
-                            source_tcPr = source_cell._element.xpath('w:tcPr')
+                            source_tcPr = XPATH['tcPr'](source_cell._element)
                             if source_tcPr:
-                                target_tcPr = target_cell._element.xpath('w:tcPr')
+                                target_tcPr = XPATH['tcPr'](target_cell._element)
                                 if not target_tcPr:
                                     target_cell._element.insert(0, source_tcPr[0])
                                 else:
@@ -169,7 +421,7 @@ def copy_table_with_deep_copy(source_table, target_table, log_status):
                         # 强制设置第三行的水平垂直居中对齐
                         if row_idx == 2:  # 第三行（索引为2）
                             if hasattr(target_cell, '_element'):
-                                tcPr = target_cell._element.xpath('w:tcPr')
+                                tcPr = XPATH['tcPr'](target_cell._element)
                                 if tcPr:
                                     vAlign = parse_xml('<w:vAlign xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:val="center"/>')
                                     tcPr[0].append(vAlign)
@@ -182,7 +434,7 @@ def copy_table_with_deep_copy(source_table, target_table, log_status):
         log_status("深度复制完成")
         
     except Exception as e:
-        log_status(f"深度复制表格时出错: {e}")
+        log_status.error(f"深度复制表格时出错: {e}")
         traceback.print_exc()
 
 def should_refresh_via_excel(excel_path, table_ranges, col_range, all_data):
@@ -206,6 +458,7 @@ def should_refresh_via_excel(excel_path, table_ranges, col_range, all_data):
         return False
 
 def refresh_excel_values_via_com(excel_file_path, log_status):
+    log_status = as_status_logger(log_status)
     # 首先检查是否在Windows环境中并且win32com可用
     if not IS_WINDOWS or win32com is None:
         log_status(f"提示：当前环境不支持Excel COM功能（{'非Windows环境' if not IS_WINDOWS else '未安装pywin32'}），跳过自动刷新。")
@@ -233,7 +486,7 @@ def refresh_excel_values_via_com(excel_file_path, log_status):
         log_status("已通过 Excel 触发公式重算并保存。")
         return True
     except Exception as e:
-        log_status(f"通过 Excel 触发重算失败: {e}")
+        log_status.error(f"通过 Excel 触发重算失败: {e}")
         return False
 
 def format_date(english_date_str):
@@ -244,24 +497,143 @@ def format_date(english_date_str):
         return f"{year}年{month}月{day}日"
     return english_date_str  # 如果格式不匹配，返回原字符串
 
-def process_remark_for_single_table(doc, ws, excel_path, target_table, original_section_index, actual_target_heading_text, log_status):
-    # wb = load_workbook(excel_path, data_only=True) # 每次调用时重新加载
-    # ws = wb.active
-    
-    row_base = 8  # 起始行号
-    row_increment = 24  # 每隔 24 行递增
-    s_row_base = 4  # S 列起始行号
-    
-    # 根据 original_section_index 计算对应的 Excel 行号
-    current_row = row_base + original_section_index * row_increment  # 计算当前表格对应的行号
-    s_cell_row = s_row_base + original_section_index * row_increment  # 计算 S 列的行号
-
-    s_value_cell = f"S{s_cell_row}"  # 如 S4, S28 等
-    c_value_cell = f"C{current_row}"  # 如 C8, C32 等
-    k_value_cell = f"K{current_row}"  # 如 K8, K32 等
-    c_value = get_cell_display_value(ws[c_value_cell])
-    k_value = get_cell_display_value(ws[k_value_cell])
+def read_remark_values(ws, section_index):
+    """读取备注所需的单元格：最大干密度 C8、最佳含水率 K8、检测日期 S4（按数据组每 24 行递增）"""
+    row_offset = section_index * 24
+    return {
+        'density': get_cell_display_value(ws[f"C{8 + row_offset}"]),
+        'moisture': get_cell_display_value(ws[f"K{8 + row_offset}"]),
+        'date': get_cell_display_value(ws[f"S{4 + row_offset}"]),
+    }
+
+# 模板备注中的示例文本。编译备注模板时这些示例值被替换为占位符：
+# density/moisture 只在同时含有"最大干密度："和"最佳含水率："时替换，date 经 format_date 转换。
+REMARK_DENSITY_SAMPLE = "最大干密度：1.48g/cm3"
+REMARK_MOISTURE_SAMPLE = "最佳含水率：14.4%"
+REMARK_DATE_SAMPLE = "检测日期：2024年7月1日；检测方法：灌砂法"
+REMARK_SLOT_MARK = "\0"  # 编译时分隔占位符名称的标记
+
+# 按备注模板渲染的段落带有这个 w14:textId（Word 2010 的可忽略属性），g/cm3 上标后处理据此跳过该段落并去掉标记
+REMARK_RENDERED_ATTR = qn('w14:textId')
+REMARK_RENDERED_MARK = '0A5D1C03'
+
+REMARK_TEMPLATE_CACHE_SIZE = 32  # 备注模板缓存只保留最近使用的这么多份
+_remark_template_cache = OrderedDict()  # (备注文本, 段落属性, run 属性) -> 编译结果
+_remark_template_lock = threading.Lock()
+
+def compile_remark_template(remark_tc):
+    """将模板备注单元格编译为格式化的原型 run
+
+    段落属性和 run 属性从模板单元格第一个段落及其第一个 run 深拷贝，普通文本 run 内含占位符，
+    g/cm3 拆为 'g/cm' 和上标 '3'。
+    """
+    source_p = remark_tc.p_lst[0] if remark_tc.p_lst else None
+    p_pr = source_p.pPr if source_p is not None else None
+    r_pr = source_p.r_lst[0].rPr if source_p is not None and source_p.r_lst else None
+    remark_text = "\n".join(Paragraph(p, None).text for p in remark_tc.p_lst)
+    cache_key = (remark_text,
+                 etree.tostring(p_pr) if p_pr is not None else None,
+                 etree.tostring(r_pr) if r_pr is not None else None)
+    with _remark_template_lock:
+        template = _remark_template_cache.get(cache_key)
+        if template is not None:
+            _remark_template_cache.move_to_end(cache_key)
+            return template
+    mark = REMARK_SLOT_MARK
+    pattern = remark_text
+    if "最大干密度：" in pattern and "最佳含水率：" in pattern:
+        pattern = pattern.replace(REMARK_DENSITY_SAMPLE, f"最大干密度：{mark}density{mark}g/cm3")
+        pattern = pattern.replace(REMARK_MOISTURE_SAMPLE, f"最佳含水率：{mark}moisture{mark}%")
+    has_date = REMARK_DATE_SAMPLE in pattern
+    if has_date:
+        pattern = pattern.replace(REMARK_DATE_SAMPLE, f"检测日期：{mark}date{mark}；检测方法：灌砂法")
+
+    prototype = Paragraph(OxmlElement('w:p'), None)
+
+    def add_run(text=None):
+        # 每个 run 都以模板单元格的 run 属性为基础
+        run = prototype.add_run()
+        if r_pr is not None:
+            run._r.insert(0, copy.deepcopy(r_pr))
+        if text:
+            run.text = text
+        return run
+
+    pieces = []  # 每个 run 的 [(固定文本, 占位符名称)]，None 表示该 run 文本固定
+    parts = pattern.split('g/cm3')
+    for i, part in enumerate(parts):
+        if part:
+            segments = part.split(mark)
+            run_pieces = [(text, None) if idx % 2 == 0 else (None, text) for idx, text in enumerate(segments)]
+            if len(segments) > 1:
+                add_run()
+                pieces.append(run_pieces)
+            else:
+                add_run(part)
+                pieces.append(None)
+        if i < len(parts) - 1:
+            cm_run = add_run('g/cm')
+            cm_run.font.name = "Times New Roman"
+            cm_run.font.size = None
+            superscript_run = add_run('3')
+            superscript_run.font.name = "Times New Roman"
+            superscript_run.font.size = None
+            superscript_run.font.superscript = True
+            pieces.extend([None, None])
+    template = {
+        'pPr': copy.deepcopy(p_pr) if p_pr is not None else None,
+        'runs': list(prototype._p.r_lst),
+        'pieces': pieces,
+        'has_date': has_date,
+    }
+    with _remark_template_lock:
+        _remark_template_cache[cache_key] = template
+        while len(_remark_template_cache) > REMARK_TEMPLATE_CACHE_SIZE:
+            _remark_template_cache.popitem(last=False)
+    return template
+
+def render_remark_template(template, tc, values):
+    """用备注模板重写单元格 tc 的内容，返回渲染后的文本"""
+    tc.clear_content()
+    p = tc.add_p()
+    if template['pPr'] is not None:
+        p.insert(0, copy.deepcopy(template['pPr']))
+    p.set(REMARK_RENDERED_ATTR, REMARK_RENDERED_MARK)
+    texts = []
+    for r, run_pieces in zip(template['runs'], template['pieces']):
+        new_r = copy.deepcopy(r)
+        if run_pieces is not None:
+            new_r.text = "".join(text if slot_name is None else values[slot_name] for text, slot_name in run_pieces)
+        texts.append(new_r.text)
+        p.append(new_r)
+    return "".join(texts)
+
+def render_remark_row(remark_tr, table, remark_values, actual_target_heading_text, log_status, template=None):
+    """把 remark_values 渲染到备注行第二列；remark_tr 是模板中备注行对应的 w:tr
+
+    template 为编译好的备注模板，未提供时按单元格当前文本编译（结果会缓存）。
+    """
+    log_status = as_status_logger(log_status)
+    if len(remark_tr.tc_lst) < 2:
+        log_status.error(f"错误：{actual_target_heading_text} 的备注行没有第二列")
+        return
+    remark_tc = remark_tr.tc_lst[1]
+    if template is None:
+        template = compile_remark_template(remark_tc)
+    if not template['has_date']:
+        log_status.warning(f"警告：在 {actual_target_heading_text} 的备注文本中未找到指定的日期文本")
     
+    values = {
+        'density': str(remark_values['density']),
+        'moisture': str(remark_values['moisture']),
+        'date': format_date(remark_values['date']),
+    }
+    new_remark_text = render_remark_template(template, remark_tc, values)
+    log_status(f"{actual_target_heading_text} 的替换后备注文本: {new_remark_text}")
+
+def process_remark_for_single_table(doc, ws, excel_path, target_table, original_section_index, actual_target_heading_text, log_status):
+    """从工作表读取备注数据并渲染到表格中第一列为"备注"的行（独立调用时使用）"""
+    log_status = as_status_logger(log_status)
     # 查找第一列最后一行标题为"备注"的单元格
     remark_row = None
     for row in target_table.rows:
@@ -270,96 +642,154 @@ def process_remark_for_single_table(doc, ws, excel_path, target_table, original_
             break
     
     if not remark_row:
-        log_status(f"错误：未找到 {actual_target_heading_text} 中的'备注'行")
-        return
-    
-    if len(remark_row.cells) < 2:
-        log_status(f"错误：{actual_target_heading_text} 的备注行没有第二列")
+        log_status.error(f"错误：未找到 {actual_target_heading_text} 中的'备注'行")
         return
     
-    remark_text = remark_row.cells[1].text
-    log_status(f"{actual_target_heading_text} 的原始备注文本: {remark_text}")
-    
-    new_remark_text = remark_text  # 初始化
-    
-    if "最大干密度：" in remark_text and "最佳含水率：" in remark_text:
-        new_remark_text = remark_text.replace(
-            "最大干密度：1.48g/cm3",
-            f"最大干密度：{c_value}g/cm3"
-        ).replace(
-            "最佳含水率：14.4%",
-            f"最佳含水率：{k_value}%"
-        )
-    
-    # 执行日期替换逻辑
-    s_value = get_cell_display_value(ws[s_value_cell])
-    formatted_date = format_date(s_value)
-    
-    if "检测日期：2024年7月1日；检测方法：灌砂法" in remark_text:
-        log_status(f"确认找到文本：{remark_text}")
-        new_remark_text = new_remark_text.replace(
-            "检测日期：2024年7月1日；检测方法：灌砂法",
-            f"检测日期：{formatted_date}；检测方法：灌砂法"
-        )
-    else:
-        log_status(f"警告：在 {actual_target_heading_text} 的备注文本中未找到指定的日期文本")
-    
-    remark_row.cells[1].text = new_remark_text
-    log_status(f"{actual_target_heading_text} 的替换后备注文本: {new_remark_text}")
-
-def group_sections_for_merging(all_sections_data, log_status):
-    """根据比较值对相邻的表格部分进行分组以进行合并。"""
+    render_remark_row(remark_row._tr, target_table, read_remark_values(ws, original_section_index), actual_target_heading_text, log_status)
+
+# 合并比较的单元格（相对每个数据组首行的位置，与 Excel 模板第一组的坐标一致）
+DEFAULT_MERGE_KEYS = ('B3', 'B4', 'B5', 'L3', 'L5', 'P5', 'T5', 'S4')
+# adjacent: 只合并比较值相同的相邻数据组；global: 比较值相同的数据组不论是否相邻都合并
+MERGE_MODES = ('adjacent', 'global')
+
+
+def parse_merge_keys(merge_keys):
+    """把逗号分隔的字符串或序列转为单元格坐标元组，空值返回默认比较单元格"""
+    if not merge_keys:
+        return DEFAULT_MERGE_KEYS
+    if isinstance(merge_keys, str):
+        merge_keys = merge_keys.split(',')
+    keys = tuple(key.strip().upper() for key in merge_keys if key.strip())
+    for key in keys:
+        coordinate_from_string(key)  # 非法坐标在这里抛出 ValueError
+    return keys or DEFAULT_MERGE_KEYS
+
+
+def read_comparison_values(ws, row_offset, merge_keys=DEFAULT_MERGE_KEYS):
+    """读取一个数据组的比较单元格，返回 (比较值字典, 可哈希的合并键)"""
+    comparison_values = {}
+    for key in merge_keys:
+        column, row = coordinate_from_string(key)
+        comparison_values[key] = get_cell_display_value(ws[f"{column}{row + row_offset}"])
+    return comparison_values, tuple(comparison_values[key] for key in merge_keys)
+
+
+def group_sections_for_merging(all_sections_data, log_status, mode='adjacent', max_rows_per_table=None):
+    """根据合并键对表格部分进行分组以进行合并。
+
+    每个数据组的 merge_key 在读取时已算好，分组只做一次线性扫描（global 模式用字典分桶，
+    按首次出现的顺序输出）；max_rows_per_table 限制每组的数据行数，超出时另起一组。
+    """
+    log_status = as_status_logger(log_status)
+    if mode not in MERGE_MODES:
+        raise ValueError(f"未知的合并模式: {mode}")
     grouped_sections = []
     if not all_sections_data: # 处理空数据情况
         return grouped_sections
 
-    current_group = [all_sections_data[0]]
-
-    for i in range(1, len(all_sections_data)):
-        prev_section = all_sections_data[i-1]
-        current_section = all_sections_data[i]
-
-        # 比较所有指定的 Excel 单元格值
-        should_merge = True
-        for key in prev_section['comparison_values']:
-            if prev_section['comparison_values'][key] != current_section['comparison_values'][key]:
-                should_merge = False
-                break
-        
-        if should_merge:
-            log_status(f"发现相邻表格附表{prev_section['section_index']+1}和附表{current_section['section_index']+1}数据内容一致，进行合并。")
-            current_group.append(current_section)
-        else:
-            grouped_sections.append(current_group)
-            current_group = [current_section]
-    
-    grouped_sections.append(current_group) # 添加最后一组
+    if mode == 'global':
+        buckets = {}
+        for section in all_sections_data:
+            bucket = buckets.get(section['merge_key'])
+            if bucket is None:
+                buckets[section['merge_key']] = [section]
+                continue
+            log_status(f"发现附表{bucket[0]['section_index']+1}和附表{section['section_index']+1}数据内容一致，进行合并。")
+            bucket.append(section)
+        candidate_groups = list(buckets.values())
+    else:
+        candidate_groups = []
+        previous_key = object()
+        for section in all_sections_data:
+            if section['merge_key'] == previous_key:
+                log_status(f"发现相邻表格附表{candidate_groups[-1][-1]['section_index']+1}和附表{section['section_index']+1}数据内容一致，进行合并。")
+                candidate_groups[-1].append(section)
+            else:
+                candidate_groups.append([section])
+            previous_key = section['merge_key']
+
+    if not max_rows_per_table:
+        return candidate_groups
+
+    # 按行数上限拆分；单个数据组超过上限时独占一组
+    for group in candidate_groups:
+        current_group = []
+        current_rows = 0
+        for section in group:
+            section_rows = len(section['section_data'])
+            if current_group and current_rows + section_rows > max_rows_per_table:
+                log_status(f"附表{current_group[0]['section_index']+1}所在分组达到每表 {max_rows_per_table} 行上限，附表{section['section_index']+1}另起一组。")
+                grouped_sections.append(current_group)
+                current_group = []
+                current_rows = 0
+            current_group.append(section)
+            current_rows += section_rows
+        grouped_sections.append(current_group)
     return grouped_sections
 
 # 修改 run_excel_to_word_automation 函数以支持多个工作表
-def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_path, status_callback=None):
-    def log_status(message):
-        if status_callback:
-            status_callback(message)
-        else:
-            print(message)
+def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_path, status_callback=None, log_level=None,
+                                 report=None, report_path=None, trace_memory=False, count_operations=False,
+                                 profile=None, profile_dir=None, merge_mode='adjacent', merge_keys=None,
+                                 max_rows_per_table=None, template_cache=None, compiled_template=None):
+    """生成压实度报告，返回分阶段的 PipelineReport
+
+    report_path 为 True 时把报告 JSON 写在输出文件旁边，为字符串时写到该路径；
+    trace_memory 为 True 时额外记录各阶段的 tracemalloc 内存峰值；
+    count_operations 为 True 时统计 python-docx/lxml 热点操作并输出调用次数最多的位置；
+    profile 为 'deterministic' 或 'sampling' 时对本次任务做函数级剖析，产物（pstats、火焰图 JSON、
+    摘要和阶段报告）写入 profile_dir，任务失败时同样写出。
+    merge_mode、merge_keys、max_rows_per_table 控制附表合并，见 group_sections_for_merging；
+    传入 template_cache（TemplateCache）时模板从缓存取深拷贝，不再每次解析；
+    compiled_template 为 compile_template 的结果（已注册模板），其中的 sha256 用作模板缓存的键，
+    附表1段落和表格按预编译的位置直接取出，位置不符时仍按原方式查找。
+    excel_path、word_path 和 new_word_path 也可以是二进制流：此时全程不落盘，
+    中间保存和重新加载都在输出流上进行（不再写 .temp/.before/.after 文件），
+    report_path 和 profile_dir 需要显式给出路径。
+    """
+    log_status = as_status_logger(status_callback, log_level)
+    merge_keys = parse_merge_keys(merge_keys)
+    if report is None:
+        report = PipelineReport(trace_memory=trace_memory)
+
+    def finish_report():
+        report.finish()
+        log_status("各阶段耗时:\n" + report.format_table())
+        if operation_counter is not None:
+            log_status("热点操作:\n" + operation_counter.format_top())
+        if report_path:
+            if report_path is True and in_memory:
+                log_status.warning("输出为内存缓冲区，未指定阶段报告路径，跳过保存阶段报告")
+                return report
+            json_path = default_report_path(new_word_path) if report_path is True else report_path
+            report.write_json(json_path)
+            log_status(f"阶段报告已保存到: {json_path}")
+        return report
+
+    in_memory = is_file_like(new_word_path)
 
     log_status("开始执行 Excel 到 Word 自动化，支持多个工作表。")
-    log_status(f"Excel 文件路径: {excel_path}")
-    log_status(f"Word 模板路径: {word_path}")
+    log_status(f"Excel 文件路径: {describe_target(excel_path)}")
+    log_status(f"Word 模板路径: {describe_target(word_path)}")
     log_status(f"复制次数: {copy_count}")
-    log_status(f"输出 Word 文件路径: {new_word_path}")
+    log_status(f"输出 Word 文件路径: {describe_target(new_word_path)}")
 
-    # 验证文件存在
-    if not os.path.exists(excel_path):
+    # 验证文件存在（传入流时跳过）
+    if not is_file_like(excel_path) and not os.path.exists(excel_path):
         raise FileNotFoundError(f"错误：Excel文件不存在 - {excel_path}")
-    if not os.path.exists(word_path):
+    if not is_file_like(word_path) and not os.path.exists(word_path):
         raise FileNotFoundError(f"错误：Word文件不存在 - {word_path}")
 
+    operation_counter = OperationCounter(report, xpath_registry=XPATH).install() if count_operations else None
+    profiler = DeepProfiler(profile).start() if profile else None
     try:
-        wb = load_workbook(excel_path, data_only=True)  # 加载整个工作簿
-        doc = Document(word_path)
-        log_status(f"文档初始表格数量: {len(doc.tables)}")
+        with report.stage('workbook_load'):
+            wb = load_workbook(excel_path, data_only=True)  # 加载整个工作簿
+            if template_cache is not None:
+                doc = template_cache.load(word_path, key=(compiled_template or {}).get('sha256'))
+            else:
+                doc = open_docx(word_path)
+            log_status(f"文档初始表格数量: {len(doc.tables)}")
 
         # 定义初始行和列范围
         start_row = 7
@@ -373,107 +803,112 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
 
         # 新增：遍历所有工作表
         sheets = wb.sheetnames  # 获取所有工作表名称
+        report.set_count('sheets', len(sheets))
         all_generated_tables_info = []  # 用于存储所有工作表的表格信息
+        sections_done = 0  # 已处理的数据组数，用于进度上报
         global_last_num = 1  # 全局附表编号，从1开始，确保连续
+        pristine_remark_row_template = None  # 未渲染的备注行模板
+        source_remark_tr = None  # 附表1中的备注行
+        remark_template = None  # 编译后的备注单元格模板
+        template_untouched = True  # 第一次查找附表1时文档仍是未修改的模板，可直接使用预编译的备注行和标题字体
 
         # 定义表格数据和序号列的通用字体样式
         TABLE_DATA_FONT_NAME = "Times New Roman"
         TABLE_DATA_FONT_SIZE = Pt(10) # 5号字通常对应10磅
         TABLE_DATA_FONT_BOLD = False
   
-        for sheet_name in sheets:
+        for sheet_number, sheet_name in enumerate(sheets, 1):
             ws = wb[sheet_name]  # 切换到当前工作表
             log_status(f"处理工作表: {sheet_name}")
 
-            # 自动检测数据组数量，直到遇到停止条件或数据结束
-            table_ranges = []
-            header_rows_list = []
-            i = 0
-            while True:
-                current_start = base_start_row + i * row_increment
-                current_end = current_start + rows_per_section - 1
+            with report.stage('section_discovery'):
+                # 自动检测数据组数量，直到遇到停止条件或数据结束
+                table_ranges = []
+                header_rows_list = []
+                i = 0
+                while True:
+                    current_start = base_start_row + i * row_increment
+                    current_end = current_start + rows_per_section - 1
                 
-                if current_start > ws.max_row:  # 确保不超过当前工作表行数
-                    break
+                    if current_start > ws.max_row:  # 确保不超过当前工作表行数
+                        break
                 
-                ac_cell = ws.cell(row=current_start, column=29)  # AC列是第29列
-                ac_value = get_cell_display_value(ac_cell)
+                    ac_cell = ws.cell(row=current_start, column=29)  # AC列是第29列
+                    ac_value = get_cell_display_value(ac_cell)
                 
-                if ac_value == "#DIV/0!":
-                    log_status(f"检测到行{current_start} AC列为#DIV/0!，停止读取更多数据组")
-                    break
+                    if ac_value == "#DIV/0!":
+                        log_status(f"检测到行{current_start} AC列为#DIV/0!，停止读取更多数据组")
+                        break
                 
-                table_ranges.append((current_start, current_end))
-                header_rows_list.append(1)  # 表头行数
-                i += 1
+                    table_ranges.append((current_start, current_end))
+                    header_rows_list.append(1)  # 表头行数
+                    i += 1
                 
-                if i >= 100:
-                    log_status("已达到最大数据组处理限制(100组)")
-                    break
+                    if i >= 100:
+                        log_status("已达到最大数据组处理限制(100组)")
+                        break
 
-            # 读取B列和L列单元格内容并结合
-            b_cell_values = []
-            for i in range(len(table_ranges)):
-                # 计算B列和L列的单元格引用
-                b_cell_ref = f"B{5 + i*24}"  # B5, B29, B53, etc.
-                l_cell_ref = f"L{3 + i*24}"  # L3, L27, L51, etc.
+                # 读取B列和L列单元格内容并结合
+                b_cell_values = []
+                for i in range(len(table_ranges)):
+                    # 计算B列和L列的单元格引用
+                    b_cell_ref = f"B{5 + i*24}"  # B5, B29, B53, etc.
+                    l_cell_ref = f"L{3 + i*24}"  # L3, L27, L51, etc.
                 
-                # 读取两个单元格的值
-                b_cell_value = get_cell_display_value(ws[b_cell_ref])
-                l_cell_value = get_cell_display_value(ws[l_cell_ref])
+                    # 读取两个单元格的值
+                    b_cell_value = get_cell_display_value(ws[b_cell_ref])
+                    l_cell_value = get_cell_display_value(ws[l_cell_ref])
                 
-                # 将B列和L列的值结合
-                combined_value = b_cell_value + l_cell_value
+                    # 将B列和L列的值结合
+                    combined_value = b_cell_value + l_cell_value
                 
-                # 添加结合后的值到列表
-                b_cell_values.append(combined_value)
-                log_status(f"读取单元格 {b_cell_ref}={b_cell_value} 和 {l_cell_ref}={l_cell_value}，结合值={combined_value}")
+                    # 添加结合后的值到列表
+                    b_cell_values.append(combined_value)
+                    log_status.debug(f"读取单元格 {b_cell_ref}={b_cell_value} 和 {l_cell_ref}={l_cell_value}，结合值={combined_value}")
 
-            # 读取数据和合并所需的单元格内容
-            all_sections_data = []
-            actual_copy_count = len(table_ranges)  # 实际需要处理的数据组数
+            with report.stage('extraction'):
+                # 读取数据和合并所需的单元格内容
+                all_sections_data = []
+                actual_copy_count = len(table_ranges)  # 实际需要处理的数据组数
             
-            for i in range(len(table_ranges)):
-                current_start, current_end = table_ranges[i]
-                log_status(f"正在读取附表{i+1}的Excel数据范围: 行{current_start}-{current_end}, 列{col_range[0]}-{col_range[1]}")
-                
-                # 检查当前组第一行AC列是否为#DIV/0!
-                ac_cell = ws.cell(row=current_start, column=29)  # AC列是第29列
-                ac_value = get_cell_display_value(ac_cell)
-                
-                if ac_value == "#DIV/0!":
-                    log_status(f"检测到附表{i+1}第一行AC列为#DIV/0!，跳过该组及之后的数据组")
-                    actual_copy_count = i  # 更新实际需要处理的数据组数
-                    break  # 跳出循环，不再处理后续数据组
-                
-                section_data = []
-                for row in ws.iter_rows(min_row=current_start, max_row=current_end, min_col=col_range[0], max_col=col_range[1]):
-                    for cell in row:
-                        log_status(f"单元格 {cell.coordinate} 的原始值: {cell.value}")  # 输出原始值
-                    row_data = [get_cell_display_value(cell) for cell in row]  # 只获取数值
-                    section_data.append(row_data)
-                
-                # 读取合并所需的额外单元格值
-                comparison_values = {}
-                row_offset = i * row_increment
-                comparison_values['B3'] = get_cell_display_value(ws[f"B{3 + row_offset}"])
-                comparison_values['B4'] = get_cell_display_value(ws[f"B{4 + row_offset}"])
-                comparison_values['B5'] = get_cell_display_value(ws[f"B{5 + row_offset}"])
-                comparison_values['L3'] = get_cell_display_value(ws[f"L{3 + row_offset}"])
-                comparison_values['L5'] = get_cell_display_value(ws[f"L{5 + row_offset}"])
-                comparison_values['P5'] = get_cell_display_value(ws[f"P{5 + row_offset}"])
-                comparison_values['T5'] = get_cell_display_value(ws[f"T{5 + row_offset}"])
-                comparison_values['S4'] = get_cell_display_value(ws[f"S{4 + row_offset}"])
-
-                all_sections_data.append({
-                    'section_index': i, # 原始的附表索引
-                    'section_data': section_data,
-                    'comparison_values': comparison_values,
-                    'b_value': b_cell_values[i] # 原始的B列值，用于标题更新
-                })
-                log_status(f"附表{i+1}的数据: {section_data}")  # 打印读取的数据
+                for i in range(len(table_ranges)):
+                    current_start, current_end = table_ranges[i]
+                    log_status(f"正在读取附表{i+1}的Excel数据范围: 行{current_start}-{current_end}, 列{col_range[0]}-{col_range[1]}")
+                
+                    # 检查当前组第一行AC列是否为#DIV/0!
+                    ac_cell = ws.cell(row=current_start, column=29)  # AC列是第29列
+                    ac_value = get_cell_display_value(ac_cell)
+                
+                    if ac_value == "#DIV/0!":
+                        log_status(f"检测到附表{i+1}第一行AC列为#DIV/0!，跳过该组及之后的数据组")
+                        actual_copy_count = i  # 更新实际需要处理的数据组数
+                        break  # 跳出循环，不再处理后续数据组
+                
+                    section_data = []
+                    log_raw_values = log_status.is_enabled(DEBUG)
+                    for row in ws.iter_rows(min_row=current_start, max_row=current_end, min_col=col_range[0], max_col=col_range[1]):
+                        if log_raw_values:
+                            for cell in row:
+                                log_status.debug("单元格 %s 的原始值: %s", cell.coordinate, cell.value)  # 输出原始值
+                        row_data = [get_cell_display_value(cell) for cell in row]  # 只获取数值
+                        section_data.append(row_data)
+                
+                    # 读取合并所需的额外单元格值
+                    comparison_values, merge_key = read_comparison_values(ws, i * row_increment, merge_keys)
+
+                    all_sections_data.append({
+                        'section_index': i, # 原始的附表索引
+                        'section_data': section_data,
+                        'comparison_values': comparison_values,
+                        'merge_key': merge_key, # 可哈希的合并键，分组时直接比较
+                        'b_value': b_cell_values[i], # 原始的B列值，用于标题更新
+                        'remark_values': read_remark_values(ws, i) # 备注数据，按当前工作表读取
+                    })
+                    log_status.debug("附表%s的数据: %s", i + 1, section_data)  # 打印读取的数据
             
             copy_count = len(table_ranges)  # 当前工作表的实际数据组数
+            report.count('sections', len(all_sections_data))
+            report.progress(sheet=sheet_number, sheets_total=len(sheets), sections_total=report.counts['sections'])
             
             if copy_count == 0:
                 continue  # 跳过空工作表
@@ -493,89 +928,116 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
             # 临时禁用重新加载Excel的逻辑，直接使用当前读取的all_sections_data
 
             # 根据合并规则对表格部分进行分组
-            grouped_sections = group_sections_for_merging(all_sections_data, log_status)
-            log_status(f"分组后的表格数量: {len(grouped_sections)}")
-
-            # --- 步骤 1: 查找原始"附表1"段落和其下方的表格 (只执行一次) ---
-            source_table = None
-            first_heading_paragraph = None
-
-            log_status("查找附表1段落...")
-            for par_idx, para in enumerate(doc.paragraphs):
-                if "附表1" in para.text and para.text.startswith("附表1"):
-                    first_heading_paragraph = para
-                    log_status(f"找到附表1段落，索引: {par_idx}, 内容: '{para.text}'")
+            with report.stage('grouping'):
+                grouped_sections = group_sections_for_merging(all_sections_data, log_status, merge_mode, max_rows_per_table)
+                log_status(f"分组后的表格数量: {len(grouped_sections)}")
+            report.count('groups', len(grouped_sections))
+
+            with report.stage('template_discovery'):
+                # --- 步骤 1: 查找原始"附表1"段落和其下方的表格 (只执行一次) ---
+                source_table = None
+                first_heading_paragraph = None
+
+                log_status("查找附表1段落...")
+                located = locate_compiled_appendix(doc, compiled_template)
+                if located is not None:
+                    first_heading_paragraph, source_table = located
+                    log_status(f"按预编译模板定位附表1段落: '{first_heading_paragraph.text}'")
+                else:
+                    for par_idx, para in enumerate(doc.paragraphs):
+                        if "附表1" in para.text and para.text.startswith("附表1"):
+                            first_heading_paragraph = para
+                            log_status(f"找到附表1段落，索引: {par_idx}, 内容: '{para.text}'")
                     
-                    # 查找附表1下方的表格
-                    log_status("查找附表1下方的表格...")
-                    for table_idx, table in enumerate(doc.tables):
-                        try:
-                            # 检查表格元素是否紧跟在标题段落元素之后
-                            if para._element.xpath('following-sibling::w:tbl[1]')[0] == table._element:
-                                source_table = table
-                                log_status(f"找到附表1下方的表格: 表格{table_idx+1}")
-                                break
-                        except Exception:
-                            continue
+                            # 查找附表1下方的表格
+                            log_status("查找附表1下方的表格...")
+                            for table_idx, table in enumerate(doc.tables):
+                                try:
+                                    # 检查表格元素是否紧跟在标题段落元素之后
+                                    if XPATH['next_table'](para._element)[0] == table._element:
+                                        source_table = table
+                                        log_status(f"找到附表1下方的表格: 表格{table_idx+1}")
+                                        break
+                                except Exception:
+                                    continue
                     
-                    if source_table:
-                        break
-                    else:
-                        log_status("未找到附表1下方的表格，尝试其他XML查找方法...")
-                        try:
-                            from lxml import etree
-                            root = etree.fromstring(doc._element.xml)
-                            para_elements = root.xpath(f"//w:p[contains(., '附表1')]")
-                            if para_elements:
-                                table_element = para_elements[0].xpath("following-sibling::w:tbl[1]")
-                                if table_element:
-                                    for table_idx, table in enumerate(doc.tables):
-                                        if table._element == table_element[0]:
-                                            source_table = table
-                                            log_status(f"通过XML路径找到附表1下方的表格: 表格{table_idx+1}")
-                                            break
-                        except Exception as e:
-                            log_status(f"XML查找方法出错: {e}")
+                            if source_table:
+                                break
+                            else:
+                                log_status("未找到附表1下方的表格，尝试其他XML查找方法...")
+                                try:
+                                    from lxml import etree
+                                    root = etree.fromstring(doc._element.xml)
+                                    para_elements = XPATH['paragraph_containing'](root, text='附表1')
+                                    if para_elements:
+                                        table_element = XPATH['next_table'](para_elements[0])
+                                        if table_element:
+                                            for table_idx, table in enumerate(doc.tables):
+                                                if table._element == table_element[0]:
+                                                    source_table = table
+                                                    log_status(f"通过XML路径找到附表1下方的表格: 表格{table_idx+1}")
+                                                    break
+                                except Exception as e:
+                                    log_status.error(f"XML查找方法出错: {e}")
                         
-                        if source_table:
-                            break
-                        else:
-                            log_status("错误：未找到附表1下方的表格")
-                            raise Exception("未找到附表1下方的表格")
-
-            if not first_heading_paragraph:
-                log_status("错误：未找到附表1段落")
-                raise Exception("未找到附表1段落")
-
-            # 获取附表1的字体格式，用于后续新生成表格的标题格式
-            first_heading_font_name, first_heading_font_size, first_heading_bold = get_heading_format(doc, "附表1")
-
-            # 在循环之前，获取源表格的表头和备注行的索引
-            source_header_row_idx = 0 # 假设表头是第一行
-            source_remark_row_idx = -1
-            for r_idx, row in enumerate(source_table.rows):
-                if len(row.cells) > 0 and "备注" in row.cells[0].text:
-                    source_remark_row_idx = r_idx
-                    break
-            
-            # 获取源表格的列宽信息
-            source_column_widths = []
-            for col in source_table.columns:
-                source_column_widths.append(col.width)
-            log_status(f"源表格列宽: {source_column_widths}")
+                                if source_table:
+                                    break
+                                else:
+                                    log_status.error("错误：未找到附表1下方的表格")
+                                    raise Exception("未找到附表1下方的表格")
 
-            # 提取源表格的表头、数据行和备注行XML元素作为模板
-            header_row_xml_template = source_table.rows[source_header_row_idx]._element
-            data_row_xml_template = source_table.rows[source_header_row_idx + 1]._element # 选择表头后的第一行作为数据行模板
-            remark_row_xml_template = None
-            if source_remark_row_idx != -1:
-                remark_row_xml_template = source_table.rows[source_remark_row_idx]._element
+                if not first_heading_paragraph:
+                    log_status.error("错误：未找到附表1段落")
+                    raise Exception("未找到附表1段落")
 
-            # 提取源表格的整体样式和网格信息
-            source_tblPr_xml = source_table._element.tblPr
-            source_tblGrid_xml = source_table._element.tblGrid
+                use_compiled = located is not None and template_untouched
+                template_untouched = False
 
-            data_rows_count = 12 # 每个表格的数据行数
+                # 获取附表1的字体格式，用于后续新生成表格的标题格式；未修改的模板直接使用预编译结果
+                if use_compiled:
+                    first_heading_font_name, first_heading_font_size, first_heading_bold = compiled_heading_format(compiled_template)
+                else:
+                    first_heading_font_name, first_heading_font_size, first_heading_bold = get_heading_format(doc, "附表1")
+
+                # 在循环之前，获取源表格的表头和备注行的索引
+                source_header_row_idx = 0 # 假设表头是第一行
+                source_remark_row_idx = -1
+                if use_compiled:
+                    # 第一次查找时文档仍是未修改的模板，备注行位置与预编译结果一致，省去逐行读取单元格
+                    if compiled_template['remark_row_index'] is not None:
+                        source_remark_row_idx = compiled_template['remark_row_index']
+                else:
+                    for r_idx, row in enumerate(source_table.rows):
+                        if len(row.cells) > 0 and "备注" in row.cells[0].text:
+                            source_remark_row_idx = r_idx
+                            break
+            
+                # 获取源表格的列宽信息
+                source_column_widths = []
+                for col in source_table.columns:
+                    source_column_widths.append(col.width)
+                log_status(f"源表格列宽: {source_column_widths}")
+
+                # 提取源表格的表头、数据行和备注行XML元素作为模板
+                header_row_xml_template = source_table.rows[source_header_row_idx]._element
+                data_row_xml_template = source_table.rows[source_header_row_idx + 1]._element # 选择表头后的第一行作为数据行模板
+                remark_row_xml_template = None
+                if source_remark_row_idx != -1:
+                    remark_row_xml_template = source_table.rows[source_remark_row_idx]._element
+                    # 附表1的备注行在生成时就会被渲染，因此第一次发现时保存未渲染的副本供后续工作表克隆
+                    if pristine_remark_row_template is None:
+                        pristine_remark_row_template = copy.deepcopy(remark_row_xml_template)
+                        source_remark_tr = remark_row_xml_template
+                        # 备注单元格只编译一次，之后每个表格的备注只是一次 run 复制
+                        if len(source_remark_tr.tc_lst) > 1:
+                            remark_template = compile_remark_template(source_remark_tr.tc_lst[1])
+                    remark_row_xml_template = pristine_remark_row_template
+
+                # 提取源表格的整体样式和网格信息
+                source_tblPr_xml = source_table._element.tblPr
+                source_tblGrid_xml = source_table._element.tblGrid
+
+                data_rows_count = 12 # 每个表格的数据行数
 
             # 用于存储所有生成表格的列表，以便后续备注处理
             generated_tables_info = []
@@ -586,9 +1048,11 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                 # current_group 是一个列表，包含需要合并的 all_sections_data 字典
                 # group_first_section 是当前组的第一个表格部分，用于获取标题、备注模板等
                 group_first_section = current_group[0]
+                report.progress(sections_done=sections_done, tables_built=len(all_generated_tables_info) + len(generated_tables_info))
+                sections_done += len(current_group)
                 
                 log_status(f"\n=== 处理第{group_idx+1}个表格组 (包含 {len(current_group)} 个原始表格) ===")
-                log_status(f"在 group_idx={group_idx} 循环开始时，文档表格数量: {len(doc.tables)}") # Debug: 打印循环开始时的表格数量
+                log_status.debug(lambda: f"在 group_idx={group_idx} 循环开始时，文档表格数量: {len(doc.tables)}") # Debug: 打印循环开始时的表格数量
                 
                 current_target_table = None
                 current_target_paragraph = None
@@ -598,170 +1062,179 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                 # new_num = group_first_section['section_index'] + 1 # 这个是原始附表编号，不能直接用作新附表编号
                 # new_num 将在实际生成表格时计算
 
-                # 如果是第一个表格组，直接填充原始的"附表1"表格
-                if group_idx == 0 and sheet_name == sheets[0]: # 第一个工作表的第一个组
-                    current_target_table = source_table
-                    current_target_paragraph = first_heading_paragraph
-                    target_heading_text = "附表1"
-                else: # 新增附表标题和表格
-                    # 获取最新附表编号
-                    # last_num = 1 # 移除这行，因为它将被 global_last_num 替换
-                    # 遍历 doc.paragraphs 来查找已有的附表编号，确保新编号是递增的
-                    # for para in doc.paragraphs:
-                    #     if para.text.startswith("附表"):
-                    #         try:
-                    #             num_part_candidate = ""
-                    #             text_after_fubiao = para.text[2:].strip()
-                    #             if text_after_fubiao and text_after_fubiao[0].isdigit():
-                    #                 for char in text_after_fubiao:
-                    #                     if char.isdigit():
-                    #                         num_part_candidate += char
-                    #                     else:
-                    #                         break
-                    #             
-                    #             if num_part_candidate.isdigit():
-                    #                 num = int(num_part_candidate)
-                    #                 if num > last_num:
-                    #                     last_num = num
-                    #         except:
-                    #             continue
+                with report.stage('table_build'):
+                    # 如果是第一个表格组，直接填充原始的"附表1"表格
+                    if group_idx == 0 and sheet_name == sheets[0]: # 第一个工作表的第一个组
+                        current_target_table = source_table
+                        current_target_paragraph = first_heading_paragraph
+                        target_heading_text = "附表1"
+                        appendix_num = 1
+                        remark_tr = source_remark_tr
+                    else: # 新增附表标题和表格
+                        # 获取最新附表编号
+                        # last_num = 1 # 移除这行，因为它将被 global_last_num 替换
+                        # 遍历 doc.paragraphs 来查找已有的附表编号，确保新编号是递增的
+                        # for para in doc.paragraphs:
+                        #     if para.text.startswith("附表"):
+                        #         try:
+                        #             num_part_candidate = ""
+                        #             text_after_fubiao = para.text[2:].strip()
+                        #             if text_after_fubiao and text_after_fubiao[0].isdigit():
+                        #                 for char in text_after_fubiao:
+                        #                     if char.isdigit():
+                        #                         num_part_candidate += char
+                        #                     else:
+                        #                         break
+                        #             
+                        #             if num_part_candidate.isdigit():
+                        #                 num = int(num_part_candidate)
+                        #                 if num > last_num:
+                        #                     last_num = num
+                        #         except:
+                        #             continue
                     
-                    # new_num = last_num + 1 # 替换为使用 global_last_num
-                    global_last_num += 1
-                    new_num = global_last_num
-                    target_heading_text = f"附表{new_num}"
-
-                    # 添加新附表标题（复制附表1的格式）
-                    doc.add_paragraph() # 先添加一个空行作为分隔
-                    new_para = doc.add_paragraph()
-                    new_run = new_para.add_run(f"附表{new_num} ") # 显式添加空格
-                    # 先将new_para赋值给current_target_paragraph，然后再使用
-                    current_target_paragraph = new_para
-                    if new_num > 1: # 仅对附表2及之后的表格添加补充文本
-                        # 保持完整的标题格式"压实度检测结果表（承台回填土）"
-                        run_excel = current_target_paragraph.add_run("压实度检测结果表（承台回填土）")
-                    # 使用从第一个附表获取的字体格式，如果获取失败则默认宋体9磅加粗
-                    if first_heading_font_name and first_heading_font_size:
-                        new_run.font.name = first_heading_font_name
-                        new_run.font.size = first_heading_font_size
-                        new_run.bold = first_heading_bold
-                        if new_num > 1:
-                            run_excel.font.name = first_heading_font_name
-                            run_excel.font.size = first_heading_font_size
-                            run_excel.bold = first_heading_bold
-                    else:
-                        new_run.font.name = "宋体"
-                        new_run.font.size = Pt(9)
-                        new_run.bold = True
-                        if new_num > 1:
-                            run_excel.font.name = "宋体"
-                            run_excel.font.size = Pt(9)
-                            run_excel.bold = True
-
-                    new_para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    current_target_paragraph = new_para
-
-                    # 创建一个空的表格 (0行)
-                    new_table = doc.add_table(rows=0, cols=len(source_table.columns))
-                    tbl_element = new_table._element
-                    from lxml import etree
-
-                    # 复制表格整体属性
-                    if source_tblPr_xml is not None:
-                        tbl_element.insert(0, etree.fromstring(etree.tostring(source_tblPr_xml)))
-                    if source_tblGrid_xml is not None:
-                        tbl_element.append(etree.fromstring(etree.tostring(source_tblGrid_xml)))
-
-                    # 设置新表格的列宽
-                    if source_column_widths:
-                        for col_idx, width in enumerate(source_column_widths):
-                            if col_idx < len(new_table.columns):
-                                new_table.columns[col_idx].width = width
-                        log_status(f"新表格已设置列宽: {source_column_widths}")
-
-                    # 插入克隆的表头行
-                    tbl_element.append(etree.fromstring(etree.tostring(header_row_xml_template)))
-
-                    # 插入数据行 (根据合并组的总数据行数)
-                    total_data_rows_in_group = sum(len(section['section_data']) for section in current_group)
-                    for _ in range(total_data_rows_in_group):
-                        tbl_element.append(etree.fromstring(etree.tostring(data_row_xml_template)))
-
-                    # 插入克隆的备注行 (如果存在)
-                    if remark_row_xml_template is not None:
-                        tbl_element.append(etree.fromstring(etree.tostring(remark_row_xml_template)))
-
-                    current_target_table = new_table
-                    log_status(f"在 group_idx={group_idx} 新增表格后，文档表格数量: {len(doc.tables)}") # Debug: 打印新增表格后的数量
-
-                # 填充数据到当前目标表格
-                # data_section = all_sections_data[i]['section_data'] # 替换为合并后的数据
-                
-                # 合并当前组的所有数据行
-                merged_data_section = []
-                for section in current_group:
-                    merged_data_section.extend(section['section_data'])
-
-                data_section_to_fill = merged_data_section
-                header_rows = header_rows_list[0] # 表头行数统一使用第一个表格的
-                
-                if group_idx == 0: # 对于第一个表格，需要考虑其原始的行数，以及被删除的行
-                    max_available_rows = len(current_target_table.rows) - header_rows - (1 if source_remark_row_idx != -1 else 0)
-                    max_data_rows = min(len(data_section_to_fill), max_available_rows)
-                else: # 对于后续生成的表格，行数已经精确控制
-                    max_data_rows = len(data_section_to_fill) # 因为现在表格已经精确控制了行数，直接用实际数据行数
-                
-                log_status(f"正在填充 {target_heading_text}，数据行数: {len(data_section_to_fill)}，表格行数: {len(current_target_table.rows)}")
-                for row_idx in range(max_data_rows):
-                    row_data = data_section_to_fill[row_idx]
-
-                    # 填充编号到第一列
-                    num_cell = current_target_table.cell(row_idx + header_rows, 0)
-                    # 清空现有段落并添加新运行以强制应用字体
-                    for paragraph in list(num_cell.paragraphs):
-                        num_cell._element.remove(paragraph._element)
-                    p = num_cell.add_paragraph()
-                    run = p.add_run(str(row_idx + 1))
-                    # 应用表格数据和序号列的字体样式
-                    run.font.name = TABLE_DATA_FONT_NAME
-                    run.font.size = TABLE_DATA_FONT_SIZE
-                    run.font.bold = TABLE_DATA_FONT_BOLD
-                    p.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                        # new_num = last_num + 1 # 替换为使用 global_last_num
+                        global_last_num += 1
+                        new_num = global_last_num
+                        target_heading_text = f"附表{new_num}"
+                        appendix_num = new_num
+
+                        # 添加新附表标题（复制附表1的格式）
+                        doc.add_paragraph() # 先添加一个空行作为分隔
+                        new_para = doc.add_paragraph()
+                        new_run = new_para.add_run(f"附表{new_num} ") # 显式添加空格
+                        # 先将new_para赋值给current_target_paragraph，然后再使用
+                        current_target_paragraph = new_para
+                        if new_num > 1: # 仅对附表2及之后的表格添加补充文本
+                            # 保持完整的标题格式"压实度检测结果表（承台回填土）"
+                            run_excel = current_target_paragraph.add_run("压实度检测结果表（承台回填土）")
+                        # 使用从第一个附表获取的字体格式，如果获取失败则默认宋体9磅加粗
+                        if first_heading_font_name and first_heading_font_size:
+                            new_run.font.name = first_heading_font_name
+                            new_run.font.size = first_heading_font_size
+                            new_run.bold = first_heading_bold
+                            if new_num > 1:
+                                run_excel.font.name = first_heading_font_name
+                                run_excel.font.size = first_heading_font_size
+                                run_excel.bold = first_heading_bold
+                        else:
+                            new_run.font.name = "宋体"
+                            new_run.font.size = Pt(9)
+                            new_run.bold = True
+                            if new_num > 1:
+                                run_excel.font.name = "宋体"
+                                run_excel.font.size = Pt(9)
+                                run_excel.bold = True
 
-                    # 从Word表格的第二列开始粘贴，跳过第一列
-                    for col_idx in range(min(len(row_data), len(current_target_table.columns) - 1)): # 减1因为跳过Word表格的第一列
-                        cell = current_target_table.cell(row_idx + header_rows, col_idx + 1) # col_idx + 1 来从Word表格的第二列开始
-                        cell_value = row_data[col_idx]
-                        
+                        new_para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                        current_target_paragraph = new_para
+
+                        # 创建一个空的表格 (0行)
+                        new_table = doc.add_table(rows=0, cols=len(source_table.columns))
+                        tbl_element = new_table._element
+                        from lxml import etree
+
+                        # 复制表格整体属性
+                        if source_tblPr_xml is not None:
+                            tbl_element.insert(0, etree.fromstring(etree.tostring(source_tblPr_xml)))
+                        if source_tblGrid_xml is not None:
+                            tbl_element.append(etree.fromstring(etree.tostring(source_tblGrid_xml)))
+
+                        # 设置新表格的列宽
+                        if source_column_widths:
+                            for col_idx, width in enumerate(source_column_widths):
+                                if col_idx < len(new_table.columns):
+                                    new_table.columns[col_idx].width = width
+                            log_status(f"新表格已设置列宽: {source_column_widths}")
+
+                        # 插入克隆的表头行
+                        tbl_element.append(etree.fromstring(etree.tostring(header_row_xml_template)))
+
+                        # 插入数据行 (根据合并组的总数据行数)
+                        total_data_rows_in_group = sum(len(section['section_data']) for section in current_group)
+                        for _ in range(total_data_rows_in_group):
+                            tbl_element.append(etree.fromstring(etree.tostring(data_row_xml_template)))
+
+                        # 插入克隆的备注行 (如果存在)
+                        remark_tr = None
+                        if remark_row_xml_template is not None:
+                            tbl_element.append(etree.fromstring(etree.tostring(remark_row_xml_template)))
+                            remark_tr = tbl_element.tr_lst[-1]
+
+                        current_target_table = new_table
+                        log_status.debug(lambda: f"在 group_idx={group_idx} 新增表格后，文档表格数量: {len(doc.tables)}") # Debug: 打印新增表格后的数量
+
+                with report.stage('fill'):
+                    # 填充数据到当前目标表格
+                    # data_section = all_sections_data[i]['section_data'] # 替换为合并后的数据
+                
+                    # 合并当前组的所有数据行
+                    merged_data_section = []
+                    for section in current_group:
+                        merged_data_section.extend(section['section_data'])
+
+                    data_section_to_fill = merged_data_section
+                    header_rows = header_rows_list[0] # 表头行数统一使用第一个表格的
+                
+                    if group_idx == 0: # 对于第一个表格，需要考虑其原始的行数，以及被删除的行
+                        max_available_rows = len(current_target_table.rows) - header_rows - (1 if source_remark_row_idx != -1 else 0)
+                        max_data_rows = min(len(data_section_to_fill), max_available_rows)
+                    else: # 对于后续生成的表格，行数已经精确控制
+                        max_data_rows = len(data_section_to_fill) # 因为现在表格已经精确控制了行数，直接用实际数据行数
+                
+                    log_status(f"正在填充 {target_heading_text}，数据行数: {len(data_section_to_fill)}，表格行数: {len(current_target_table.rows)}")
+                    report.count('data_rows', max_data_rows)
+                    for row_idx in range(max_data_rows):
+                        row_data = data_section_to_fill[row_idx]
+
+                        # 填充编号到第一列
+                        num_cell = current_target_table.cell(row_idx + header_rows, 0)
                         # 清空现有段落并添加新运行以强制应用字体
-                        for paragraph in list(cell.paragraphs):
-                            cell._element.remove(paragraph._element)
-                        p = cell.add_paragraph()
-                        run = p.add_run(cell_value)
+                        for paragraph in list(num_cell.paragraphs):
+                            num_cell._element.remove(paragraph._element)
+                        p = num_cell.add_paragraph()
+                        run = p.add_run(str(row_idx + 1))
                         # 应用表格数据和序号列的字体样式
                         run.font.name = TABLE_DATA_FONT_NAME
                         run.font.size = TABLE_DATA_FONT_SIZE
                         run.font.bold = TABLE_DATA_FONT_BOLD
                         p.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+                        # 从Word表格的第二列开始粘贴，跳过第一列
+                        for col_idx in range(min(len(row_data), len(current_target_table.columns) - 1)): # 减1因为跳过Word表格的第一列
+                            cell = current_target_table.cell(row_idx + header_rows, col_idx + 1) # col_idx + 1 来从Word表格的第二列开始
+                            cell_value = row_data[col_idx]
                         
-                        # 确保垂直居中
-                        from docx.oxml.shared import qn
-                        tcPr = cell._element.xpath('w:tcPr')
-                        if not tcPr:
-                            tcPr = cell._element.makeelement(qn('w:tcPr'), nsmap=cell._element.nsmap)
-                            cell._element.insert(0, tcPr)
-                        else:
-                            tcPr = tcPr[0]
+                            # 清空现有段落并添加新运行以强制应用字体
+                            for paragraph in list(cell.paragraphs):
+                                cell._element.remove(paragraph._element)
+                            p = cell.add_paragraph()
+                            run = p.add_run(cell_value)
+                            # 应用表格数据和序号列的字体样式
+                            run.font.name = TABLE_DATA_FONT_NAME
+                            run.font.size = TABLE_DATA_FONT_SIZE
+                            run.font.bold = TABLE_DATA_FONT_BOLD
+                            p.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
                         
-                        vAlign = tcPr.xpath('w:vAlign')
-                        if not vAlign:
-                            vAlign = tcPr.makeelement(qn('w:vAlign'), nsmap=tcPr.nsmap)
-                            tcPr.append(vAlign)
-                        vAlign = vAlign[0]  # Ensure vAlign is always set, even if it existed
-                        vAlign.set(qn('w:val'), 'center')  # Explicitly set vertical centering
+                            # 确保垂直居中
+                            tcPr = XPATH['tcPr'](cell._element)
+                            if not tcPr:
+                                tcPr = cell._element.makeelement(qn('w:tcPr'), nsmap=cell._element.nsmap)
+                                cell._element.insert(0, tcPr)
+                            else:
+                                tcPr = tcPr[0]
+                        
+                            vAlign = XPATH['vAlign'](tcPr)
+                            if not vAlign:
+                                vAlign = tcPr.makeelement(qn('w:vAlign'), nsmap=tcPr.nsmap)
+                                tcPr.append(vAlign)
+                            else:
+                                vAlign = vAlign[0]
+                            vAlign.set(qn('w:val'), 'center')  # Explicitly set vertical centering
 
                 # 在填充数据后，检查并删除行
-                delete_rows_based_on_last_column(current_target_table, header_rows, log_status)
+                with report.stage('row_deletion'):
+                    delete_rows_based_on_last_column(current_target_table, header_rows, log_status)
 
                 # 移除二次强制设置所有数据单元格的垂直和水平居中的代码
                 # for r_idx in range(header_rows, len(current_target_table.rows) - (1 if source_remark_row_idx != -1 else 0)):
@@ -787,51 +1260,52 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                 #             vAlign[0].set(qn('w:val'), 'top')  # 确保垂直居中改为靠上
                 # log_status(f"已对 {target_heading_text} 的所有数据单元格强制应用垂直靠上水平居中。")
 
-                # 更新标题段落中的Excel单元格文本 (如果适用)
-                if current_target_paragraph:
-                    try:
-                        # 使用当前组的第一个表格部分的B列单元格值作为标题更新值
-                        excel_value = group_first_section['b_value']
-                        if excel_value and str(excel_value).strip():
-                            # 只替换标题中的"承台回填土"部分，保留其他内容
-                            if "压实度检测结果表（承台回填土）" in current_target_paragraph.text:
-                                # 获取原始标题文本
-                                original_text = current_target_paragraph.text
-                                # 只替换"承台回填土"为Excel中的值
-                                new_text = original_text.replace("承台回填土", str(excel_value))
-                                # 清除现有内容
-                                current_target_paragraph.clear()
-                                # 添加更新后的文本
-                                run_main = current_target_paragraph.add_run(new_text)
-                            else:
-                                # 如果标题格式不同，采用原有的清除重写方式
-                                current_target_paragraph.clear()
-                                run_main = current_target_paragraph.add_run(f"{target_heading_text} ")
-                                run_excel = current_target_paragraph.add_run(str(excel_value))
-                            # 应用从第一个附表标题获取的字体，如果获取失败则默认宋体9磅加粗
-                            if first_heading_font_name and first_heading_font_size:
-                                run_main.font.name = first_heading_font_name
-                                run_main.font.size = first_heading_font_size
-                                run_main.bold = first_heading_bold
-                            else:
-                                run_main.font.name = "宋体"
-                                run_main.font.size = Pt(9)
-                                run_main.bold = True
-                            # 应用从第一个附表标题获取的字体，如果获取失败则默认宋体9磅加粗
-                            if first_heading_font_name and first_heading_font_size:
-                                run_excel.font.name = first_heading_font_name
-                                run_excel.font.size = first_heading_font_size
-                                run_excel.bold = first_heading_bold
-                            else:
-                                run_excel.font.name = "宋体"
-                                run_excel.font.size = Pt(9)
-                                run_excel.bold = True
+                with report.stage('fill'):
+                    # 更新标题段落中的Excel单元格文本 (如果适用)
+                    if current_target_paragraph:
+                        try:
+                            # 使用当前组的第一个表格部分的B列单元格值作为标题更新值
+                            excel_value = group_first_section['b_value']
+                            if excel_value and str(excel_value).strip():
+                                # 只替换标题中的"承台回填土"部分，保留其他内容
+                                if "压实度检测结果表（承台回填土）" in current_target_paragraph.text:
+                                    # 获取原始标题文本
+                                    original_text = current_target_paragraph.text
+                                    # 只替换"承台回填土"为Excel中的值
+                                    new_text = original_text.replace("承台回填土", str(excel_value))
+                                    # 清除现有内容
+                                    current_target_paragraph.clear()
+                                    # 添加更新后的文本
+                                    run_main = current_target_paragraph.add_run(new_text)
+                                else:
+                                    # 如果标题格式不同，采用原有的清除重写方式
+                                    current_target_paragraph.clear()
+                                    run_main = current_target_paragraph.add_run(f"{target_heading_text} ")
+                                    run_excel = current_target_paragraph.add_run(str(excel_value))
+                                # 应用从第一个附表标题获取的字体，如果获取失败则默认宋体9磅加粗
+                                if first_heading_font_name and first_heading_font_size:
+                                    run_main.font.name = first_heading_font_name
+                                    run_main.font.size = first_heading_font_size
+                                    run_main.bold = first_heading_bold
+                                else:
+                                    run_main.font.name = "宋体"
+                                    run_main.font.size = Pt(9)
+                                    run_main.bold = True
+                                # 应用从第一个附表标题获取的字体，如果获取失败则默认宋体9磅加粗
+                                if first_heading_font_name and first_heading_font_size:
+                                    run_excel.font.name = first_heading_font_name
+                                    run_excel.font.size = first_heading_font_size
+                                    run_excel.bold = first_heading_bold
+                                else:
+                                    run_excel.font.name = "宋体"
+                                    run_excel.font.size = Pt(9)
+                                    run_excel.bold = True
 
-                            current_target_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    except Exception as e:
-                        log_status(f"更新 {target_heading_text} 标题时出错: {e}")
-                else:
-                    log_status(f"警告：未找到标题段落 '{target_heading_text}'，跳过更新其Excel单元格文本。")
+                                current_target_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                        except Exception as e:
+                            log_status.error(f"更新 {target_heading_text} 标题时出错: {e}")
+                    else:
+                        log_status.warning(f"警告：未找到标题段落 '{target_heading_text}'，跳过更新其Excel单元格文本。")
                 
                 # 检查表格是否有数据行
                 data_row_count = len(current_target_table.rows) - header_rows - (1 if source_remark_row_idx != -1 else 0)
@@ -844,88 +1318,170 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                         current_target_paragraph._element.getparent().remove(current_target_paragraph._element)
                     continue
                 
-                # 记录当前生成的表格信息，用于后续的备注处理
+                # 用提取阶段捕获的备注数据渲染备注行，不再回读工作簿或扫描表格行
+                with report.stage('remarks'):
+                    if remark_tr is not None:
+                        render_remark_row(remark_tr, current_target_table, group_first_section['remark_values'], target_heading_text, log_status, template=remark_template)
+                    else:
+                        log_status.error(f"错误：未找到 {target_heading_text} 中的'备注'行")
+                
+                # 记录当前生成的表格信息
                 generated_tables_info.append({
                     'table_object': current_target_table,
                     'original_section_index': group_first_section['section_index'],
-                    'target_heading_text': target_heading_text # 实际生成的附表标题
+                    'target_heading_text': target_heading_text, # 实际生成的附表标题
+                    'appendix_num': appendix_num,
+                    'heading_paragraph': current_target_paragraph
                 })
 
             all_generated_tables_info.extend(generated_tables_info)  # 合并所有表格信息
+            report.progress(sections_done=sections_done, tables_built=len(all_generated_tables_info))
+
+        report.set_count('tables', len(all_generated_tables_info))
 
         # 保存Word文件 (在所有表格生成和填充之后)
         # doc.save(new_word_path) # 移动到备注处理之后
-        log_status(f"文档最终表格数量: {len(doc.tables)}") # Debug: 打印最终表格数量
+        log_status.debug(lambda: f"文档最终表格数量: {len(doc.tables)}") # Debug: 打印最终表格数量
         
         # 在脚本结束前，添加文档段落验证
         for p in doc.paragraphs:
             pass  # 如果需要，可以在这里添加其他处理逻辑
 
-        # --- 步骤 3: 查找并替换"备注"行中的数值 ---
-        # 原始 find_and_replace_remark 函数被替换为一个新的函数，以处理所有表格
-        # process_all_remarks(doc, excel_path, copy_count, log_status)  # 替换为新的处理方式
-
-        # 新的备注处理逻辑：遍历 generated_tables_info
-        # 这里需要为 process_all_remarks 提供正确的 target_table 和 original_section_index
-        # 注意：process_all_remarks 内部会重新加载 excel_path，所以这里只需要传递相关参数即可
-        for table_info in all_generated_tables_info:
-            target_table_obj = table_info['table_object']
-            original_section_index = table_info['original_section_index']
-            actual_target_heading_text = table_info['target_heading_text']
-            
-            # 调用 process_all_remarks，但是只处理单个表格的备注
-            # process_all_remarks(doc, excel_path, 1, log_status) # copy_count 现在不适用
+        # --- 步骤 3: 备注行已在生成每个表格时渲染 ---
+
+        with report.stage('save'):
+            if in_memory:
+                # 输出为内存缓冲区：直接写入，验证时从缓冲区重新加载
+                report.progress(bytes_written=save_docx(doc, new_word_path))
+                log_status("文档已保存到输出缓冲区")
+                try:
+                    test_doc = open_docx(new_word_path)
+                    log_status(f"验证: 最终文档包含 {len(test_doc.tables)} 个表格")
+                except Exception as e:
+                    log_status.error(f"验证文件时出错: {e}")
+            else:
+                # 确保目录存在
+                os.makedirs(os.path.dirname(new_word_path), exist_ok=True)
+        
+                # 保存文档
+                temp_path = new_word_path + ".temp"
+                doc.save(temp_path)
+                report.progress(bytes_written=os.path.getsize(temp_path))
+                log_status(f"文档已临时保存到: {temp_path}")
+        
+                # 验证文件是否成功生成
+                if os.path.exists(temp_path):
+                    # 重命名为最终文件
+                    if os.path.exists(new_word_path):
+                        os.remove(new_word_path)
+                    os.rename(temp_path, new_word_path)
+                    log_status(f"文档已成功保存到: {new_word_path}")
             
-            # 需要一个修改后的 process_remark_for_single_table 函数
-            process_remark_for_single_table(doc, ws, excel_path, target_table_obj, original_section_index, actual_target_heading_text, log_status)
+                    # 验证文件内容
+                    try:
+                        test_doc = Document(new_word_path)
+                        log_status(f"验证: 最终文档包含 {len(test_doc.tables)} 个表格")
+                    except Exception as e:
+                        log_status.error(f"验证文件时出错: {e}")
+                else:
+                    log_status.error("错误: 文件保存失败")
 
-        # 确保目录存在
-        os.makedirs(os.path.dirname(new_word_path), exist_ok=True)
-        
-        # 保存文档
-        temp_path = new_word_path + ".temp"
-        doc.save(temp_path)
-        log_status(f"文档已临时保存到: {temp_path}")
-        
-        # 验证文件是否成功生成
-        if os.path.exists(temp_path):
-            # 重命名为最终文件
-            if os.path.exists(new_word_path):
-                os.remove(new_word_path)
-            os.rename(temp_path, new_word_path)
-            log_status(f"文档已成功保存到: {new_word_path}")
+        # 定位"表2 压实度检测结果评定表"后面的表格（汇总表），一次汇总只需查找一次
+        def find_summary_table(doc, log_status):
+            table2_found = False
+            target_table = None
             
-            # 验证文件内容
-            try:
-                test_doc = Document(new_word_path)
-                log_status(f"验证: 最终文档包含 {len(test_doc.tables)} 个表格")
-            except Exception as e:
-                log_status(f"验证文件时出错: {e}")
-        else:
-            log_status("错误: 文件保存失败")
+            # 更全面的表格标题匹配方式
+            table_title_variants = [
+                "表2 压实度检测结果评定表",  # 原格式
+                "表2  压实度检测结果评定表",  # 两个空格
+                "表2压实度检测结果评定表",    # 无空格
+                "表2：压实度检测结果评定表",  # 冒号分隔
+                "表2.压实度检测结果评定表",   # 点号分隔
+                "表2-压实度检测结果评定表",   # 短横线分隔
+                "表2 压实度检测结果",         # 可能省略部分标题
+                "表2 压实度评定表"            # 更简化的标题
+            ]
+            
+            # 遍历文档中的所有段落
+            for para in doc.paragraphs:
+                # 检查所有可能的标题变体
+                para_text = para.text.strip()
+                for variant in table_title_variants:
+                    if variant in para_text:
+                        log_status(f"找到表格标题段落: '{para_text}'")
+                        
+                        # 方法1：使用XML路径查找紧邻的表格
+                        try:
+                            from lxml import etree
+                            para_elem = para._element
+                            # 查找段落后的第一个表格元素
+                            next_elem = para_elem.getnext()
+                            while next_elem is not None:
+                                if next_elem.tag.endswith('tbl'):
+                                    # 匹配对应的表格对象
+                                    for table in doc.tables:
+                                        if table._element is next_elem:
+                                            target_table = table
+                                            table2_found = True
+                                            log_status("通过XML路径找到表格")
+                                            break
+                                    if table2_found:
+                                        break
+                                next_elem = next_elem.getnext()
+                            if table2_found:
+                                break
+                        except Exception as e:
+                            log_status.error(f"XML路径查找出错: {e}")
+                        
+                        # 方法2：遍历所有表格，检查是否在段落附近
+                        if not table2_found:
+                            for table in doc.tables:
+                                table_elem = table._element
+                                # 检查表格是否在段落之后且距离不远
+                                if (para._element in XPATH['preceding_siblings'](table_elem) and 
+                                    len(list(XPATH['preceding_siblings'](table_elem))) - 
+                                    len(list(XPATH['following_siblings'](para._element))) <= 3):
+                                    target_table = table
+                                    table2_found = True
+                                    log_status("通过相对位置找到表格")
+                                    break
+                        
+                        if table2_found:
+                            break
+                
+                if table2_found:
+                    break
+            
+            if not table2_found:
+                log_status.warning("警告：未找到 '表2 压实度检测结果评定表' 后面的表格")
+                return None
+            return target_table
 
         # 添加新逻辑：处理"表2 压实度检测结果评定表"表格的修改
-        def modify_table2(doc, extracted_value, log_status, row_offset=0):
+        def modify_table2(doc, extracted_value, log_status, row_offset=0, appendix_table=None, target_table=None):
+            """appendix_table 为附表标题索引中记录的表格，target_table 为已定位的表2；未提供时按原逻辑扫描文档"""
             try:
                 # 1. 定位附表表格并计算压实度%平均值
                 appendix_num = f"附表{row_offset + 1}"  # 动态生成附表编号
-                appendix_table = None
-                for para in doc.paragraphs:
-                    if appendix_num in para.text:
-                        # 查找段落后的第一个表格
-                        for elem in para._element.xpath("following-sibling::*[position()<=3]"):
-                            if elem.tag.endswith('tbl'):
-                                for table in doc.tables:
-                                    if table._element is elem:
-                                        appendix_table = table
+                # 模板中原有的附表标题没有记录表格，回退到段落扫描
+                if appendix_table is None:
+                    for para in doc.paragraphs:
+                        if appendix_num in para.text:
+                            # 查找段落后的第一个表格
+                            for elem in XPATH['following_siblings_3'](para._element):
+                                if elem.tag.endswith('tbl'):
+                                    for table in doc.tables:
+                                        if table._element is elem:
+                                            appendix_table = table
+                                            break
+                                    if appendix_table:
                                         break
-                                if appendix_table:
-                                    break
-                        if appendix_table:
-                            break
+                            if appendix_table:
+                                break
                 
                 if not appendix_table:
-                    log_status(f"警告：未找到{appendix_num}表格")
+                    log_status.warning(f"警告：未找到{appendix_num}表格")
                     return
                 
                 # 计算最后一列（压实度%）的平均值
@@ -940,80 +1496,16 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                             continue
                 
                 if not values:
-                    log_status(f"警告：{appendix_num}最后一列没有有效数值")
+                    log_status.warning(f"警告：{appendix_num}最后一列没有有效数值")
                     return
                 
                 avg_value = round(sum(values) / len(values), 1)
                 log_status(f"计算{appendix_num}压实度%平均值: {avg_value}%")
                 
-                # 2. 定位"表2 压实度检测结果评定表"后面的表格
-                table2_found = False
-                target_table = None
-                
-                # 更全面的表格标题匹配方式
-                table_title_variants = [
-                    "表2 压实度检测结果评定表",  # 原格式
-                    "表2  压实度检测结果评定表",  # 两个空格
-                    "表2压实度检测结果评定表",    # 无空格
-                    "表2：压实度检测结果评定表",  # 冒号分隔
-                    "表2.压实度检测结果评定表",   # 点号分隔
-                    "表2-压实度检测结果评定表",   # 短横线分隔
-                    "表2 压实度检测结果",         # 可能省略部分标题
-                    "表2 压实度评定表"            # 更简化的标题
-                ]
-                
-                # 遍历文档中的所有段落
-                for para in doc.paragraphs:
-                    # 检查所有可能的标题变体
-                    para_text = para.text.strip()
-                    for variant in table_title_variants:
-                        if variant in para_text:
-                            log_status(f"找到表格标题段落: '{para_text}'")
-                            
-                            # 方法1：使用XML路径查找紧邻的表格
-                            try:
-                                from lxml import etree
-                                para_elem = para._element
-                                # 查找段落后的第一个表格元素
-                                next_elem = para_elem.getnext()
-                                while next_elem is not None:
-                                    if next_elem.tag.endswith('tbl'):
-                                        # 匹配对应的表格对象
-                                        for table in doc.tables:
-                                            if table._element is next_elem:
-                                                target_table = table
-                                                table2_found = True
-                                                log_status("通过XML路径找到表格")
-                                                break
-                                        if table2_found:
-                                            break
-                                    next_elem = next_elem.getnext()
-                                if table2_found:
-                                    break
-                            except Exception as e:
-                                log_status(f"XML路径查找出错: {e}")
-                            
-                            # 方法2：遍历所有表格，检查是否在段落附近
-                            if not table2_found:
-                                for table in doc.tables:
-                                    table_elem = table._element
-                                    # 检查表格是否在段落之后且距离不远
-                                    if (para._element in table_elem.xpath("preceding-sibling::*") and 
-                                        len(list(table_elem.xpath("preceding-sibling::*"))) - 
-                                        len(list(para._element.xpath("following-sibling::*"))) <= 3):
-                                        target_table = table
-                                        table2_found = True
-                                        log_status("通过相对位置找到表格")
-                                        break
-                            
-                            if table2_found:
-                                break
-                    
-                    if table2_found:
-                        break
-                
-                if not table2_found:
-                    log_status("警告：未找到 '表2 压实度检测结果评定表' 后面的表格")
+                # 2. 定位"表2 压实度检测结果评定表"后面的表格（调用方已定位时直接使用）
+                if target_table is None:
+                    target_table = find_summary_table(doc, log_status)
+                if target_table is None:
                     return
                 
                 # 修改表格
@@ -1028,11 +1520,11 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                     
                     # 复制行高属性
                     if hasattr(reference_row, '_element'):
-                        ref_trPr = reference_row._element.xpath('w:trPr')
+                        ref_trPr = XPATH['trPr'](reference_row._element)
                         if ref_trPr:
                             # 深拷贝trPr以确保所有属性（包括行高）被复制
                             cloned_trPr = etree.fromstring(etree.tostring(ref_trPr[0]))
-                            new_trPr = new_row._element.xpath('w:trPr')
+                            new_trPr = XPATH['trPr'](new_row._element)
                             if not new_trPr:
                                 new_row._element.insert(0, cloned_trPr)
                             else:
@@ -1045,9 +1537,9 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                         new_cell = new_row.cells[i]
                         
                         # 复制单元格宽度和样式
-                        ref_tcPr = ref_cell._element.xpath('w:tcPr')
+                        ref_tcPr = XPATH['tcPr'](ref_cell._element)
                         if ref_tcPr:
-                            new_tcPr = new_cell._element.xpath('w:tcPr')
+                            new_tcPr = XPATH['tcPr'](new_cell._element)
                             if not new_tcPr:
                                 new_cell._element.insert(0, etree.fromstring(etree.tostring(ref_tcPr[0]))) # 深拷贝 tcPr
                             else:
@@ -1270,87 +1762,68 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                     log_status("已应用备用逻辑：复制原始表格第三行格式")
                 
             except Exception as e:
-                log_status(f"修改表格时出错: {e}")
+                log_status.error(f"修改表格时出错: {e}")
                 traceback.print_exc()
         
-        # 提取所有附表标题中的值
-        extracted_values = []
-        max_appendix_num = 0
-        
-        # 首先确定有多少个附表
-        for para in doc.paragraphs:
-            if "附表" in para.text:
-                try:
-                    # 提取附表编号
-                    num_part = para.text.split("附表")[1].strip().split(" ")[0]
-                    if num_part.isdigit():
-                        appendix_num = int(num_part)
-                        if appendix_num > max_appendix_num:
-                            max_appendix_num = appendix_num
-                except:
-                    continue
-        
-        # 提取每个附表的值
-        for i in range(1, max_appendix_num + 1):
-            heading_text = f"附表{i}"
-            value = extract_value_from_heading(doc, heading_text)
-            if value:
-                extracted_values.append((i-1, value))  # 存储(row_offset, value)
-                log_status(f"从 '{heading_text}' 提取的值: {value}")
-        
-        if not extracted_values:
-            log_status("警告：未从附表标题中提取到任何值")
-            return
-        
-        # 保存修改前的表格内容用于验证
-        pre_modify_tables = [(table, [cell.text for row in table.rows for cell in row.cells]) 
-                           for table in doc.tables]
-        
-        # 打印修改前的表格内容
-        log_status("修改前的表格内容:")
-        for i, table in enumerate(doc.tables):
-            log_status(f"表格{i+1}:")
-            for row_idx, row in enumerate(table.rows):
-                row_text = " | ".join(cell.text for cell in row.cells)
-                log_status(f"行{row_idx}: {row_text}")
-        
-        # 在修改前保存文档状态
-        temp_path_before = new_word_path + ".before"
-        doc.save(temp_path_before)
-        log_status(f"修改前文档已临时保存到: {temp_path_before}")
-        
-        # 执行表格修改，处理所有附表
-        for row_offset, value in extracted_values:
-            # if row_offset == 0: # 跳过附表1的数据处理到表2
-            #     log_status(f"跳过附表{row_offset + 1}的数据处理到表2。")
-            #     continue
-            modify_table2(doc, value, log_status, row_offset=row_offset)
-            
-            # 立即保存修改后的文档
-            temp_path_after = new_word_path + ".after"
-            doc.save(temp_path_after)
-            log_status(f"修改后文档已临时保存到: {temp_path_after}")
+        with report.stage('summary_table'):
+            # 提取所有附表标题中的值：生成时已记录标题，模板中原有的附表标题只做一次正则扫描
+            extracted_values = []
+            appendix_tables = {}  # row_offset -> 生成时记录的附表表格
+            for entry in build_appendix_heading_index(doc, all_generated_tables_info):
+                if entry['value']:
+                    extracted_values.append((entry['number'] - 1, entry['value']))  # 存储(row_offset, value)
+                    appendix_tables[entry['number'] - 1] = entry['table']
+                    log_status(f"从 '附表{entry['number']}' 提取的值: {entry['value']}")
+        
+            if not extracted_values:
+                log_status.warning("警告：未从附表标题中提取到任何值")
+                return finish_report()
+            report.set_count('summary_rows', len(extracted_values))
+        
+            # 打印修改前的表格内容（仅调试级别）
+            if log_status.is_enabled(DEBUG):
+                log_status.debug("修改前的表格内容:")
+                for i, table in enumerate(doc.tables):
+                    log_status.debug(f"表格{i+1}:")
+                    for row_idx, row in enumerate(table.rows):
+                        log_status.debug("行%s: %s", row_idx, " | ".join(cell.text for cell in row.cells))
+        
+            # 在修改前保存文档状态（内存模式不落盘）
+            if not in_memory:
+                temp_path_before = new_word_path + ".before"
+                doc.save(temp_path_before)
+                log_status(f"修改前文档已临时保存到: {temp_path_before}")
+        
+            # 执行表格修改，处理所有附表；表2只定位一次，各附表直接使用索引中的表格
+            summary_table = find_summary_table(doc, log_status)
+            for row_offset, value in extracted_values:
+                # if row_offset == 0: # 跳过附表1的数据处理到表2
+                #     log_status(f"跳过附表{row_offset + 1}的数据处理到表2。")
+                #     continue
+                modify_table2(doc, value, log_status, row_offset=row_offset,
+                              appendix_table=appendix_tables.get(row_offset), target_table=summary_table)
             
-            # 验证修改是否成功
+            # 所有附表都写入表2之后验证一次修改是否成功
             target_table_modified = False
-            log_status("修改后的表格内容:")
+            dump_tables = log_status.is_enabled(DEBUG)
+            log_status.debug("修改后的表格内容:")
             for i, table in enumerate(doc.tables):
-                log_status(f"表格{i+1}:")
+                log_status.debug(f"表格{i+1}:")
                 for row_idx, row in enumerate(table.rows):
-                    row_text = " | ".join(cell.text for cell in row.cells)
-                    log_status(f"行{row_idx}: {row_text}")
+                    if dump_tables:
+                        log_status.debug("行%s: %s", row_idx, " | ".join(cell.text for cell in row.cells))
                     if row_idx >= 2 and len(row.cells) > 1:  # 检查所有数据行
                         cell_text = row.cells[1].text
                         for _, value in extracted_values:
                             if value and cell_text == value:
                                 target_table_modified = True
-                                log_status(f"验证成功: 表格{i+1}行{row_idx}第二列已更新为 '{cell_text}'")
+                                log_status.debug("验证成功: 表格%s行%s第二列已更新为 '%s'", i + 1, row_idx, cell_text)
                                 break
                         else:
-                            log_status(f"验证失败: 表格{i+1}行{row_idx}第二列值 '{cell_text}' 与预期值不匹配")
+                            log_status.debug("验证失败: 表格%s行%s第二列值 '%s' 与预期值不匹配", i + 1, row_idx, cell_text)
             
             if not target_table_modified and extracted_values:
-                log_status("错误: 表格修改未生效，将尝试直接修改所有表格")
+                log_status.error("错误: 表格修改未生效，将尝试直接修改所有表格")
                 # 尝试修改所有表格的对应行
                 for i, table in enumerate(doc.tables):
                     for row_offset, value in extracted_values:
@@ -1368,81 +1841,127 @@ def run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_pat
                             run.font.bold = TABLE_DATA_FONT_BOLD
                             p.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
                             log_status(f"已强制修改表格{i+1}的行{target_row}第二列为 '{value}'")
-            
-            # 最终保存文档
-            final_path = new_word_path
-            if os.path.exists(temp_path_after):
+            # 所有附表处理到表2之后只保存一次：结论段落由最终的表2一次生成
+            if in_memory:
+                report.progress(bytes_written=save_docx(doc, new_word_path))
+                log_status("修改后文档已保存到输出缓冲区")
+            else:
+                temp_path_after = new_word_path + ".after"
+                doc.save(temp_path_after)
+                report.progress(bytes_written=os.path.getsize(temp_path_after))
+                log_status(f"修改后文档已临时保存到: {temp_path_after}")
+        
+        # 最终保存文档
+        final_path = new_word_path
+        if in_memory or os.path.exists(temp_path_after):
+            if not in_memory:
                 if os.path.exists(final_path):
                     os.remove(final_path)
                 os.rename(temp_path_after, final_path)
                 log_status(f"最终文档已保存到: {final_path}")
-                
-                # 在最终验证之前，修改表2对应的所有段落（从第3行开始，即段落50开始）
-                log_status("开始修改所有表2对应段落...")
-                try:
-                    # 正确设置start_paragraph值为52，确保从段落52开始处理，也就是'本次对进行压实度检测...'这段话
-                    modify_result = modify_all_paragraphs_from_table2_rows(final_path, start_paragraph=52, log_status=log_status)
-                    if modify_result:
-                        log_status("所有段落修改成功")
-                    else:
-                        log_status("所有段落修改失败")
-                except Exception as e:
-                    log_status(f"修改所有段落时出错: {e}")
-                
-                # 验证最终文件
-                try:
-                    test_doc = Document(final_path)
+                # 修改前的快照只在调试时保留，否则每次运行都会在输出目录留下一个 .before 文件
+                if not log_status.is_enabled(DEBUG) and os.path.exists(temp_path_before):
+                    os.remove(temp_path_before)
+            
+            # 在最终验证之前，修改表2对应的所有段落（从第3行开始，即段落50开始）
+            log_status("开始修改所有表2对应段落...")
+            try:
+                # 正确设置start_paragraph值为52，确保从段落52开始处理，也就是'本次对进行压实度检测...'这段话
+                modify_result = modify_all_paragraphs_from_table2_rows(final_path, start_paragraph=52, log_status=log_status, report=report)
+                if modify_result:
+                    log_status("所有段落修改成功")
+                else:
+                    log_status("所有段落修改失败")
+            except Exception as e:
+                log_status.error(f"修改所有段落时出错: {e}")
+            
+            # 验证最终文件
+            try:
+                with report.stage('save'):
+                    test_doc = open_docx(final_path)
                     log_status(f"最终验证: 文档包含 {len(test_doc.tables)} 个表格")
                     for i, table in enumerate(test_doc.tables):
                         if len(table.rows) > 1 and len(table.rows[1].cells) > 1:
                             log_status(f"最终表格{i+1}第二行第二列值: '{table.rows[1].cells[1].text}'")
                     
-                    # 验证所有表2对应的段落
+                    # 验证所有表2对应的段落：从结论段落锚点开始，逐段检查连续的结论句
                     log_status("验证所有表2对应段落...")
                     verified_count = 0
-                    total_paragraphs = len(test_doc.paragraphs)
+                    conclusion_paragraph = build_anchor_index(test_doc).get(ANCHOR_CONCLUSION)
+                    if conclusion_paragraph is None:
+                        log_status.warning("警告：最终文档中未找到结论段落锚点")
                     
-                    # 检查从段落50开始的所有段落
-                    for i in range(49, min(total_paragraphs, 60)):  # 最多检查到段落60
-                        para_index = i
-                        para_num = i + 1
-                        para_text = test_doc.paragraphs[para_index].text
+                    for para in (iter_body_paragraphs_from(test_doc, conclusion_paragraph) if conclusion_paragraph is not None else ()):
+                        para_text = para.text
                         
-                        # 检查是否包含压实度检测的内容
-                        if "压实度检测" in para_text and "100%" in para_text:
-                            log_status(f"段落{para_num}内容: '{para_text}'")
-                            
-                            # 检查100%是否加粗
-                            bold_found = False
-                            for run in test_doc.paragraphs[para_index].runs:
-                                if "100%" in run.text and run.font.bold:
-                                    bold_found = True
-                                    log_status(f"段落{para_num}格式验证: 100%已设置为加粗")
-                                    break
-                            if not bold_found:
-                                log_status(f"段落{para_num}格式警告: 100%可能未正确设置为加粗")
-                            
-                            verified_count += 1
+                        # 检查是否包含压实度检测的内容，遇到第一个非结论句即结束
+                        if not ("压实度检测" in para_text and "100%" in para_text):
+                            break
+                        para_num = verified_count + 1
+                        log_status(f"结论段落{para_num}内容: '{para_text}'")
+                        
+                        # 检查100%是否加粗
+                        bold_found = False
+                        for run in para.runs:
+                            if "100%" in run.text and run.font.bold:
+                                bold_found = True
+                                log_status(f"结论段落{para_num}格式验证: 100%已设置为加粗")
+                                break
+                        if not bold_found:
+                            log_status(f"结论段落{para_num}格式警告: 100%可能未正确设置为加粗")
+                        
+                        verified_count += 1
                     
                     log_status(f"共验证了 {verified_count} 个表2对应段落")
-                    
-                except Exception as e:
-                    log_status(f"最终验证出错: {e}")
-            else:
-                log_status("错误: 最终保存文件不存在")
+                    report.set_count('output_tables', len(test_doc.tables))
+                    report.set_count('paragraphs', len(test_doc.paragraphs))
+                    report.set_count('conclusion_paragraphs', verified_count)
+                
+            except Exception as e:
+                log_status.error(f"最终验证出错: {e}")
         else:
-            log_status("警告：未从 '附表1' 提取到值")
+            log_status.error("错误: 最终保存文件不存在")
+
+        return finish_report()
 
     except FileNotFoundError as e:
         log_status(str(e))
         raise
     except Exception as e:
-        log_status(f"脚本执行失败: {e}")
+        log_status.error(f"脚本执行失败: {e}")
         traceback.print_exc()
         raise
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            try:
+                artifact_dir = profile_dir or default_profile_dir(new_word_path if not in_memory else os.path.join(tempfile.gettempdir(), "yashidu"))
+                artifacts = profiler.write(artifact_dir)
+                if not report.total_wall:
+                    report.finish()
+                artifacts['report'] = report.write_json(os.path.join(artifact_dir, 'report.json'))
+                log_status(f"剖析产物已保存到: {artifact_dir}（{', '.join(sorted(artifacts))}）")
+            except Exception as e:
+                log_status.error(f"保存剖析产物时出错: {e}")
+                traceback.print_exc()
+        if operation_counter is not None:
+            operation_counter.uninstall()
+
+def generate_report_bytes(excel_data, word_data, copy_count, **options):
+    """在内存中生成报告：输入为工作簿和模板文件的 bytes（或大文件上传转存后的路径），返回生成的 docx bytes
+
+    供 Web 服务的后台任务调用，输出不写临时文件；options 透传给 run_excel_to_word_automation。
+    """
+    def as_source(data):
+        return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+    output = io.BytesIO()
+    run_excel_to_word_automation(as_source(excel_data), as_source(word_data), copy_count, output, **options)
+    return output.getvalue()
 
 def delete_rows_based_on_last_column(table, header_rows, log_status):
     """根据最后一列的值删除表格行，保留备注行。"""
+    log_status = as_status_logger(log_status)
     try:
         log_status("开始检查并删除空/0.0的行...")
 
@@ -1453,7 +1972,7 @@ def delete_rows_based_on_last_column(table, header_rows, log_status):
                 break
 
         if remark_row_idx == -1:
-            log_status("警告：未找到备注行，无法确定删除范围。")
+            log_status.warning("警告：未找到备注行，无法确定删除范围。")
             return
 
         last_col_idx = len(table.columns) - 1
@@ -1469,54 +1988,195 @@ def delete_rows_based_on_last_column(table, header_rows, log_status):
         for r_idx in range(upper_bound_data_rows - 1, header_rows - 1, -1):
             row = table.rows[r_idx]
             if last_col_idx < 0 or last_col_idx >= len(row.cells):
-                log_status(f"警告：行 {r_idx} 的最后一列索引 {last_col_idx} 超出范围，跳过。")
+                log_status.warning(f"警告：行 {r_idx} 的最后一列索引 {last_col_idx} 超出范围，跳过。")
                 continue
 
             cell = row.cells[last_col_idx]
             cell_text = cell.text.strip()
-            log_status(f"行 {r_idx} 最后一列原始文本: '{row.cells[last_col_idx].text}', strip后: '{cell_text}'") # 增加调试输出
+            log_status.debug(lambda: f"行 {r_idx} 最后一列原始文本: '{row.cells[last_col_idx].text}', strip后: '{cell_text}'") # 增加调试输出
             
             if cell_text == "" or cell_text == "0.0" or cell_text == "#DIV/0!":
                 rows_to_delete.append(r_idx)
-                log_status(f"标记删除行 {r_idx}，因为最后一列（'" + cell_text + "'）为空、0.0或#DIV/0!")
+                log_status.debug(f"标记删除行 {r_idx}，因为最后一列（'" + cell_text + "'）为空、0.0或#DIV/0!")
 
         # 实际删除行
         tbl = table._element
         for r_idx in sorted(rows_to_delete, reverse=True):
-            tr = tbl.xpath(f'./w:tr[{r_idx + 1}]')[0] # XPath是1-based索引
+            tr = XPATH['tr_at'](tbl, n=r_idx + 1)[0] # XPath是1-based索引
             tbl.remove(tr)
             log_status(f"已删除行 {r_idx}")
             
         log_status("空/0.0行检查删除完成。")
 
     except Exception as e:
-        log_status(f"删除空/0.0行时出错: {e}")
+        log_status.error(f"删除空/0.0行时出错: {e}")
         traceback.print_exc()
 
 # 新的 main 函数来兼容原始的直接运行方式，方便调试
 
+# 附表标题中的编号（与旧逻辑 text.split("附表")[1].strip().split(" ")[0] 等价）和括号内的值
+APPENDIX_NUMBER_PATTERN = re.compile(r'附表\s*(\d+)(?: |$)')
+HEADING_VALUE_PATTERN = re.compile(r'[（(](.*?)[）)]')
+
+def heading_value(text, heading_text):
+    """从一个附表标题文本中提取值：优先取括号内的内容，否则取标题编号之后的文字"""
+    # 尝试提取标题中括号内的内容
+    match = HEADING_VALUE_PATTERN.search(text)
+    if match:
+        value = match.group(1).strip()
+        if value:  # 如果提取到非空值
+            return value
+    # 如果没有找到括号，回退到原来的逻辑
+    parts = text.split(heading_text)
+    if len(parts) > 1:
+        value = parts[1].strip()
+        if value:  # 如果提取到非空值
+            return value
+    return None
+
+
 def extract_value_from_heading(doc, heading_text):
     """从附表标题段落中提取值"""
     for para in doc.paragraphs:
-        if heading_text in para.text:
-            # 尝试提取标题中括号内的内容
-            match = re.search(r'[（(](.*?)[）)]', para.text)
-            if match:
-                value = match.group(1).strip()
-                if value:  # 如果提取到非空值
-                    return value
-            # 如果没有找到括号，回退到原来的逻辑
-            parts = para.text.split(heading_text)
-            if len(parts) > 1:
-                value = parts[1].strip()
-                if value:  # 如果提取到非空值
-                    return value
+        text = para.text
+        if heading_text in text:
+            value = heading_value(text, heading_text)
+            if value:
+                return value
     return None  # 如果没有找到值
 
+
+def build_appendix_heading_index(doc, generated_tables_info):
+    """返回按附表编号排序的标题索引 [{'number', 'value', 'heading', 'table'}]
+
+    生成的附表直接使用生成时记录的标题段落和表格；其余编号（模板中原有的附表标题）
+    由一次段落扫描补充，编号规则与旧逻辑一致：取第一个“附表”之后、空格之前的数字。
+    """
+    index = {}
+    for info in generated_tables_info:
+        heading = info.get('heading_paragraph')
+        if heading is None or info.get('appendix_num') is None:
+            continue
+        number = info['appendix_num']
+        index[number] = {
+            'number': number,
+            'value': heading_value(heading.text, f"附表{number}"),
+            'heading': heading,
+            'table': info['table_object'],
+        }
+
+    # 模板中原有的附表标题
+    for para in doc.paragraphs:
+        text = para.text
+        position = text.find("附表")
+        if position == -1:
+            continue
+        match = APPENDIX_NUMBER_PATTERN.match(text, position)
+        if not match:
+            continue
+        number = int(match.group(1))
+        if number in index:
+            continue
+        heading_text = f"附表{number}"
+        value = heading_value(text, heading_text) if heading_text in text else None
+        index[number] = {'number': number, 'value': value, 'heading': para, 'table': None}
+
+    return [index[number] for number in sorted(index)]
+
+def set_run_font(run, font_name, font_size, bold=False, italic=False):
+    """设置文本运行的字体属性"""
+    run.font.name = font_name
+    run.font.size = font_size
+    run.font.bold = bold
+    run.font.italic = italic
+    # 确保中文字体在所有语言设置中都正确应用
+    if font_name in ["宋体", "黑体", "楷体"]:
+        try:
+            run._element.rPr.rFonts.set(qn('w:eastAsia'), font_name)
+            run._element.rPr.rFonts.set(qn('w:ascii'), font_name)
+            run._element.rPr.rFonts.set(qn('w:hAnsi'), font_name)
+        except:
+            pass  # 忽略可能的异常
+
+def set_run_font_basic(run, font_name, font_size, bold=False, italic=False):
+    """只设置字体名称、字号、加粗和倾斜，不额外写入东亚字体属性"""
+    run.font.name = font_name
+    run.font.size = font_size
+    run.font.bold = bold
+    run.font.italic = italic
+
+# 段落模板
+# 模板把带格式的原型段落一次性编译好，并记录每个命名占位符所在的 run。
+# 渲染时只需深拷贝原型 run 并替换占位符文本，不再逐个 add_run 并设置字体属性。
+# 片段格式为 (文本, 字体名称, 是否加粗)，文本写成 "{名称}" 即为占位符。
+
+CONCLUSION_CHINESE_FONT = "宋体"
+CONCLUSION_NUMBER_FONT = "Times New Roman"
+
+CONCLUSION_SENTENCE_SEGMENTS = [
+    ("本次对", CONCLUSION_CHINESE_FONT, False),
+    ("{location}", CONCLUSION_NUMBER_FONT, False),
+    ("进行压实度检测，检测点数为", CONCLUSION_CHINESE_FONT, False),
+    ("{points}", CONCLUSION_NUMBER_FONT, False),
+    ("个，合格点数为", CONCLUSION_CHINESE_FONT, False),
+    ("{qualified}", CONCLUSION_NUMBER_FONT, False),
+    ("个，合格率为", CONCLUSION_CHINESE_FONT, False),
+    ("{rate}", CONCLUSION_NUMBER_FONT, True),  # 100%加粗
+    ("。", CONCLUSION_CHINESE_FONT, False),
+]
+CONCLUSION_SENTENCE_DEFAULTS = {'rate': "100%"}
+
+_paragraph_template_cache = {}
+
+def compile_paragraph_template(segments, font_size, set_font=set_run_font, defaults=None):
+    """将片段列表编译为段落模板，返回包含原型 run 和占位符位置的字典"""
+    prototype = Paragraph(OxmlElement('w:p'), None)
+    slots = {}
+    parts = []  # 每个 run 对应的 (固定文本, 占位符名称)
+    for run_idx, (text, font_name, bold) in enumerate(segments):
+        if text.startswith("{") and text.endswith("}"):
+            slot_name = text[1:-1]
+            slots.setdefault(slot_name, []).append(run_idx)
+            parts.append((None, slot_name))
+            run = prototype.add_run()
+        else:
+            parts.append((text, None))
+            run = prototype.add_run(text)
+        set_font(run, font_name, font_size, bold=bold)
+    return {
+        'runs': list(prototype._p.r_lst),
+        'slots': slots,
+        'parts': parts,
+        'defaults': dict(defaults or {}),
+    }
+
+def get_conclusion_sentence_template(set_font=set_run_font):
+    """返回（按字体设置方式缓存的）结论句段落模板：宋体/Times New Roman 小四，100%加粗"""
+    template = _paragraph_template_cache.get(set_font)
+    if template is None:
+        template = compile_paragraph_template(
+            CONCLUSION_SENTENCE_SEGMENTS, Pt(12), set_font=set_font,  # 小四号字体
+            defaults=CONCLUSION_SENTENCE_DEFAULTS)
+        _paragraph_template_cache[set_font] = template
+    return template
+
+def render_paragraph_template(template, paragraph, **values):
+    """将模板渲染到段落末尾：复制原型 run 并填入占位符的值，返回渲染后的文本"""
+    slot_values = dict(template['defaults'])
+    slot_values.update((name, str(value)) for name, value in values.items())
+    new_runs = [copy.deepcopy(r) for r in template['runs']]
+    for slot_name, run_indexes in template['slots'].items():
+        for run_idx in run_indexes:
+            new_runs[run_idx].text = slot_values.get(slot_name, "")
+    p = paragraph._p
+    for r in new_runs:
+        p.append(r)
+    return "".join(text if slot_name is None else slot_values.get(slot_name, "")
+                   for text, slot_name in template['parts'])
+
 def modify_paragraph_50_from_table2(word_doc_path, log_status=None):
     """从表2中提取数据并更新段落50的内容"""
-    if log_status is None:
-        log_status = print
+    log_status = as_status_logger(log_status)
     
     try:
         from docx import Document
@@ -1526,56 +2186,19 @@ def modify_paragraph_50_from_table2(word_doc_path, log_status=None):
         # 打开Word文档
         doc = Document(word_doc_path)
         
+        # 一次遍历建立锚点索引，表2和结论段落都按名称定位
+        anchors = build_anchor_index(doc)
+        
         # 查找"表2"表格
-        table2 = None
-        table2_title_paragraph = None
-        
-        # 查找表2标题段落
-        for para in doc.paragraphs:
-            para_text = para.text.strip()
-            # 尝试匹配多种可能的表2标题格式
-            if any(variant in para_text for variant in [
-                "表2 压实度检测结果评定表",
-                "表2  压实度检测结果评定表",  # 两个空格
-                "表2压实度检测结果评定表",    # 无空格
-                "表2：压实度检测结果评定表",  # 冒号分隔
-                "表2.压实度检测结果评定表",   # 点号分隔
-                "表2-压实度检测结果评定表",   # 短横线分隔
-                "表2 压实度检测结果",         # 可能省略部分标题
-                "表2 压实度评定表"            # 更简化的标题
-            ]):
-                log_status(f"找到表2标题段落: '{para_text}'")
-                table2_title_paragraph = para
-                
-                # 查找段落后的表格
-                try:
-                    from lxml import etree
-                    para_elem = para._element
-                    next_elem = para_elem.getnext()
-                    while next_elem is not None:
-                        if next_elem.tag.endswith('tbl'):
-                            # 匹配对应的表格对象
-                            for table in doc.tables:
-                                if table._element is next_elem:
-                                    table2 = table
-                                    log_status(f"找到表2表格，包含 {len(table.rows)} 行，{len(table.columns)} 列")
-                                    break
-                            if table2:
-                                break
-                        next_elem = next_elem.getnext()
-                    if table2:
-                        break
-                except Exception as e:
-                    log_status(f"通过XML路径查找表2出错: {e}")
-                    continue
+        table2 = find_table2(doc, anchors, log_status)
         
         if not table2:
-            log_status("错误：未找到'表2'表格")
+            log_status.error("错误：未找到'表2'表格")
             return False
         
         # 提取第三行（索引2）的数据
         if len(table2.rows) <= 2:
-            log_status(f"错误：表2只有 {len(table2.rows)} 行，无法找到第三行")
+            log_status.error(f"错误：表2只有 {len(table2.rows)} 行，无法找到第三行")
             return False
         
         third_row = table2.rows[2]  # 第三行
@@ -1583,7 +2206,7 @@ def modify_paragraph_50_from_table2(word_doc_path, log_status=None):
         
         # 提取第二列、第五列、第六列的数据
         if len(third_row.cells) < 6:
-            log_status(f"错误：表2第三行只有 {len(third_row.cells)} 列，不足以提取需要的数据")
+            log_status.error(f"错误：表2第三行只有 {len(third_row.cells)} 列，不足以提取需要的数据")
             return False
         
         second_col_value = third_row.cells[1].text.strip() if len(third_row.cells) > 1 else ""
@@ -1592,100 +2215,35 @@ def modify_paragraph_50_from_table2(word_doc_path, log_status=None):
         
         log_status(f"提取的数据 - 第二列: '{second_col_value}', 第五列: '{fifth_col_value}', 第六列: '{sixth_col_value}'")
         
-        # 查找段落50
-        if len(doc.paragraphs) < 50:
-            log_status(f"错误：文档只有 {len(doc.paragraphs)} 个段落，无法找到段落50")
+        # 查找段落50（结论段落锚点）
+        paragraph_50 = resolve_conclusion_paragraph(doc, anchors, 50, log_status)
+        if paragraph_50 is None:
             return False
-        
-        paragraph_50 = doc.paragraphs[49]  # 段落50，索引为49
         original_text = paragraph_50.text
         log_status(f"段落50原始内容: '{original_text}'")
         
         # 检查段落50是否符合预期格式
         expected_text = "<w:rPr><w:b w:val=\"0\"/></w:rPr>（1）本次对进行压实度检测，检测点数为个，合格点数为个，合格率为100%。"
         if original_text != expected_text:
-            log_status(f"警告：段落50内容与预期不符。实际: '{original_text}', 预期: '{expected_text}'")
+            log_status.warning(f"警告：段落50内容与预期不符。实际: '{original_text}', 预期: '{expected_text}'")
         
         log_status(f"段落50原内容: '{original_text}'")
         
         # 更新段落50内容，分段设置格式（保持原格式但让100%加粗）
         paragraph_50.clear()
         
-        # 创建多个run来实现不同的格式
-        # 设置字体格式：宋体小四（12pt）用于中文，Times New Roman小四（12pt）用于数字
-        chinese_font_name = "宋体"
-        number_font_name = "Times New Roman"
-        font_size = Pt(12)  # 小四号字体
-        font_italic = False
-        
         # 设置段落格式：首行缩进2字符，两端对齐
         paragraph_50.paragraph_format.first_line_indent = Pt(24)  # 2字符缩进（12pt * 2）
         paragraph_50.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # 两端对齐
         
-        # 第一部分：本次对...进行压实度检测（中文部分）
-        run1 = paragraph_50.add_run("本次对")
-        run1.font.name = chinese_font_name
-        run1.font.size = font_size
-        run1.font.bold = False
-        run1.font.italic = font_italic
-        
-        # 第二部分：数字部分（第二列值）
-        run2 = paragraph_50.add_run(second_col_value)
-        run2.font.name = number_font_name
-        run2.font.size = font_size
-        run2.font.bold = False
-        run2.font.italic = font_italic
-        
-        # 第三部分：进行压实度检测，检测点数为（中文部分）
-        run3 = paragraph_50.add_run("进行压实度检测，检测点数为")
-        run3.font.name = chinese_font_name
-        run3.font.size = font_size
-        run3.font.bold = False
-        run3.font.italic = font_italic
-        
-        # 第四部分：检测点数（第五列值）
-        run4 = paragraph_50.add_run(fifth_col_value)
-        run4.font.name = number_font_name
-        run4.font.size = font_size
-        run4.font.bold = False
-        run4.font.italic = font_italic
-        
-        # 第五部分：个，合格点数为（中文部分）
-        run5 = paragraph_50.add_run("个，合格点数为")
-        run5.font.name = chinese_font_name
-        run5.font.size = font_size
-        run5.font.bold = False
-        run5.font.italic = font_italic
-        
-        # 第六部分：合格点数（第六列值）
-        run6 = paragraph_50.add_run(sixth_col_value)
-        run6.font.name = number_font_name
-        run6.font.size = font_size
-        run6.font.bold = False
-        run6.font.italic = font_italic
-        
-        # 第七部分：个，合格率为（中文部分）
-        run7 = paragraph_50.add_run("个，合格率为")
-        run7.font.name = chinese_font_name
-        run7.font.size = font_size
-        run7.font.bold = False
-        run7.font.italic = font_italic
-        
-        # 第八部分：100%（加粗，使用Times New Roman字体）
-        run8 = paragraph_50.add_run("100%")
-        run8.font.name = number_font_name
-        run8.font.size = font_size
-        run8.font.bold = True   # 100%加粗
-        run8.font.italic = font_italic
-        
-        # 第九部分：句号
-        run9 = paragraph_50.add_run("。")
-        run9.font.name = chinese_font_name
-        run9.font.size = font_size
-        run9.font.bold = False
-        run9.font.italic = font_italic
-        
-        final_text = f"本次对{second_col_value}进行压实度检测，检测点数为{fifth_col_value}个，合格点数为{sixth_col_value}个，合格率为100%。"
+        # 通过结论句模板渲染内容：宋体小四（12pt）用于中文，Times New Roman小四（12pt）用于数字，100%加粗
+        final_text = render_paragraph_template(
+            get_conclusion_sentence_template(set_run_font_basic),
+            paragraph_50,
+            location=second_col_value,
+            points=fifth_col_value,
+            qualified=sixth_col_value,
+        )
         log_status(f"段落50新内容: '{final_text}' (其中100%为加粗)")
         
         # 保存文档
@@ -1695,15 +2253,14 @@ def modify_paragraph_50_from_table2(word_doc_path, log_status=None):
         return True
         
     except Exception as e:
-        log_status(f"修改段落50时出错: {e}")
+        log_status.error(f"修改段落50时出错: {e}")
         import traceback
         traceback.print_exc()
         return False
 
 def modify_paragraph_51_from_table2(word_doc_path, log_status=None):
     """从表2中提取第四行数据并更新段落51的内容"""
-    if log_status is None:
-        log_status = print
+    log_status = as_status_logger(log_status)
     
     try:
         from docx import Document
@@ -1713,56 +2270,19 @@ def modify_paragraph_51_from_table2(word_doc_path, log_status=None):
         # 打开Word文档
         doc = Document(word_doc_path)
         
+        # 一次遍历建立锚点索引，表2和结论段落都按名称定位
+        anchors = build_anchor_index(doc)
+        
         # 查找"表2"表格
-        table2 = None
-        table2_title_paragraph = None
-        
-        # 查找表2标题段落
-        for para in doc.paragraphs:
-            para_text = para.text.strip()
-            # 尝试匹配多种可能的表2标题格式
-            if any(variant in para_text for variant in [
-                "表2 压实度检测结果评定表",
-                "表2  压实度检测结果评定表",  # 两个空格
-                "表2压实度检测结果评定表",    # 无空格
-                "表2：压实度检测结果评定表",  # 冒号分隔
-                "表2.压实度检测结果评定表",   # 点号分隔
-                "表2-压实度检测结果评定表",   # 短横线分隔
-                "表2 压实度检测结果",         # 可能省略部分标题
-                "表2 压实度评定表"            # 更简化的标题
-            ]):
-                log_status(f"找到表2标题段落: '{para_text}'")
-                table2_title_paragraph = para
-                
-                # 查找段落后的表格
-                try:
-                    from lxml import etree
-                    para_elem = para._element
-                    next_elem = para_elem.getnext()
-                    while next_elem is not None:
-                        if next_elem.tag.endswith('tbl'):
-                            # 匹配对应的表格对象
-                            for table in doc.tables:
-                                if table._element is next_elem:
-                                    table2 = table
-                                    log_status(f"找到表2表格，包含 {len(table.rows)} 行，{len(table.columns)} 列")
-                                    break
-                            if table2:
-                                break
-                        next_elem = next_elem.getnext()
-                    if table2:
-                        break
-                except Exception as e:
-                    log_status(f"通过XML路径查找表2出错: {e}")
-                    continue
+        table2 = find_table2(doc, anchors, log_status)
         
         if not table2:
-            log_status("错误：未找到'表2'表格")
+            log_status.error("错误：未找到'表2'表格")
             return False
         
         # 提取第四行（索引3）的数据
         if len(table2.rows) <= 3:
-            log_status(f"错误：表2只有 {len(table2.rows)} 行，无法找到第四行")
+            log_status.error(f"错误：表2只有 {len(table2.rows)} 行，无法找到第四行")
             return False
         
         fourth_row = table2.rows[3]  # 第四行
@@ -1770,7 +2290,7 @@ def modify_paragraph_51_from_table2(word_doc_path, log_status=None):
         
         # 提取第二列、第五列、第六列的数据
         if len(fourth_row.cells) < 6:
-            log_status(f"错误：表2第四行只有 {len(fourth_row.cells)} 列，不足以提取需要的数据")
+            log_status.error(f"错误：表2第四行只有 {len(fourth_row.cells)} 列，不足以提取需要的数据")
             return False
         
         second_col_value = fourth_row.cells[1].text.strip() if len(fourth_row.cells) > 1 else ""
@@ -1779,107 +2299,42 @@ def modify_paragraph_51_from_table2(word_doc_path, log_status=None):
         
         log_status(f"提取的数据 - 第二列: '{second_col_value}', 第五列: '{fifth_col_value}', 第六列: '{sixth_col_value}'")
         
-        # 查找段落51
-        if len(doc.paragraphs) < 51:
-            log_status(f"错误：文档只有 {len(doc.paragraphs)} 个段落，无法找到段落51")
+        # 查找段落51（结论段落锚点之后的下一个段落）
+        template_paragraph = resolve_conclusion_paragraph(doc, anchors, 50, log_status)
+        if template_paragraph is None:
             return False
-        
-        paragraph_51 = doc.paragraphs[50]  # 段落51，索引为50
+        paragraph_51 = next_body_paragraph(doc, template_paragraph)
         original_text = paragraph_51.text
         log_status(f"段落51原始内容: '{original_text}'")
         
         # 检查段落51是否符合预期格式
         expected_text = "<w:rPr><w:b w:val=\"0\"/></w:rPr>（2）本次对进行压实度检测，检测点数为个，合格点数为个，合格率为100%。"
         if original_text != expected_text:
-            log_status(f"警告：段落51内容与预期不符。实际: '{original_text}', 预期: '{expected_text}'")
+            log_status.warning(f"警告：段落51内容与预期不符。实际: '{original_text}', 预期: '{expected_text}'")
         
         # 更新段落51内容，分段设置格式（保持原格式但让100%加粗）
         paragraph_51.clear()
         
         # 复制段落50的缩进与对齐
         try:
-            template_paragraph = doc.paragraphs[49]
             paragraph_51.paragraph_format.left_indent = template_paragraph.paragraph_format.left_indent
             paragraph_51.paragraph_format.first_line_indent = template_paragraph.paragraph_format.first_line_indent
             paragraph_51.paragraph_format.alignment = template_paragraph.paragraph_format.alignment
         except Exception:
             pass
         
-        # 创建多个run来实现不同的格式
-        # 设置字体格式：宋体小四（12pt）用于中文，Times New Roman小四（12pt）用于数字
-        chinese_font_name = "宋体"
-        number_font_name = "Times New Roman"
-        font_size = Pt(12)  # 小四号字体
-        font_italic = False
-        
         # 设置段落格式：首行缩进2字符，两端对齐
         paragraph_51.paragraph_format.first_line_indent = Pt(24)  # 2字符缩进（12pt * 2）
         paragraph_51.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # 两端对齐
         
-        # 第一部分：本次对...进行压实度检测（中文部分）
-        run1 = paragraph_51.add_run("本次对")
-        run1.font.name = chinese_font_name
-        run1.font.size = font_size
-        run1.font.bold = False
-        run1.font.italic = font_italic
-        
-        # 第二部分：数字部分（第二列值）
-        run2 = paragraph_51.add_run(second_col_value)
-        run2.font.name = number_font_name
-        run2.font.size = font_size
-        run2.font.bold = False
-        run2.font.italic = font_italic
-        
-        # 第三部分：进行压实度检测，检测点数为（中文部分）
-        run3 = paragraph_51.add_run("进行压实度检测，检测点数为")
-        run3.font.name = chinese_font_name
-        run3.font.size = font_size
-        run3.font.bold = False
-        run3.font.italic = font_italic
-        
-        # 第四部分：检测点数（第五列值）
-        run4 = paragraph_51.add_run(fifth_col_value)
-        run4.font.name = number_font_name
-        run4.font.size = font_size
-        run4.font.bold = False
-        run4.font.italic = font_italic
-        
-        # 第五部分：个，合格点数为（中文部分）
-        run5 = paragraph_51.add_run("个，合格点数为")
-        run5.font.name = chinese_font_name
-        run5.font.size = font_size
-        run5.font.bold = False
-        run5.font.italic = font_italic
-        
-        # 第六部分：合格点数（第六列值）
-        run6 = paragraph_51.add_run(sixth_col_value)
-        run6.font.name = number_font_name
-        run6.font.size = font_size
-        run6.font.bold = False
-        run6.font.italic = font_italic
-        
-        # 第七部分：个，合格率为（中文部分）
-        run7 = paragraph_51.add_run("个，合格率为")
-        run7.font.name = chinese_font_name
-        run7.font.size = font_size
-        run7.font.bold = False
-        run7.font.italic = font_italic
-        
-        # 第八部分：100%（加粗，使用Times New Roman字体）
-        run8 = paragraph_51.add_run("100%")
-        run8.font.name = number_font_name
-        run8.font.size = font_size
-        run8.font.bold = True   # 100%加粗
-        run8.font.italic = font_italic
-        
-        # 第九部分：句号
-        run9 = paragraph_51.add_run("。")
-        run9.font.name = chinese_font_name
-        run9.font.size = font_size
-        run9.font.bold = False
-        run9.font.italic = font_italic
-        
-        final_text = f"本次对{second_col_value}进行压实度检测，检测点数为{fifth_col_value}个，合格点数为{sixth_col_value}个，合格率为100%。"
+        # 通过结论句模板渲染内容：宋体小四（12pt）用于中文，Times New Roman小四（12pt）用于数字，100%加粗
+        final_text = render_paragraph_template(
+            get_conclusion_sentence_template(set_run_font_basic),
+            paragraph_51,
+            location=second_col_value,
+            points=fifth_col_value,
+            qualified=sixth_col_value,
+        )
         log_status(f"段落51新内容: '{final_text}' (其中100%为加粗)")
         
         # 保存文档
@@ -1889,21 +2344,159 @@ def modify_paragraph_51_from_table2(word_doc_path, log_status=None):
         return True
         
     except Exception as e:
-        log_status(f"修改段落51时出错: {e}")
+        log_status.error(f"修改段落51时出错: {e}")
         import traceback
         traceback.print_exc()
         return False
 
+# 基于锚点的段落插入
+# 锚点直接持有正文中段落的 lxml 元素引用。插入只修改锚点相邻的兄弟节点，
+# 不需要通过 doc.paragraphs[索引] 重新定位（每次访问 doc.paragraphs 都会重建整个段落列表）。
+
+def anchor_element(anchor):
+    """返回锚点对应的 lxml 元素，锚点可以是 Paragraph 对象或元素本身"""
+    return anchor._element if hasattr(anchor, '_element') else anchor
+
+def new_detached_paragraph(doc):
+    """创建一个尚未挂入文档的空段落，与 doc.add_paragraph() 生成的元素一致"""
+    return Paragraph(OxmlElement('w:p'), doc._body)
+
+def insert_paragraphs_before(doc, anchor, count, configure=None):
+    """在锚点之前批量插入 count 个新段落，返回按文档顺序排列的新段落列表"""
+    anchor_elem = anchor_element(anchor)
+    new_paragraphs = []
+    for _ in range(count):
+        paragraph = new_detached_paragraph(doc)
+        if configure:
+            configure(paragraph)
+        anchor_elem.addprevious(paragraph._element)
+        new_paragraphs.append(paragraph)
+    return new_paragraphs
+
+def insert_paragraph_after(anchor, paragraph):
+    """将段落插入到锚点之后（段落若已在文档中则会被移动）"""
+    anchor_element(anchor).addnext(paragraph._element)
+    return paragraph
+
+def iter_body_paragraphs_from(doc, anchor):
+    """从锚点段落开始（包含锚点）依次产出后续的正文段落，跳过表格"""
+    elem = anchor_element(anchor)
+    while elem is not None:
+        if elem.tag == qn('w:p'):
+            yield Paragraph(elem, doc._body)
+        elem = elem.getnext()
+
+def next_body_paragraph(doc, anchor):
+    """返回锚点之后的下一个正文段落（跳过表格），不存在时在文档末尾追加一个新段落"""
+    elem = anchor_element(anchor).getnext()
+    while elem is not None:
+        if elem.tag == qn('w:p'):
+            return Paragraph(elem, doc._body)
+        elem = elem.getnext()
+    return doc.add_paragraph()
+
+# 模板命名锚点
+# 模板中的关键位置按名称寻址：优先使用同名的 Word 书签（如在结论段落上插入名为 conclusion 的书签），
+# 没有书签时按标记文本识别。索引只需遍历一次正文即可建立，之后按名称 O(1) 取得段落。
+
+TABLE2_TITLE_VARIANTS = [
+    "表2 压实度检测结果评定表",  # 原格式
+    "表2  压实度检测结果评定表",  # 两个空格
+    "表2压实度检测结果评定表",    # 无空格
+    "表2：压实度检测结果评定表",  # 冒号分隔
+    "表2.压实度检测结果评定表",   # 点号分隔
+    "表2-压实度检测结果评定表",   # 短横线分隔
+    "表2 压实度检测结果",         # 可能省略部分标题
+    "表2 压实度评定表"            # 更简化的标题
+]
+
+ANCHOR_TABLE2_TITLE = "table2_title"      # 表2 压实度检测结果评定表 标题段落
+ANCHOR_CONCLUSION = "conclusion"          # 第一个"本次对…进行压实度检测…"结论段落
+ANCHOR_APPENDIX_TITLE = "appendix_title"  # 独立附表标题（不含数字）
+
+def is_table2_title_text(text):
+    """判断段落文本是否为表2标题"""
+    text = text.strip()
+    return any(variant in text for variant in TABLE2_TITLE_VARIANTS)
+
+def is_conclusion_text(text):
+    """判断段落文本是否为压实度检测结论句"""
+    return "本次对" in text and "压实度检测" in text
+
+def is_independent_appendix_title_text(text):
+    """判断段落文本是否为不含数字的独立附表标题"""
+    return "附表" in text and not any(char.isdigit() for char in text if char.strip())
+
+ANCHOR_MARKERS = {
+    ANCHOR_TABLE2_TITLE: is_table2_title_text,
+    ANCHOR_CONCLUSION: is_conclusion_text,
+    ANCHOR_APPENDIX_TITLE: is_independent_appendix_title_text,
+}
+
+def build_anchor_index(doc, markers=ANCHOR_MARKERS):
+    """遍历一次正文段落，返回 {锚点名称: 段落}；书签优先于标记文本"""
+    bookmarks = {}
+    marked = {}
+    pending = dict(markers)
+    for p in doc.element.body.iterchildren(qn('w:p')):
+        for bookmark in p.iter(qn('w:bookmarkStart')):
+            name = bookmark.get(qn('w:name'))
+            if name and name not in bookmarks:
+                bookmarks[name] = p
+        if pending:
+            text = Paragraph(p, doc._body).text
+            for name, matches in list(pending.items()):
+                if matches(text):
+                    marked[name] = p
+                    del pending[name]
+    marked.update(bookmarks)
+    return {name: Paragraph(p, doc._body) for name, p in marked.items()}
+
+def find_table2(doc, anchors, log_status):
+    """通过锚点索引定位"表2 压实度检测结果评定表"标题后的表格"""
+    title_paragraph = anchors.get(ANCHOR_TABLE2_TITLE)
+    if title_paragraph is None:
+        return None
+    log_status(f"找到表2标题段落: '{title_paragraph.text.strip()}'")
+    table2 = find_table_after(doc, title_paragraph)
+    if table2 is not None:
+        log_status(f"找到表2表格，包含 {len(table2.rows)} 行，{len(table2.columns)} 列")
+    return table2
+
+def resolve_conclusion_paragraph(doc, anchors, paragraph_num, log_status):
+    """返回结论段落锚点；模板中没有该锚点时回退到按段落编号（从1开始）定位"""
+    paragraph = anchors.get(ANCHOR_CONCLUSION)
+    if paragraph is not None:
+        return paragraph
+    paragraphs = doc.paragraphs
+    if len(paragraphs) < paragraph_num:
+        log_status.error(f"错误：未找到结论段落锚点，且文档只有 {len(paragraphs)} 个段落，无法找到段落{paragraph_num}")
+        return None
+    log_status.warning(f"警告：未找到结论段落锚点，回退到段落{paragraph_num}")
+    return paragraphs[paragraph_num - 1]
+
+def find_table_after(doc, anchor):
+    """返回锚点之后的第一个正文表格，不存在时返回 None"""
+    elem = anchor_element(anchor).getnext()
+    while elem is not None:
+        if elem.tag == qn('w:tbl'):
+            return Table(elem, doc._body)
+        elem = elem.getnext()
+    return None
+
 # 查找独立附表标题整体部分
 # 在执行段落50的复制新增操作期间，需要实现交叉运行机制
 # 每当完成一个新增段落的复制插入后，立即根据该新增段落的行数，对"独立附表标题整体部分"执行向下移动操作
 # 移动行数与新增段落的行数完全一致
 # 移动方式通过在"独立附表标题（无数字）"的上一行连续按下两次Enter键实现换行
 
-def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, log_status=None):
-    """处理表2所有后续行，从第4行开始，自动修改对应段落或复制段落50创建新段落"""
-    if log_status is None:
-        log_status = print
+def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, log_status=None, report=None):
+    """处理表2所有后续行，从结论段落锚点开始，自动修改对应段落或创建新段落
+
+    start_paragraph 仅在模板中没有结论段落锚点时作为回退的段落编号。
+    传入 report 时分别记录结论段落和后处理阶段的耗时。word_doc_path 也可以是二进制流，结果写回该流。
+    """
+    log_status = as_status_logger(log_status)
     
     try:
         from docx import Document
@@ -1914,92 +2507,49 @@ def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, lo
         
         log_status(f"开始处理表2所有后续行，从第4行开始...")
         
-        # 打开Word文档
-        doc = Document(word_doc_path)
+        with report_stage(report, 'conclusion_paragraphs'):
+            # 打开Word文档
+            doc = open_docx(word_doc_path)
         
-        # 查找独立附表标题（无数字标识）及其后续生成的所有附表内容
-        # 这将作为需要下移的整体部分
-        independent_schedule_title = None
-        independent_schedule_content_start = None
-        
-        for para_idx, para in enumerate(doc.paragraphs):
-            # 查找独立的"附表"标题（无数字标识）
-            if "附表" in para.text and not any(char.isdigit() for char in para.text if char.strip()):
-                log_status(f"找到独立附表标题，索引: {para_idx}, 内容: '{para.text}'")
-                independent_schedule_title = para
-                independent_schedule_content_start = para_idx
-                break
+            # 一次遍历建立锚点索引：表2标题、结论段落和独立附表标题都按名称定位
+            anchors = build_anchor_index(doc)
+        
+            # 查找独立附表标题（无数字标识）及其后续生成的所有附表内容
+            # 这将作为需要下移的整体部分
+            independent_schedule_title = anchors.get(ANCHOR_APPENDIX_TITLE)
         
-        if not independent_schedule_title:
-            log_status("警告：未找到独立附表标题，将跳过交叉运行机制")
+            if independent_schedule_title:
+                log_status(f"找到独立附表标题: '{independent_schedule_title.text}'")
+            else:
+                log_status.warning("警告：未找到独立附表标题，将跳过交叉运行机制")
             
-        # 查找"表2"表格
-        table2 = None
-        log_status("查找表2表格...")
-        
-        # 查找表2标题段落
-        for para in doc.paragraphs:
-            para_text = para.text.strip()
-            # 尝试匹配多种可能的表2标题格式
-            if any(variant in para_text for variant in [
-                "表2 压实度检测结果评定表",
-                "表2  压实度检测结果评定表",  # 两个空格
-                "表2压实度检测结果评定表",    # 无空格
-                "表2：压实度检测结果评定表",  # 冒号分隔
-                "表2.压实度检测结果评定表",   # 点号分隔
-                "表2-压实度检测结果评定表",   # 短横线分隔
-                "表2 压实度检测结果",         # 可能省略部分标题
-                "表2 压实度评定表"            # 更简化的标题
-            ]):
-                log_status(f"找到表2标题段落: '{para_text}'")
-                
-                # 查找段落后的表格
-                try:
-                    from lxml import etree
-                    para_elem = para._element
-                    next_elem = para_elem.getnext()
-                    while next_elem is not None:
-                        if next_elem.tag.endswith('tbl'):
-                            # 匹配对应的表格对象
-                            for table in doc.tables:
-                                if table._element is next_elem:
-                                    table2 = table
-                                    log_status(f"找到表2表格，包含 {len(table2.rows)} 行，{len(table2.columns)} 列")
-                                    break
-                            if table2:
-                                break
-                        next_elem = next_elem.getnext()
-                    if table2:
-                        break
-                except Exception as e:
-                    log_status(f"通过XML路径查找表2出错: {e}")
-                    continue
+            # 查找"表2"表格
+            log_status("查找表2表格...")
+            table2 = find_table2(doc, anchors, log_status)
         
-        if not table2:
-            log_status("错误：未找到'表2'表格")
-            return False
+            if not table2:
+                log_status.error("错误：未找到'表2'表格")
         
         # 重写处理表2并生成新段落的逻辑
-        def process_table2_and_generate_paragraphs(doc, table2, start_paragraph, independent_schedule_title=None, independent_schedule_content_start=None, log_status=None):
+        def process_table2_and_generate_paragraphs(doc, table2, start_paragraph, anchors, independent_schedule_title=None, log_status=None):
             """
             处理表2 压实度检测结果评定表，并根据表中数据生成新段落
             
             参数:
             doc: 文档对象
             table2: 表2对象
-            start_paragraph: 开始处理的段落编号
-            independent_schedule_title: 独立附表标题段落
-            independent_schedule_content_start: 独立附表内容开始索引
+            start_paragraph: 开始处理的段落编号（模板中没有结论段落锚点时使用）
+            anchors: 模板锚点索引
+            independent_schedule_title: 独立附表标题段落（作为空行插入的锚点）
             log_status: 日志记录函数
             
             返回:
             bool: 处理是否成功
             """
-            if log_status is None:
-                log_status = print
+            log_status = as_status_logger(log_status)
             
             if not table2:
-                log_status("错误：未找到表2 压实度检测结果评定表")
+                log_status.error("错误：未找到表2 压实度检测结果评定表")
                 return False
             
             log_status(f"开始处理表2 压实度检测结果评定表，共{len(table2.rows)}行")
@@ -2007,98 +2557,79 @@ def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, lo
             # 从第3行开始处理（索引为2）
             start_row = 2
             
-            # 检查是否有足够的段落作为模板
-            if len(doc.paragraphs) < start_paragraph:
-                log_status(f"错误：文档只有{len(doc.paragraphs)}个段落，无法找到段落{start_paragraph}作为模板")
-                return False
+            with report_stage(report, 'conclusion_paragraphs'):
+                # 模板段落优先取结论段落锚点，模板中没有该锚点时才回退到第start_paragraph个段落
+                template_paragraph = resolve_conclusion_paragraph(doc, anchors, start_paragraph, log_status)
+                if template_paragraph is None:
+                    return False
             
-            # 跟踪最后一个处理的段落索引
-            last_paragraph_index = -1
+                # 之后以锚点逐行向后推进，不再重建段落列表
+                cursor_paragraph = template_paragraph
+                cursor_row = start_row
             
-            # 处理表2的数据行
-            for row_index in range(start_row, len(table2.rows)):
-                current_row = table2.rows[row_index]
-                
-                # 跳过列数不足的行
-                if len(current_row.cells) < 6:
-                    log_status(f"跳过第{row_index+1}行，列数不足")
-                    continue
-                
-                # 检查第一列是否为数字（过滤非数据行）
-                first_cell_text = current_row.cells[0].text.strip()
-                if not first_cell_text or not first_cell_text.isdigit():
-                    log_status(f"跳过第{row_index+1}行，第一列不是数字: '{first_cell_text}'")
-                    continue
-                
-                # 提取需要的数据
-                second_col_value = current_row.cells[1].text.strip() if len(current_row.cells) > 1 else ""
-                fifth_col_value = current_row.cells[4].text.strip() if len(current_row.cells) > 4 else ""
-                sixth_col_value = current_row.cells[5].text.strip() if len(current_row.cells) > 5 else ""
-                
-                log_status(f"\n处理表2第{row_index+1}行:")
-                log_status(f"提取数据 - 第二列: '{second_col_value}', 第五列: '{fifth_col_value}', 第六列: '{sixth_col_value}'")
-                
-                # 计算目标段落索引（从start_paragraph开始）
-                target_paragraph_index = start_paragraph - 1 + (row_index - start_row)
-                target_paragraph_num = target_paragraph_index + 1
-                
-                # 获取或创建目标段落
-                if len(doc.paragraphs) <= target_paragraph_index:
-                    target_paragraph = doc.add_paragraph()
-                    log_status(f"创建新段落{target_paragraph_num}")
-                else:
-                    target_paragraph = doc.paragraphs[target_paragraph_index]
+                # 跟踪最后一个处理的段落
+                last_paragraph = None
+            
+                # 处理表2的数据行
+                for row_index in range(start_row, len(table2.rows)):
+                    current_row = table2.rows[row_index]
+                
+                    # 跳过列数不足的行
+                    if len(current_row.cells) < 6:
+                        log_status(f"跳过第{row_index+1}行，列数不足")
+                        continue
+                
+                    # 检查第一列是否为数字（过滤非数据行）
+                    first_cell_text = current_row.cells[0].text.strip()
+                    if not first_cell_text or not first_cell_text.isdigit():
+                        log_status(f"跳过第{row_index+1}行，第一列不是数字: '{first_cell_text}'")
+                        continue
+                
+                    # 提取需要的数据
+                    second_col_value = current_row.cells[1].text.strip() if len(current_row.cells) > 1 else ""
+                    fifth_col_value = current_row.cells[4].text.strip() if len(current_row.cells) > 4 else ""
+                    sixth_col_value = current_row.cells[5].text.strip() if len(current_row.cells) > 5 else ""
+                
+                    log_status(f"\n处理表2第{row_index+1}行:")
+                    log_status(f"提取数据 - 第二列: '{second_col_value}', 第五列: '{fifth_col_value}', 第六列: '{sixth_col_value}'")
+                
+                    # 目标结论段落序号（从1开始，表2每行对应一个段落）
+                    target_paragraph_num = row_index - start_row + 1
+                
+                    # 将锚点推进到当前行对应的段落，段落不足时在文档末尾追加
+                    while cursor_row < row_index:
+                        cursor_paragraph = next_body_paragraph(doc, cursor_paragraph)
+                        cursor_row += 1
+                    target_paragraph = cursor_paragraph
                     # 清空现有内容
                     target_paragraph.clear()
-                    log_status(f"准备修改段落{target_paragraph_num}")
+                    log_status(f"准备修改结论段落{target_paragraph_num}")
                 
-                # 设置段落格式
-                set_paragraph_format(target_paragraph, log_status)
+                    # 设置段落格式
+                    set_paragraph_format(target_paragraph, log_status)
                 
-                # 应用编号格式
-                apply_numbering_format(target_paragraph, doc, start_paragraph, target_paragraph_num, log_status)
+                    # 应用编号格式
+                    apply_numbering_format(target_paragraph, template_paragraph, target_paragraph_num, log_status)
                 
-                # 构建并设置段落内容
-                build_paragraph_content(target_paragraph, second_col_value, fifth_col_value, sixth_col_value, log_status)
+                    # 构建并设置段落内容
+                    build_paragraph_content(target_paragraph, second_col_value, fifth_col_value, sixth_col_value, log_status)
                 
-                # 处理交叉运行机制（移动独立附表标题）
-                if independent_schedule_title and target_paragraph_num > start_paragraph:
-                    schedule_title_index = independent_schedule_content_start
-                    # 估算新段落占用的行数
-                    paragraph_text = f"本次对{second_col_value}进行压实度检测，检测点数为{fifth_col_value}个，合格点数为{sixth_col_value}个，合格率为100%。"
-                    estimated_lines = max(1, int(len(paragraph_text) / 30) + 1)
-                    
-                    log_status(f"执行交叉运行机制：为段落{target_paragraph_num}在独立附表标题前添加{estimated_lines}个空行")
-                    # 在独立附表标题前添加空段落以实现下移
-                    for _ in range(estimated_lines):
-                        empty_para = doc.add_paragraph()
-                        empty_para.paragraph_format.line_spacing = 1.5
-                        empty_para.paragraph_format.space_after = 0
-                        # 将空段落移动到独立附表标题前
-                        move_paragraph_before(empty_para, independent_schedule_title)
+                    # 处理交叉运行机制（移动独立附表标题）
+                    if independent_schedule_title and target_paragraph_num > 1:
+                        # 估算新段落占用的行数
+                        paragraph_text = f"本次对{second_col_value}进行压实度检测，检测点数为{fifth_col_value}个，合格点数为{sixth_col_value}个，合格率为100%。"
+                        estimated_lines = max(1, int(len(paragraph_text) / 30) + 1)
                     
-                    # 更新独立附表标题引用
-                    independent_schedule_title = doc.paragraphs[schedule_title_index + estimated_lines]
-                    independent_schedule_content_start = schedule_title_index + estimated_lines
+                        log_status(f"执行交叉运行机制：为结论段落{target_paragraph_num}在独立附表标题前添加{estimated_lines}个空行")
+                        # 在独立附表标题前批量插入空段落以实现下移，标题锚点本身保持不变
+                        insert_paragraphs_before(doc, independent_schedule_title, estimated_lines, configure=format_spacer_paragraph)
                 
-                # 更新最后处理的段落索引
-                last_paragraph_index = target_paragraph_index
-            
-            # 在最后一个处理的段落之后添加日期段落
-            if last_paragraph_index != -1:
-                add_date_paragraph(doc, last_paragraph_index, log_status)
-                # 关键：添加日期后终止换行移动操作
-                independent_schedule_title = None
-            
-            # 检测并删除空白页
-            remove_blank_pages(doc, log_status)
-            
-            # 将包含"附表"的标题移动到新页面顶部
-            move_schedule_title_to_new_page(doc, log_status)
+                    # 更新最后处理的段落
+                    last_paragraph = target_paragraph
             
-            # 保存文档
-            doc.save(word_doc_path)
-            log_status(f"所有段落已更新并保存到: {word_doc_path}")
+                # 在最后一个处理的段落之后添加日期段落
+                if last_paragraph is not None:
+                    add_date_paragraph(doc, last_paragraph, log_status)
             
             log_status("表2数据处理完成")
             return True
@@ -2112,165 +2643,96 @@ def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, lo
                 paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
                 log_status("已设置段落格式：首行缩进2字符，两端对齐")
             except Exception as e:
-                log_status(f"设置段落格式时出错: {e}")
+                log_status.error(f"设置段落格式时出错: {e}")
+        
+        def format_spacer_paragraph(paragraph):
+            """设置交叉运行机制中下移用空行的格式"""
+            paragraph.paragraph_format.line_spacing = 1.5
+            paragraph.paragraph_format.space_after = 0
         
-        def apply_numbering_format(paragraph, doc, start_paragraph, target_paragraph_num, log_status):
+        def apply_numbering_format(paragraph, template_para, target_paragraph_num, log_status):
             """应用Word自动编号格式"""
             try:
-                # 获取模板段落（通常是第start_paragraph个段落）
-                template_para = doc.paragraphs[start_paragraph - 1]
+                # 模板段落（结论段落锚点）由调用方传入
                 template_element = template_para._element
                 
                 # 查找编号属性
-                template_num_pr = template_element.xpath('.//w:numPr')
+                template_num_pr = XPATH['numPr'](template_element)
                 if not template_num_pr:
-                    log_status(f"警告：段落{start_paragraph}没有找到编号格式模板")
+                    log_status.warning("警告：结论模板段落没有找到编号格式模板")
                     return
                 
                 # 复制编号属性到目标段落
                 target_element = paragraph._element
                 
                 # 确保目标段落有pPr元素
-                target_p_pr = target_element.xpath('.//w:pPr')
+                target_p_pr = XPATH['pPr'](target_element)
                 if not target_p_pr:
-                    from docx.oxml import parse_xml
                     p_pr = parse_xml('<w:pPr xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>')
                     target_element.insert(0, p_pr)
-                    target_p_pr = target_element.xpath('.//w:pPr')
+                    target_p_pr = XPATH['pPr'](target_element)
                 
                 if target_p_pr:
-                    from lxml import etree
                     cloned_num_pr = etree.fromstring(etree.tostring(template_num_pr[0]))
                     target_p_pr[0].append(cloned_num_pr)
-                    log_status(f"已为段落{target_paragraph_num}设置自动编号")
+                    log_status(f"已为结论段落{target_paragraph_num}设置自动编号")
                     
                     # 确保编号字体为常规（不加粗）
-                    ensure_normal_font_for_numbering(target_element, log_status)
+                    ensure_normal_font_for_numbering(target_element, log_status, cloned_num_pr=cloned_num_pr)
                 else:
-                    log_status(f"警告：无法为段落{target_paragraph_num}设置编号格式")
+                    log_status.warning(f"警告：无法为结论段落{target_paragraph_num}设置编号格式")
             except Exception as e:
-                log_status(f"设置段落{target_paragraph_num}编号格式时出错: {e}")
+                log_status.error(f"设置结论段落{target_paragraph_num}编号格式时出错: {e}")
         
-        def ensure_normal_font_for_numbering(element, log_status):
+        def ensure_normal_font_for_numbering(element, log_status, cloned_num_pr=None):
             """确保编号字体为常规样式（不加粗）"""
             try:
                 # 移除编号相关的加粗设置
-                num_font_elements = element.xpath('.//w:numPr//w:rPr//w:b')
+                num_font_elements = XPATH['numPr_bold'](element)
                 for font_elem in num_font_elements:
                     font_elem.getparent().remove(font_elem)
                 
-                # 为所有编号相关元素添加常规字体设置
-                num_pr_elements = element.xpath('.//w:numPr')
+                # 为段落原有的编号元素添加常规字体设置；刚复制的编号属性来自模板段落，加粗已在上一步移除，保持原样
+                num_pr_elements = XPATH['numPr'](element)
                 for num_pr in num_pr_elements:
-                    r_pr = num_pr.xpath('.//w:rPr')
+                    if num_pr is cloned_num_pr:
+                        continue
+                    r_pr = XPATH['rPr'](num_pr)
                     if not r_pr:
-                        from docx.oxml import parse_xml
                         r_pr_elem = parse_xml('<w:rPr xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>')
                         num_pr.append(r_pr_elem)
                         r_pr = [r_pr_elem]
                     
                     if r_pr:
                         # 移除现有加粗设置
-                        bold_elems = r_pr[0].xpath('.//w:b')
+                        bold_elems = XPATH['b'](r_pr[0])
                         for bold_elem in bold_elems:
                             r_pr[0].remove(bold_elem)
                         
                         # 添加常规字体设置
-                        from docx.oxml import parse_xml
                         normal_font = parse_xml('<w:b w:val="false" xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>')
                         r_pr[0].append(normal_font)
                 
                 log_status("已确保编号字体为常规样式")
             except Exception as e:
-                log_status(f"设置编号字体为常规时出错: {e}")
+                log_status.error(f"设置编号字体为常规时出错: {e}")
         
         def build_paragraph_content(paragraph, second_col_value, fifth_col_value, sixth_col_value, log_status):
-            """构建段落内容，包括不同格式的文本部分"""
-            # 字体设置
-            chinese_font_name = "宋体"
-            number_font_name = "Times New Roman"
-            font_size = Pt(12)  # 小四号字体
-            
-            # 创建多个run来实现不同的格式
-            # 第一部分：本次对...进行压实度检测（中文部分）
-            run1 = paragraph.add_run("本次对")
-            set_run_font(run1, chinese_font_name, font_size, bold=False)
-            
-            # 第二部分：数字部分（第二列值）
-            run2 = paragraph.add_run(second_col_value)
-            set_run_font(run2, number_font_name, font_size, bold=False)
-            
-            # 第三部分：进行压实度检测，检测点数为（中文部分）
-            run3 = paragraph.add_run("进行压实度检测，检测点数为")
-            set_run_font(run3, chinese_font_name, font_size, bold=False)
-            
-            # 第四部分：检测点数（第五列值）
-            run4 = paragraph.add_run(fifth_col_value)
-            set_run_font(run4, number_font_name, font_size, bold=False)
-            
-            # 第五部分：个，合格点数为（中文部分）
-            run5 = paragraph.add_run("个，合格点数为")
-            set_run_font(run5, chinese_font_name, font_size, bold=False)
-            
-            # 第六部分：合格点数（第六列值）
-            run6 = paragraph.add_run(sixth_col_value)
-            set_run_font(run6, number_font_name, font_size, bold=False)
-            
-            # 第七部分：个，合格率为（中文部分）
-            run7 = paragraph.add_run("个，合格率为")
-            set_run_font(run7, chinese_font_name, font_size, bold=False)
-            
-            # 第八部分：100%（加粗，使用Times New Roman字体）
-            run8 = paragraph.add_run("100%")
-            set_run_font(run8, number_font_name, font_size, bold=True)
-            
-            # 第九部分：句号
-            run9 = paragraph.add_run("。")
-            set_run_font(run9, chinese_font_name, font_size, bold=False)
-            
-            final_text = f"本次对{second_col_value}进行压实度检测，检测点数为{fifth_col_value}个，合格点数为{sixth_col_value}个，合格率为100%。"
+            """通过结论句模板构建段落内容，包括不同格式的文本部分"""
+            final_text = render_paragraph_template(
+                get_conclusion_sentence_template(),
+                paragraph,
+                location=second_col_value,
+                points=fifth_col_value,
+                qualified=sixth_col_value,
+            )
             log_status(f"段落内容: '{final_text}' (其中100%为加粗)")
         
-        def set_run_font(run, font_name, font_size, bold=False, italic=False):
-            """设置文本运行的字体属性"""
-            run.font.name = font_name
-            run.font.size = font_size
-            run.font.bold = bold
-            run.font.italic = italic
-            # 确保中文字体在所有语言设置中都正确应用
-            if font_name in ["宋体", "黑体", "楷体"]:
-                try:
-                    run._element.rPr.rFonts.set(qn('w:eastAsia'), font_name)
-                    run._element.rPr.rFonts.set(qn('w:ascii'), font_name)
-                    run._element.rPr.rFonts.set(qn('w:hAnsi'), font_name)
-                except:
-                    pass  # 忽略可能的异常
-        
-        def move_paragraph_before(source_para, target_para):
-            """将源段落移动到目标段落之前"""
-            try:
-                source_elem = source_para._element
-                target_elem = target_para._element
-                
-                # 从当前位置移除源段落
-                source_parent = source_elem.getparent()
-                if source_parent:
-                    source_parent.remove(source_elem)
-                    
-                    # 在目标段落之前插入源段落
-                    target_elem.addprevious(source_elem)
-            except Exception as e:
-                # 忽略可能的异常，保持程序运行
-                pass
-        
-        def add_date_paragraph(doc, last_paragraph_index, log_status):
+        def add_date_paragraph(doc, last_paragraph, log_status):
             """在最后一个处理的段落之后添加日期段落"""
             try:
-                # 获取最后一个处理的段落
-                last_paragraph = doc.paragraphs[last_paragraph_index]
-                
                 # 创建日期段落
-                date_paragraph = doc.add_paragraph()
+                date_paragraph = new_detached_paragraph(doc)
                 
                 # 设置段落格式：靠右对齐
                 date_paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.RIGHT
@@ -2282,360 +2744,264 @@ def modify_all_paragraphs_from_table2_rows(word_doc_path, start_paragraph=50, lo
                 # 设置字体格式：宋体小四加粗
                 set_run_font(date_run, "宋体", Pt(12), bold=True)
                 
-                # 将日期段落移动到最后一个处理的段落之后
-                move_paragraph_after(date_paragraph, last_paragraph)
+                # 将日期段落插入到最后一个处理的段落之后
+                insert_paragraph_after(last_paragraph, date_paragraph)
                 
                 log_status(f"已添加日期段落: '{date_text}'")
             except Exception as e:
-                log_status(f"添加日期段落时出错: {e}")
-        
-        def move_paragraph_after(source_para, target_para):
-            """将源段落移动到目标段落之后"""
-            try:
-                source_elem = source_para._element
-                target_elem = target_para._element
-                
-                # 从当前位置移除源段落
-                source_parent = source_elem.getparent()
-                if source_parent:
-                    source_parent.remove(source_elem)
-                    
-                    # 在目标段落之后插入源段落
-                    target_elem.addnext(source_elem)
-            except Exception as e:
-                # 忽略可能的异常，保持程序运行
-                pass
+                log_status.error(f"添加日期段落时出错: {e}")
         
-        def remove_blank_pages(doc, log_status):
-            """检测并删除文档中的空白页"""
-            try:
-                # 导入必要的模块
-                import re
-                from lxml import etree
-                
-                log_status("开始检测并删除文档中的空白页...")
-                
-                # 空白页检测和删除逻辑
-                paragraphs_to_remove = []
-                consecutive_empty_paragraphs = 0
-                max_empty_paragraphs = 1  # 连续空白段落的阈值
-                
-                for i, para in enumerate(doc.paragraphs):
-                    # 检查段落是否为空（没有实际内容）
-                    is_empty_para = False
-                    try:
-                        # 检查段落中是否包含分页符
-                        has_page_break = False
-                        for run in para.runs:
-                            run_element = run._element
-                            br_elements = run_element.xpath('.//w:br[@w:type="page"]')
-                            if br_elements:
-                                has_page_break = True
-                                break
-                        
-                        # 获取段落的实际文本内容（去除所有空白字符后的内容）
-                        actual_text = re.sub(r'\s+', '', para.text)
-                        
-                        # 定义空白页段落的条件
-                        if (has_page_break and actual_text == "") or actual_text == "":
-                            is_empty_para = True
-                    except Exception as ex:
-                        log_status(f"检查段落{i}是否为空时出错: {ex}")
-                        is_empty_para = False
-                    
-                    # 检测连续的空白段落
-                    if is_empty_para:
-                        consecutive_empty_paragraphs += 1
-                        
-                        # 如果发现连续的空白段落，且超过阈值，则标记为删除
-                        if consecutive_empty_paragraphs > max_empty_paragraphs:
-                            paragraphs_to_remove.append(i)
-                            log_status(f"检测到空白页相关段落，标记段落{para.text!r} (索引{i}) 为删除")
-                    else:
-                        consecutive_empty_paragraphs = 0
-                
-                # 从后向前删除标记的段落，避免索引变化
-                for i in reversed(paragraphs_to_remove):
-                    if i < len(doc.paragraphs):
-                        # 从文档中删除段落
-                        p = doc.paragraphs[i]._element
-                        p.getparent().remove(p)
-                        p._p = p._element = None
-                        log_status(f"已删除空白页相关段落，索引{i}")
-                
-                # 额外检查：如果文档末尾有空白页段落，删除它
-                if doc.paragraphs:
-                    # 检查最后几个段落是否都是空白的
-                    end_empty_count = 0
-                    for para in reversed(doc.paragraphs):
-                        try:
-                            actual_text = re.sub(r'\s+', '', para.text)
-                            if actual_text == "":
-                                end_empty_count += 1
-                            else:
-                                break
-                        except:
-                            break
-                    
-                    # 如果末尾有多个连续的空白段落，删除它们
-                    if end_empty_count > 1:
-                        for i in reversed(range(len(doc.paragraphs) - end_empty_count + 1, len(doc.paragraphs))):
-                            if i < len(doc.paragraphs):
-                                p = doc.paragraphs[i]._element
-                                p.getparent().remove(p)
-                                p._p = p._element = None
-                                log_status(f"已删除文档末尾的空白页段落，索引{i}")
-                
-                log_status("空白页检测和删除完成")
-                
-            except Exception as e:
-                log_status(f"检测和删除空白页时出错: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        def move_schedule_title_to_new_page(doc, log_status):
-            """查找包含'附表'文本但不包含数字的标题，并将其移动到新页面顶部"""
+        def move_schedule_title_to_new_page(doc, target_para, log_status):
+            """将包含'附表'文本但不包含数字的标题（由锚点传入）移动到新页面顶部"""
             try:
                 # 导入必要的模块
                 from docx.enum.text import WD_BREAK
                 
                 log_status("开始查找包含'附表'文本但不包含数字的标题，并将其移动到新页面顶部...")
                 
-                # 重新遍历文档段落，查找包含"附表"文本但不包含数字的标题
-                target_para = None
-                for para_idx, para in enumerate(doc.paragraphs):
-                    para_text = para.text.strip()
-                    # 检查是否包含"附表"文本且不包含任何数字
-                    if "附表" in para_text and not any(char.isdigit() for char in para_text if char.strip()):
-                        log_status(f"找到目标标题，索引: {para_idx}, 内容: '{para_text}'")
-                        target_para = para
-                        break
+                # 未持有标题锚点时才重新遍历文档段落，查找包含"附表"文本但不包含数字的标题
+                if target_para is None:
+                    for para_idx, para in enumerate(doc.paragraphs):
+                        para_text = para.text.strip()
+                        # 检查是否包含"附表"文本且不包含任何数字
+                        if "附表" in para_text and not any(char.isdigit() for char in para_text if char.strip()):
+                            log_status(f"找到目标标题，索引: {para_idx}, 内容: '{para_text}'")
+                            target_para = para
+                            break
+                else:
+                    log_status(f"使用独立附表标题锚点: '{target_para.text.strip()}'")
                 
                 if target_para:
                     # 在目标段落前插入分页符段落，确保标题移至新页面顶部
-                    # 创建一个新的段落用于插入分页符
-                    page_break_paragraph = doc.add_paragraph()
+                    page_break_paragraph = insert_paragraphs_before(doc, target_para, 1)[0]
                     
                     # 在新段落中添加分页符
                     run = page_break_paragraph.add_run()
                     run.add_break(WD_BREAK.PAGE)
                     
-                    # 将新段落移动到目标标题段落的前面
-                    move_paragraph_before(page_break_paragraph, target_para)
-                    
                     log_status(f"已在标题'附表'上方插入分页符段落，使其移动到新页面顶部")
                 else:
                     log_status("未找到包含'附表'文本但不包含数字的标题")
                     
             except Exception as e:
-                log_status(f"在移动标题到新页面顶部时出错: {e}")
+                log_status.error(f"在移动标题到新页面顶部时出错: {e}")
                 import traceback
                 traceback.print_exc()
         
         # 执行重写后的处理函数
-        try:
-            return process_table2_and_generate_paragraphs(
-                doc,
-                table2,
-                start_paragraph,
-                independent_schedule_title,
-                independent_schedule_content_start,
-                log_status
-            )
-        except Exception as e:
-            log_status(f"处理表2数据时出错: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-# 闭合 modify_all_paragraphs_from_table2_rows 函数
-        return True
+        result = False
+        if table2:
+            try:
+                result = process_table2_and_generate_paragraphs(
+                    doc,
+                    table2,
+                    start_paragraph,
+                    anchors,
+                    independent_schedule_title,
+                    log_status
+                )
+            except Exception as e:
+                log_status.error(f"处理表2数据时出错: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        # 单次遍历后处理：g/cm3 上标、附表标题字体、检测并删除空白页
+        # 后处理不依赖表2，结论段落生成失败时也照常执行并保存
+        with report_stage(report, 'post_passes'):
+            post_process_document(doc, log_status)
+        
+        with report_stage(report, 'conclusion_paragraphs'):
+            if result:
+                # 将包含"附表"的标题移动到新页面顶部
+                move_schedule_title_to_new_page(doc, independent_schedule_title, log_status)
+        
+            # 保存文档
+            report_progress(report, bytes_written=save_docx(doc, word_doc_path))
+            log_status(f"所有段落已更新并保存到: {describe_target(word_doc_path)}")
+        return result
     except Exception as e:
-        log_status(f"处理表2所有后续行时出错: {e}")
+        log_status.error(f"处理表2所有后续行时出错: {e}")
         import traceback
         traceback.print_exc()
         return False
 
 
+# 单次遍历的后处理访问器
+# 各项后处理（g/cm3 上标、附表标题字体、空白段落清理）以处理器的形式注册，
+# 在同一次正文遍历中依次调用，整体开销与文档大小成正比，且只需打开和保存一次文档。
+# 处理器是一个字典，可包含以下键：
+#   'paragraph':      func(paragraph)             正文段落
+#   'cell_paragraph': func(paragraph, location)   表格单元格中的段落，location 为 (表格序号, 行序号, 单元格序号)，均从1开始
+#   'finish':         func()                      遍历结束后调用（用于延迟删除等操作）
+
+def run_document_visitors(doc, handlers, log_status):
+    """对文档正文执行一次遍历，依次调用所有已注册处理器"""
+    paragraph_handlers = [h['paragraph'] for h in handlers if 'paragraph' in h]
+    cell_handlers = [h['cell_paragraph'] for h in handlers if 'cell_paragraph' in h]
+    body = doc._body
+    table_idx = 0
+    for elem in doc.element.body.iterchildren():
+        if elem.tag == qn('w:p'):
+            if paragraph_handlers:
+                para = Paragraph(elem, body)
+                for handler in paragraph_handlers:
+                    handler(para)
+        elif elem.tag == qn('w:tbl'):
+            table_idx += 1
+            if not cell_handlers:
+                continue
+            for row_idx, tr in enumerate(elem.iterchildren(qn('w:tr')), start=1):
+                for cell_idx, tc in enumerate(tr.iterchildren(qn('w:tc')), start=1):
+                    for p in tc.iterchildren(qn('w:p')):
+                        para = Paragraph(p, body)
+                        for handler in cell_handlers:
+                            handler(para, (table_idx, row_idx, cell_idx))
+    for handler in handlers:
+        if 'finish' in handler:
+            handler['finish']()
+
+def make_g_cm3_superscript_handler(log_status):
+    """处理器：在所有表格中查找'g/cm3'单位，并将其中的3改为上标"""
+    log_status = as_status_logger(log_status)
+    state = {'conversions': 0}
+
+    def cell_paragraph(para, location):
+        # 按备注模板渲染的备注已带上标，只去掉渲染标记
+        if para._p.get(REMARK_RENDERED_ATTR) == REMARK_RENDERED_MARK:
+            del para._p.attrib[REMARK_RENDERED_ATTR]
+            return
+        # 检查段落中是否包含'g/cm3'
+        if 'g/cm3' not in para.text:
+            return
+        table_idx, row_idx, cell_idx = location
+        log_status(f"在表格{table_idx}的单元格({row_idx},{cell_idx})中找到'g/cm3'")
+        
+        # 保存原始文本并清空段落
+        original_text = para.text
+        para.clear()
+        
+        # 分割文本，找到所有'g/cm3'出现的位置
+        parts = original_text.split('g/cm3')
+        for i, part in enumerate(parts):
+            # 添加普通文本部分（不设置字体，沿用默认格式）
+            if part:
+                para.add_run(part)
+            
+            # 如果不是最后一部分，添加'g/cm'加上上标的'3'
+            if i < len(parts) - 1:
+                cm_run = para.add_run('g/cm')
+                cm_run.font.name = "Times New Roman"
+                cm_run.font.size = None
+                
+                superscript_run = para.add_run('3')
+                superscript_run.font.name = "Times New Roman"
+                superscript_run.font.size = None
+                superscript_run.font.superscript = True
+                
+                state['conversions'] += 1
+
+    def finish():
+        log_status(f"已完成所有表格的处理，共转换 {state['conversions']} 处'g/cm3'单位")
+
+    return {'cell_paragraph': cell_paragraph, 'finish': finish}
+
+SCHEDULE_HEADING_PATTERN = re.compile(r'^附表\d+\s+压实度检测结果表\（.*\）$')
+
+def make_schedule_heading_font_handler(log_status):
+    """处理器：统一"附表X 压实度检测结果表（YYYYY）"标题的字体：汉字宋体加粗小五，数字Times New Roman加粗小五"""
+    log_status = as_status_logger(log_status)
+    state = {'count': 0}
+
+    def paragraph(para):
+        original_text = para.text
+        if not SCHEDULE_HEADING_PATTERN.match(original_text.strip()):
+            return
+        state['count'] += 1
+        try:
+            # 清除段落中的所有内容，按汉字/非汉字分段重新写入
+            para.clear()
+            for is_chinese, chars in itertools.groupby(
+                    original_text, key=lambda char: '\u4e00' <= char <= '\u9fff' or char in '（）'):  # 汉字或括号
+                run = para.add_run("".join(chars))
+                run.font.name = "宋体" if is_chinese else "Times New Roman"
+                run.font.size = Pt(9)  # 小五
+                run.font.bold = True  # 加粗
+        except Exception as e:
+            log_status.error(f"处理标题段落时出错: {e}")
+
+    def finish():
+        log_status(f"共统一 {state['count']} 个符合格式的附表标题段落")
+
+    return {'paragraph': paragraph, 'finish': finish}
+
+def make_blank_paragraph_cleanup_handler(log_status):
+    """处理器：检测连续的空白段落（空白页相关段落），每组只保留第一个，遍历结束后统一删除"""
+    log_status = as_status_logger(log_status)
+    state = {'consecutive_empty': 0, 'to_remove': []}
+    max_empty_paragraphs = 1  # 连续空白段落的阈值
+
+    def paragraph(para):
+        # 段落的实际文本内容（去除所有空白字符，含分页符产生的换行）为空即视为空白段落
+        if re.sub(r'\s+', '', para.text) == "":
+            state['consecutive_empty'] += 1
+            if state['consecutive_empty'] > max_empty_paragraphs:
+                state['to_remove'].append(para._element)
+        else:
+            state['consecutive_empty'] = 0
+
+    def finish():
+        # 清理后不会再有连续的空白段落，因此文档末尾最多只剩一个空白段落
+        for p in state['to_remove']:
+            p.getparent().remove(p)
+        log_status(f"空白页检测和删除完成，共删除 {len(state['to_remove'])} 个空白页相关段落")
+
+    return {'paragraph': paragraph, 'finish': finish}
+
+def post_process_document(doc, log_status, superscript=True, heading_fonts=True, blank_cleanup=True):
+    """在一次正文遍历中执行所有后处理"""
+    log_status = as_status_logger(log_status)
+    handlers = []
+    if superscript:
+        handlers.append(make_g_cm3_superscript_handler(log_status))
+    if heading_fonts:
+        handlers.append(make_schedule_heading_font_handler(log_status))
+    if blank_cleanup:
+        handlers.append(make_blank_paragraph_cleanup_handler(log_status))
+    log_status(f"开始单次遍历后处理（共 {len(handlers)} 个处理器）...")
+    run_document_visitors(doc, handlers, log_status)
+
 def unify_all_schedule_headings_font(word_doc_path, log_status=None):
     """统一处理文档末尾"附表X 压实度检测结果表（YYYYY）"格式标题的字体：汉字设置宋体加粗小五，数字设置Times New Roman加粗小五"""
-    if log_status is None:
-        log_status = print
+    log_status = as_status_logger(log_status)
     
     try:
-        import re
-        from docx import Document
-        from docx.shared import Pt
-        
         log_status("开始统一处理文档末尾附表标题的字体格式...")
-        
-        # 打开Word文档
         doc = Document(word_doc_path)
-        
-        # 查找文档末尾的"附表X 压实度检测结果表（YYYYY）"格式标题
-        # 先查找所有可能的段落，然后筛选出符合特定格式的
-        schedule_paragraphs = []
-        for para in doc.paragraphs:
-            para_text = para.text.strip()
-            # 使用正则表达式匹配"附表X 压实度检测结果表（YYYYY）"格式的标题
-            if re.match(r'^附表\d+\s+压实度检测结果表\（.*\）$', para_text):
-                schedule_paragraphs.append(para)
-        
-        log_status(f"找到 {len(schedule_paragraphs)} 个符合格式的附表标题段落")
-        
-        # 处理每个附表标题段落
-        for para in schedule_paragraphs:
-            try:
-                # 清除段落中的所有内容
-                original_text = para.text
-                para.clear()
-                
-                # 逐字符处理，分开汉字和非汉字
-                current_run = None
-                current_is_chinese = None
-                
-                for char in original_text:
-                    # 判断字符类型
-                    if '\u4e00' <= char <= '\u9fff' or char in '（）':  # 汉字或括号
-                        is_chinese = True
-                    else:  # 所有其他字符（包括数字、字母、符号等）
-                        is_chinese = False
-                    
-                    # 如果字符类型改变，创建新的run
-                    if current_run is None or is_chinese != current_is_chinese:
-                        current_run = para.add_run(char)
-                        current_is_chinese = is_chinese
-                        
-                        # 设置字体
-                        if is_chinese:
-                            current_run.font.name = "宋体"
-                        else:
-                            current_run.font.name = "Times New Roman"
-                        current_run.font.size = Pt(9)  # 小五
-                        current_run.font.bold = True  # 加粗
-                    else:
-                        # 同一类型的字符，添加到当前run
-                        current_run.text += char
-                
-            except Exception as e:
-                log_status(f"处理标题段落时出错: {e}")
-        
-        # 保存修改后的文档
+        run_document_visitors(doc, [make_schedule_heading_font_handler(log_status)], log_status)
         doc.save(word_doc_path)
         log_status("所有附表标题字体格式已统一处理完成")
-        
         return True
         
     except Exception as e:
-        log_status(f"统一处理附表标题字体格式时出错: {e}")
+        log_status.error(f"统一处理附表标题字体格式时出错: {e}")
         import traceback
         traceback.print_exc()
         return False
 
 def convert_g_cm3_to_superscript(word_doc_path, log_status=None):
     """在文档中所有表格中查找'g/cm3'单位，并将其中的3改为上标"""
-    if log_status is None:
-        log_status = print
+    log_status = as_status_logger(log_status)
     
     try:
-        from docx import Document
-        from docx.enum.text import WD_BREAK
-        
-        log_status("开始处理文档末尾附表中的'g/cm3'单位...")
-        
-        # 打开Word文档
+        log_status("开始处理文档表格中的'g/cm3'单位...")
         doc = Document(word_doc_path)
-        
-        # 查找所有包含"附表"文本的段落及其对应的表格
-        schedule_paragraphs = []
-        for para_idx, para in enumerate(doc.paragraphs):
-            para_text = para.text.strip()
-            if "附表" in para_text:
-                schedule_paragraphs.append((para_idx, para))
-        
-        if not schedule_paragraphs:
-            log_status("未找到包含'附表'文本的段落")
-            return True
-        
-        # 直接处理文档中的所有表格，不再限制只处理最后一个附表段落之后的表格
-        # 这样可以确保所有包含'g/cm3'的表格都会被处理
-        schedule_tables = doc.tables
-        log_status(f"找到文档中的所有表格，共 {len(schedule_tables)} 个")
-        
-        # 如果没有表格，直接返回
-        if not schedule_tables:
-            log_status("文档中没有表格")
-            return True
-        
-        # 处理每个附表表格中的'g/cm3'文本
-        total_conversions = 0
-        
-        for table_idx, table in enumerate(schedule_tables):
-            log_status(f"处理附表表格 {table_idx+1}/{len(schedule_tables)}")
-            
-            for row_idx, row in enumerate(table.rows):
-                for cell_idx, cell in enumerate(row.cells):
-                    # 检查单元格中的所有段落
-                    for para in cell.paragraphs:
-                        # 检查段落中是否包含'g/cm3'
-                        if 'g/cm3' in para.text:
-                            log_status(f"在表格{table_idx+1}的单元格({row_idx+1},{cell_idx+1})中找到'g/cm3'")
-                            
-                            # 保存原始文本以进行日志记录
-                            original_text = para.text
-                            
-                            # 清空段落
-                            para.clear()
-                            
-                            # 分割文本，找到所有'g/cm3'出现的位置
-                            parts = original_text.split('g/cm3')
-                            
-                            for i, part in enumerate(parts):
-                                # 添加普通文本部分
-                                if part:
-                                    run = para.add_run(part)
-                                    # 尝试保留原始格式
-                                    try:
-                                        # 这里简单设置为普通格式，可以根据需要调整
-                                        run.font.name = "宋体" if any('\u4e00'-'\u9fff' in char for char in part) else "Times New Roman"
-                                        run.font.size = None  # 使用默认大小
-                                    except:
-                                        pass
-                                
-                                # 如果不是最后一部分，添加'g/cm'加上上标的'3'
-                                if i < len(parts) - 1:
-                                    # 添加'g/cm'
-                                    cm_run = para.add_run('g/cm')
-                                    try:
-                                        cm_run.font.name = "Times New Roman"
-                                        cm_run.font.size = None
-                                    except:
-                                        pass
-                                    
-                                    # 添加上标的'3'
-                                    superscript_run = para.add_run('3')
-                                    try:
-                                        superscript_run.font.name = "Times New Roman"
-                                        superscript_run.font.size = None
-                                        # 设置为上标
-                                        superscript_run.font.superscript = True
-                                    except:
-                                        pass
-                                
-                                # 增加转换计数
-                                if i < len(parts) - 1:
-                                    total_conversions += 1
-        
-        log_status(f"已完成所有附表表格的处理，共转换 {total_conversions} 处'g/cm3'单位")
-        
-        # 保存修改后的文档
+        run_document_visitors(doc, [make_g_cm3_superscript_handler(log_status)], log_status)
         doc.save(word_doc_path)
         log_status(f"文档已保存到: {word_doc_path}")
-        
         return True
         
     except Exception as e:
-        log_status(f"处理'g/cm3'单位时出错: {e}")
+        log_status.error(f"处理'g/cm3'单位时出错: {e}")
         import traceback
         traceback.print_exc()
         return False
@@ -2647,11 +3013,29 @@ import time
 import os
 
 if __name__ == "__main__":
-    # 源文件路径和目标文件路径
-    excel_path = r"C:\Users\xc\Desktop\模版\路面路基模板\3.xlsx"
-    word_path = r"C:\Users\xc\Desktop\模版\路面路基模板\4.docx"
-    new_word_path = r"C:\Users\xc\Desktop\模版\路面路基模板\9_new.docx" # 新文件名
-    copy_count =50 # 你可以根据需要调整复制次数
+    import argparse
+
+    # 未指定参数时沿用原来的源文件路径和目标文件路径
+    parser = argparse.ArgumentParser(description="根据压实度 Excel 数据生成 Word 报告")
+    parser.add_argument("--excel", default=r"C:\Users\xc\Desktop\模版\路面路基模板\3.xlsx", help="Excel 数据文件")
+    parser.add_argument("--word", default=r"C:\Users\xc\Desktop\模版\路面路基模板\4.docx", help="Word 模板")
+    parser.add_argument("--output", default=r"C:\Users\xc\Desktop\模版\路面路基模板\9_new.docx", help="输出 Word 文件")
+    parser.add_argument("--copy-count", type=int, default=50, help="复制次数")
+    parser.add_argument("--log-level", choices=list(LOG_LEVELS), help="日志级别，默认取 YASHIDU_LOG_LEVEL 或 INFO")
+    parser.add_argument("--report-json", nargs="?", const=True, help="把阶段报告写为 JSON（可指定路径，默认写在输出文件旁边）")
+    parser.add_argument("--trace-memory", action="store_true", help="记录各阶段的 tracemalloc 内存峰值")
+    parser.add_argument("--count-ops", action="store_true", help="统计 python-docx/lxml 热点操作")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="函数级剖析模式")
+    parser.add_argument("--profile-dir", help="剖析产物目录，默认写在输出文件旁边")
+    parser.add_argument("--merge-mode", choices=MERGE_MODES, default="adjacent", help="附表合并方式：只合并相邻数据组或全局合并")
+    parser.add_argument("--merge-keys", help=f"逗号分隔的比较单元格，默认 {','.join(DEFAULT_MERGE_KEYS)}")
+    parser.add_argument("--max-rows-per-table", type=int, help="每个附表的最大数据行数，超出时拆分")
+    args = parser.parse_args()
+
+    excel_path = args.excel
+    word_path = args.word
+    new_word_path = args.output # 新文件名
+    copy_count = args.copy_count # 你可以根据需要调整复制次数
     
     # 检查目标文件是否存在且被锁定
     if os.path.exists(new_word_path):
@@ -2663,15 +3047,16 @@ if __name__ == "__main__":
             print(f"警告：文件 '{new_word_path}' 正在被另一个程序使用，请关闭该文件后再运行脚本。")
             # 生成一个带时间戳的新文件名，避免文件锁定问题
             timestamp = int(time.time())
-            new_word_path = fr"C:\Users\xc\Desktop\模版\路面路基模板\9_new_{timestamp}.docx"
+            new_word_path = f"{os.path.splitext(new_word_path)[0]}_{timestamp}.docx"
             print(f"将使用新的输出文件名: {new_word_path}")
     
     try:
-        run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_path)
-        # 在保存文档后调用处理'g/cm3'单位的函数
-        convert_g_cm3_to_superscript(new_word_path)
-        # 统一处理所有附表标题的字体格式
-        unify_all_schedule_headings_font(new_word_path)
+        run_excel_to_word_automation(excel_path, word_path, copy_count, new_word_path, log_level=args.log_level,
+                                     report_path=args.report_json, trace_memory=args.trace_memory,
+                                     count_operations=args.count_ops, profile=args.profile, profile_dir=args.profile_dir,
+                                     merge_mode=args.merge_mode, merge_keys=args.merge_keys,
+                                     max_rows_per_table=args.max_rows_per_table)
+        # g/cm3 上标和附表标题字体已在生成结论段落后的单次遍历后处理中完成，无论结论段落是否生成成功
         print("脚本执行成功！")
         print(f"处理后的文件已保存至: {new_word_path}")
     except Exception as e:
@@ -1,7 +1,8 @@
-from flask import Flask, request, render_template_string, send_file, jsonify
+from flask import Flask, request, render_template_string, send_file, jsonify, Response, stream_with_context
 import os
+import json
 import sys
-import tempfile
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import traceback
 import platform
@@ -9,17 +10,50 @@ import platform
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# 导入原始脚本的功能
-import _9 as压实度_module
+# 原始脚本（_9）及 openpyxl、python-docx、lxml 只在任务执行时由工作进程/线程导入，
+# 冷启动时首页和状态接口不加载这些依赖
+from jobs import JobQueue, JobQueueFull, submission_key
+from batch import BatchError, read_batch_workbooks, stream_batch_zip
+from uploads import MAX_UPLOAD_MB, UploadError, UploadRequest, uploaded_file
+from templates import TemplateError, TemplateRegistry
 
 # 平台检测
 IS_WINDOWS = platform.system() == 'Windows'
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB限制
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024  # 上传大小限制，YASHIDU_MAX_UPLOAD_MB 配置
+# 上传文件边接收边计算摘要、检查格式，大文件转存到磁盘（见 uploads.py）
+app.request_class = UploadRequest
 
-# 临时文件目录
-TEMP_DIR = tempfile.gettempdir()
+# 报告生成在后台的预热工作进程（或线程）中执行，请求线程只负责提交任务
+job_queue = JobQueue()
+
+# 报告生成函数，以 '模块:函数' 形式提交，执行时才导入
+REPORT_TARGET = '_9:generate_report_bytes'
+
+# 已注册的模板，/process 和 /batch 可以用 templateId 代替上传 wordFile
+template_registry = TemplateRegistry()
+
+def template_source(request):
+    """返回 (任务的模板输入, 计算内容键用的模板输入, 预编译结果, 模板文件名)
+
+    表单带 templateId 时使用已注册的模板，否则使用上传的 wordFile。
+    """
+    template_id = request.form.get('templateId')
+    if template_id:
+        entry = template_registry.get(template_id)
+        if entry is None:
+            raise TemplateError(f"模板不存在: {template_id}")
+        path = template_registry.path(template_id)
+        return path, path, entry['compiled'], entry['name']
+    word_upload = uploaded_file(request, 'wordFile')
+    return word_upload.job_source(), word_upload, None, word_upload.filename
+
+def report_kwargs(excel_data, word_data, copy_count, compiled_template):
+    kwargs = dict(excel_data=excel_data, word_data=word_data, copy_count=copy_count)
+    if compiled_template is not None:
+        kwargs['compiled_template'] = compiled_template
+    return kwargs
 
 @app.route('/')
 def index():
@@ -135,6 +169,26 @@ def index():
             </div>
         </div>
         
+        <div class="container" style="margin-top: 20px;">
+            <h2>批量处理</h2>
+            <!-- 直接提交表单，浏览器边接收边保存返回的 ZIP -->
+            <form id="batchForm" action="/batch" method="post" enctype="multipart/form-data">
+                <div class="form-group">
+                    <label for="zipFile">Excel文件压缩包（.zip）：</label>
+                    <input type="file" id="zipFile" name="zipFile" accept=".zip" required>
+                </div>
+                <div class="form-group">
+                    <label for="batchWordFile">Word模板文件上传：</label>
+                    <input type="file" id="batchWordFile" name="wordFile" accept=".docx" required>
+                </div>
+                <div class="form-group">
+                    <label for="batchCopyCount">复制次数：</label>
+                    <input type="number" id="batchCopyCount" name="copyCount" min="1" value="1" required>
+                </div>
+                <button type="submit">批量处理并下载</button>
+            </form>
+        </div>
+        
         <script>
             const form = document.getElementById('processForm');
             const progressBar = document.getElementById('progressBar');
@@ -160,19 +214,21 @@ def index():
                         body: formData
                     });
                     
-                    if (!response.ok) {
-                        throw new Error('处理失败');
-                    }
-                    
                     const data = await response.json();
                     
-                    if (data.success) {
+                    if (!data.success) {
+                        throw new Error(data.error || '处理失败');
+                    }
+                    
+                    // 优先通过 SSE 接收进度，不支持时轮询任务状态
+                    const status = window.EventSource ? await streamJob(data.job_id) : await waitForJob(data.job_id);
+                    if (status.state === 'succeeded') {
                         statusMessage.textContent = '处理完成！';
                         // 设置下载链接
-                        downloadBtn.href = `/download?filename=${encodeURIComponent(data.filename)}`;
+                        downloadBtn.href = `/download/${data.job_id}`;
                         downloadLink.style.display = 'block';
                     } else {
-                        statusMessage.textContent = '处理失败: ' + data.error;
+                        statusMessage.textContent = '处理失败: ' + status.error;
                     }
                 } catch (error) {
                     statusMessage.textContent = '发生错误: ' + error.message;
@@ -180,6 +236,51 @@ def index():
                     progressBar.style.display = 'none';
                 }
             });
+            
+            function showProgress(status) {
+                progressBarInner.style.width = status.percent + '%';
+                progressBarInner.textContent = status.percent + '%';
+                if (status.state === 'queued') {
+                    statusMessage.textContent = '排队中...';
+                } else if (status.state === 'running') {
+                    let text = '正在处理: ' + (status.stage || '');
+                    if (status.sections_total) {
+                        text += ` (数据组 ${status.sections_done || 0}/${status.sections_total}，已生成附表 ${status.tables_built || 0})`;
+                    }
+                    statusMessage.textContent = text;
+                }
+            }
+            
+            function streamJob(jobId) {
+                return new Promise((resolve, reject) => {
+                    const source = new EventSource(`/events/${jobId}`);
+                    source.addEventListener('progress', (event) => showProgress(JSON.parse(event.data)));
+                    source.addEventListener('done', (event) => {
+                        source.close();
+                        resolve(JSON.parse(event.data));
+                    });
+                    source.onerror = () => {
+                        // 连接断开时退回轮询
+                        source.close();
+                        waitForJob(jobId).then(resolve, reject);
+                    };
+                });
+            }
+            
+            async function waitForJob(jobId) {
+                while (true) {
+                    const response = await fetch(`/status/${jobId}`);
+                    if (!response.ok) {
+                        throw new Error('查询任务状态失败');
+                    }
+                    const status = await response.json();
+                    showProgress(Object.assign({}, status.progress, status));
+                    if (status.state !== 'queued' && status.state !== 'running') {
+                        return status;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                }
+            }
         </script>
     </body>
     </html>
@@ -189,70 +290,195 @@ def index():
 def process_files():
     try:
         # 获取上传的文件
-        excel_file = request.files['excelFile']
-        word_file = request.files['wordFile']
         copy_count = int(request.form['copyCount'])
         
-        # 保存临时文件
-        excel_path = os.path.join(TEMP_DIR, secure_filename(excel_file.filename))
-        word_path = os.path.join(TEMP_DIR, secure_filename(word_file.filename))
-        excel_file.save(excel_path)
-        word_file.save(word_path)
+        # 上传在解析时已算好摘要；较小的上传留在内存中以 bytes 提交，
+        # 较大的已转存到本次请求的目录，以路径提交，任务结束后删除
+        excel_upload = uploaded_file(request, 'excelFile')
+        word_data, word_key_source, compiled_template, template_name = template_source(request)
         
-        # 生成输出文件名
-        output_filename = f"output_{os.path.splitext(secure_filename(word_file.filename))[0]}.docx"
-        output_path = os.path.join(TEMP_DIR, output_filename)
+        # 生成输出文件名（只用于下载时的文件名，不再对应磁盘上的文件）
+        output_filename = f"output_{os.path.splitext(secure_filename(template_name))[0]}.docx"
         
-        # 调用原始脚本的功能
-        # 添加平台兼容性处理
-        def status_callback(message):
-            print(f"处理状态: {message}")
+        # 在Linux环境中，原始脚本会跳过需要pywin32的功能
+        if not IS_WINDOWS:
+            print("处理状态: 在Linux环境中运行，将跳过需要pywin32的功能")
         
+        # 相同的工作簿、模板和选项复用已有结果，或合并到正在进行的相同任务
+        cache_key = submission_key([excel_upload, word_key_source], {'copy_count': copy_count, 'download_name': output_filename})
         try:
-            # 尝试调用原始脚本的主要功能
-            # 在Linux环境中，需要确保原始脚本不会尝试使用pywin32
-            if not IS_WINDOWS:
-                status_callback("在Linux环境中运行，将跳过需要pywin32的功能")
-            
-            压实度_module.run_excel_to_word_automation(excel_path, word_path, copy_count, output_path, status_callback)
-        except ImportError as e:
-            if "win32com" in str(e) or "pywin32" in str(e):
-                raise Exception("当前环境不支持Excel COM功能，请在Windows系统上运行或修改脚本以移除对pywin32的依赖")
-            else:
-                raise
+            job_id, reused = job_queue.submit(
+                REPORT_TARGET,
+                report_kwargs(excel_upload.job_source(), word_data, copy_count, compiled_template),
+                download_name=output_filename, cache_key=cache_key,
+                cleanup_paths=[request.upload_dir] if request.upload_dir else ())
+        except JobQueueFull as e:
+            # 排队已满：拒绝新任务，让客户端稍后重试
+            request.discard_uploads()
+            return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '10'}
         
-        # 返回成功信息
+        # 立即返回任务编号，前端通过 /status/<job_id> 轮询进度
         return jsonify({
             'success': True,
-            'filename': output_filename
-        })
+            'job_id': job_id,
+            'reused': reused,
+            'status_url': f"/status/{job_id}",
+            'download_url': f"/download/{job_id}"
+        }), 202
     
+    except (UploadError, TemplateError) as e:
+        request.discard_uploads()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except HTTPException:
+        # 例如上传超过大小限制（413），交给对应的错误处理
+        request.discard_uploads()
+        raise
     except Exception as e:
+        request.discard_uploads()
         error_trace = traceback.format_exc()
         print(f"错误详情: {error_trace}")
         return jsonify({
             'success': False,
             'error': str(e)
         })
+
+@app.route('/batch', methods=['POST'])
+def process_batch():
+    """ZIP 中的每个工作簿各生成一份报告，按完成顺序流式返回报告 ZIP（含 manifest.json）"""
+    try:
+        zip_upload = uploaded_file(request, 'zipFile')
+        word_data, word_key_source, compiled_template, _ = template_source(request)
+        copy_count = int(request.form['copyCount'])
+        workbooks = read_batch_workbooks(zip_upload, directory_factory=request.ensure_upload_dir)
+    except (BatchError, UploadError, TemplateError) as e:
+        request.discard_uploads()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except HTTPException:
+        request.discard_uploads()
+        raise
+    except Exception as e:
+        request.discard_uploads()
+        print(f"错误详情: {traceback.format_exc()}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    print(f"处理状态: 批量处理 {len(workbooks)} 个工作簿")
+    
+    def key_function(excel_data):
+        # 只按工作簿、模板和复制次数计算：批次中的报告名取自清单而不是任务记录，
+        # 因此内容相同的工作簿（文件名不同也一样）在批次内外都复用同一个任务
+        return submission_key([excel_data, word_key_source], {'copy_count': copy_count})
+    
+    archive_name = f"reports_{secure_filename(os.path.splitext(zip_upload.filename)[0]) or 'batch'}.zip"
+    upload_request = request._get_current_object()
+    
+    def chunks():
+        try:
+            yield from stream_batch_zip(job_queue, REPORT_TARGET, workbooks, word_data, copy_count,
+                                        key_function=key_function, compiled_template=compiled_template)
+        finally:
+            # 批次结束（或客户端断开）后删除转存的上传和解压出的工作簿
+            upload_request.discard_uploads()
     
+    return Response(stream_with_context(chunks()), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{archive_name}"',
+                             'X-Accel-Buffering': 'no'})
+
+@app.route('/templates', methods=['POST'])
+def register_template():
+    """注册模板：检查并预编译后保存，返回模板编号；同一份模板重复注册返回同一个编号"""
+    try:
+        word_upload = uploaded_file(request, 'wordFile')
+        word_upload.seek(0)
+        entry, created = template_registry.register(word_upload.read(), request.form.get('name') or word_upload.filename)
+    except (UploadError, TemplateError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     finally:
-        # 清理临时文件（可选，取决于需求）
-        pass
+        request.discard_uploads()
+    return jsonify({'success': True, 'template_id': entry['template_id'], 'created': created,
+                    'template': entry}), 201 if created else 200
+
+@app.route('/templates')
+def list_templates():
+    return jsonify({'templates': template_registry.list()})
+
+@app.route('/templates/<template_id>')
+def get_template(template_id):
+    try:
+        entry = template_registry.get(template_id)
+    except TemplateError as e:
+        return jsonify({'error': str(e)}), 400
+    if entry is None:
+        return jsonify({'error': '模板不存在'}), 404
+    return jsonify(entry)
+
+@app.route('/templates/<template_id>', methods=['DELETE'])
+def delete_template(template_id):
+    try:
+        existed = template_registry.delete(template_id)
+    except TemplateError as e:
+        return jsonify({'error': str(e)}), 400
+    if not existed:
+        return jsonify({'error': '模板不存在'}), 404
+    return jsonify({'success': True})
 
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({'success': False, 'error': f"上传文件超过 {MAX_UPLOAD_MB}MB 限制"}), 413
+
+@app.route('/download/<job_id>')
 @app.route('/download')
-def download_file():
-    filename = request.args.get('filename')
-    filepath = os.path.join(TEMP_DIR, filename)
+def download_file(job_id=None):
+    job_id = job_id or request.args.get('job_id')
+    job = job_queue.get(job_id) if job_id else None
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if job['state'] != 'succeeded':
+        return jsonify({'error': '任务尚未完成', 'state': job['state']}), 409
+    
+    output = job_queue.output(job_id)
+    if not output:
+        # 输出已超过保留期限或因容量上限被淘汰
+        return jsonify({'error': '文件已过期，请重新生成'}), 410
+    
+    # 按块流式发送输出存储中的文件；带 ETag / Last-Modified，重复下载时条件请求直接返回 304
+    response = send_file(output['path'], as_attachment=True, download_name=output['name'],
+                         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                         etag=output['etag'] or True, last_modified=output['last_modified'], conditional=True)
+    # 输出只属于提交者：不允许共享缓存保存，浏览器每次使用前按 ETag 重新验证
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/status/<job_id>')
+def get_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(status)
+
+@app.route('/events/<job_id>')
+def stream_events(job_id):
+    """以 Server-Sent Events 推送任务进度，最后一个事件为 done"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': '任务不存在'}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        after = 0
+    
+    def generate():
+        for event in job_queue.events(job_id, after=after):
+            if event is None:
+                yield ": keep-alive\n\n"  # 心跳，防止代理断开空闲连接
+                continue
+            event_id, event_type, data = event
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
     
-    if os.path.exists(filepath):
-        return send_file(filepath, as_attachment=True)
-    else:
-        return jsonify({'error': '文件不存在'}), 404
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/status')
-def get_status():
-    # 这里可以实现一个简单的状态查询接口
-    return jsonify({'status': 'running'})
+def get_queue_status():
+    return jsonify(job_queue.summary())
 
 # Vercel 兼容导出
-export = app
\ No newline at end of file
+export = app
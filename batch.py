@@ -0,0 +1,190 @@
+"""批量处理：一个工作簿 ZIP + 一个 Word 模板，流式返回报告 ZIP
+
+每个工作簿作为一个独立任务提交到 JobQueue，排队已满时等已提交的任务结束后再继续提交；
+任务按完成先后写入输出 ZIP，写完一个立即把这部分压缩数据发给客户端，
+最后写入 manifest.json 记录每个工作簿的处理结果。输出 ZIP 只在内存中保留尚未发送的
+一小段数据，报告从输出存储按块读取；解压出的工作簿与上传文件一样，整个批次在内存中最多保留
+SPOOL_MEMORY_BYTES，其余解压到请求的转存目录，以路径提交。
+模板在每个工作进程的 TemplateCache 中按内容缓存，同一批次只解析一次。
+"""
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+import zipfile
+
+from jobs import JobQueueFull
+from uploads import SPOOL_MEMORY_BYTES
+
+MAX_BATCH_FILES = int(os.environ.get('YASHIDU_BATCH_MAX_FILES', '100'))  # 单个批次的工作簿数量上限
+MAX_BATCH_MEMBER_MB = 64  # 单个工作簿解压后的大小上限，防止压缩炸弹
+BATCH_CHUNK_SIZE = 64 * 1024  # 从输出存储读取报告的块大小
+BATCH_POLL_INTERVAL = 1.0  # 等待任务结束/排队空位的间隔（秒）
+
+
+class BatchError(ValueError):
+    """上传的批量 ZIP 无效"""
+
+
+class ZipStreamBuffer:
+    """供 zipfile 写入的只追加缓冲区，没有 tell/seek，zipfile 按不可定位的流写入（使用数据描述符）"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """取出并清空已写入的数据"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def member_name(info):
+    """ZIP 成员的文件名；没有 UTF-8 标记的成员（Windows 自带压缩）按 GBK 解码"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def read_batch_workbooks(source, max_files=MAX_BATCH_FILES, directory_factory=None,
+                         max_memory=SPOOL_MEMORY_BYTES):
+    """从上传的 ZIP（bytes 或可定位的二进制流）中读取所有 .xlsx 工作簿，返回 [(文件名, 内容)]，按文件名排序
+
+    内容为 bytes；提供 directory_factory 时，所有工作簿在内存中合计最多保留 max_memory 字节，
+    放不下的工作簿解压到 directory_factory() 返回的目录，内容为文件路径。
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise BatchError("上传的文件不是有效的 ZIP 压缩包")
+    workbooks = []
+    with archive:
+        for info in archive.infolist():
+            name = member_name(info)
+            basename = os.path.basename(name)
+            if info.is_dir() or name.startswith('__MACOSX/') or basename.startswith('~$'):
+                continue
+            if not basename.lower().endswith('.xlsx'):
+                continue
+            if info.file_size > MAX_BATCH_MEMBER_MB * 1024 * 1024:
+                raise BatchError(f"{name} 解压后超过 {MAX_BATCH_MEMBER_MB}MB")
+            workbooks.append((name, info))
+        if not workbooks:
+            raise BatchError("压缩包中没有 .xlsx 工作簿")
+        if len(workbooks) > max_files:
+            raise BatchError(f"压缩包中有 {len(workbooks)} 个工作簿，超过上限 {max_files}")
+        workbooks.sort(key=lambda item: item[0])
+
+        memory_left = max_memory
+
+        def extract(info):
+            nonlocal memory_left
+            if directory_factory is None or info.file_size <= memory_left:
+                memory_left -= info.file_size
+                return archive.read(info)
+            path = os.path.join(directory_factory(), f"{uuid.uuid4().hex}.xlsx")
+            with archive.open(info) as member, open(path, 'wb') as f:
+                shutil.copyfileobj(member, f)
+            return path
+
+        return [(name, extract(info)) for name, info in workbooks]
+
+
+def output_name(workbook_name):
+    """报告在输出 ZIP 中的路径：与工作簿同目录，文件名加 output_ 前缀"""
+    directory, basename = os.path.split(workbook_name)
+    return os.path.join(directory, f"output_{os.path.splitext(basename)[0]}.docx").replace(os.sep, '/')
+
+
+def stream_batch_zip(job_queue, target, workbooks, word_data, copy_count, key_function=None,
+                     poll_interval=BATCH_POLL_INTERVAL, chunk_size=BATCH_CHUNK_SIZE, compiled_template=None):
+    """提交批次中的所有任务，按完成顺序产出输出 ZIP 的数据块
+
+    workbooks 为 read_batch_workbooks 的返回值，word_data 为模板的 bytes 或文件路径。
+    key_function(excel_data) 返回任务内容键，相同内容的工作簿（文件名不同也一样）复用同一个任务；
+    compiled_template 为已注册模板的预编译结果，随任务传给生成函数。
+    """
+    buffer = ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+    started = time.time()
+    manifest = []
+    pending = []
+    for name, excel_data in workbooks:
+        entry = {'source': name, 'output': output_name(name), 'job_id': None, 'reused': None,
+                 'state': 'queued', 'error': None, 'size': None}
+        manifest.append(entry)
+        pending.append((entry, excel_data))
+    running = {}  # 任务编号 -> 等待该任务的清单条目（相同内容的工作簿合并到同一个任务）
+
+    def write_output(entry, output):
+        with open(output['path'], 'rb') as source, archive.open(entry['output'], 'w') as dest:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                dest.write(chunk)
+                data = buffer.drain()
+                if data:
+                    yield data
+        entry['size'] = output['size']
+
+    while pending or running:
+        # 尽量把剩余工作簿提交到队列，排队已满时留到有任务结束后再提交
+        while pending:
+            entry, excel_data = pending[0]
+            cache_key = key_function(excel_data) if key_function else None
+            kwargs = dict(excel_data=excel_data, word_data=word_data, copy_count=copy_count)
+            if compiled_template is not None:
+                kwargs['compiled_template'] = compiled_template
+            try:
+                job_id, reused = job_queue.submit(
+                    target, kwargs,
+                    download_name=os.path.basename(entry['output']), cache_key=cache_key)
+            except JobQueueFull:
+                break
+            pending.pop(0)
+            entry['job_id'], entry['reused'] = job_id, reused
+            running.setdefault(job_id, []).append(entry)
+        if not running:
+            time.sleep(poll_interval)
+            continue
+        for job_id in job_queue.wait_finished(list(running), timeout=poll_interval):
+            status = job_queue.status(job_id)
+            output = job_queue.output(job_id)
+            for entry in running.pop(job_id):
+                if status is None:
+                    entry['state'], entry['error'] = 'failed', '任务记录已丢失'
+                elif status['state'] != 'succeeded':
+                    entry['state'], entry['error'] = status['state'], status['error']
+                elif not output:
+                    entry['state'], entry['error'] = 'failed', '输出已过期'
+                else:
+                    try:
+                        yield from write_output(entry, output)
+                        entry['state'] = 'succeeded'
+                    except OSError as e:
+                        # 输出在读取过程中被淘汰：该成员可能不完整，清单中标记失败
+                        entry['state'], entry['error'] = 'failed', f"读取输出失败: {e}"
+                print(f"批量处理: {entry['source']} -> {entry['state']}")
+
+    succeeded = sum(1 for entry in manifest if entry['state'] == 'succeeded')
+    archive.writestr('manifest.json', json.dumps({
+        'total': len(manifest),
+        'succeeded': succeeded,
+        'failed': len(manifest) - succeeded,
+        'elapsed_s': round(time.time() - started, 1),
+        'files': manifest,
+    }, ensure_ascii=False, indent=2))
+    archive.close()
+    yield buffer.drain()
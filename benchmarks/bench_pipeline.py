@@ -0,0 +1,149 @@
+"""报告流水线基准：在多个规模的合成输入上测量 run_excel_to_word_automation 和各后处理遍历
+
+每个基准取多次运行的中位数，与 benchmarks/baselines.json 中的基线比较，超过
+基线 × 阈值且绝对差值超过 --min-delta 即视为性能回退并以非零状态退出。
+基线与机器相关，换机器后先用 --update-baselines 重新记录；有意改变流水线耗时的改动合并后，
+也要在同一台机器上用 --scales small,medium,large --update-baselines 重新记录并随改动一起提交。
+完全离线运行，输入由 synthetic.py 生成到临时目录。
+
+用法: python benchmarks/bench_pipeline.py [--scales small,medium] [--repeat 3] [--threshold 1.25] [--update-baselines]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from docx import Document
+
+from _9 import run_excel_to_word_automation, post_process_document, QUIET
+from synthetic import make_inputs
+
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+# 规模名称 -> (工作表数, 每表数据组数)
+SCALES = {
+    "small": (1, 2),
+    "medium": (1, 6),
+    "large": (2, 8),
+}
+
+# 后处理遍历只有几毫秒，运行次数按该倍数放大以压低噪声
+POST_PASS_REPEAT_FACTOR = 5
+
+# 后处理遍历 -> post_process_document 的开关
+POST_PASSES = {
+    "superscript": dict(superscript=True, heading_fonts=False, blank_cleanup=False),
+    "heading_fonts": dict(superscript=False, heading_fonts=True, blank_cleanup=False),
+    "blank_cleanup": dict(superscript=False, heading_fonts=False, blank_cleanup=True),
+    "fused": dict(superscript=True, heading_fonts=True, blank_cleanup=True),
+}
+
+
+def quiet(message):
+    pass
+
+
+def bench_pipeline(workbook_path, template_path, output_path, repeat):
+    """整条流水线的耗时，同时返回最后一次运行的阶段报告"""
+    timings = []
+    report = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        report = run_excel_to_word_automation(workbook_path, template_path, 1, output_path, quiet, log_level=QUIET)
+        timings.append(time.perf_counter() - start)
+    return timings, report
+
+
+def bench_post_pass(document_path, options, repeat):
+    """单个后处理遍历的耗时；每次重新加载文档，加载时间不计入"""
+    timings = []
+    for _ in range(repeat):
+        doc = Document(document_path)
+        start = time.perf_counter()
+        post_process_document(doc, quiet, **options)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_benchmarks(scales, repeat, work_dir):
+    results = {}
+    for scale in scales:
+        sheets, sections = SCALES[scale]
+        workbook_path, template_path = make_inputs(work_dir, sheets, sections)
+        output_path = os.path.join(work_dir, f"{scale}_out.docx")
+        timings, report = bench_pipeline(workbook_path, template_path, output_path, repeat)
+        results[f"pipeline/{scale}"] = statistics.median(timings)
+        print(f"pipeline/{scale:<8} {results[f'pipeline/{scale}'] * 1000:10.1f} ms  "
+              + ", ".join(f"{name}={value}" for name, value in report.counts.items()))
+        for pass_name, options in POST_PASSES.items():
+            key = f"post/{pass_name}/{scale}"
+            results[key] = statistics.median(bench_post_pass(output_path, options, repeat * POST_PASS_REPEAT_FACTOR))
+            print(f"{key:<28} {results[key] * 1000:10.1f} ms")
+    return results
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results, baselines, threshold, min_delta):
+    """返回超过阈值的基准列表 [(名称, 当前值, 基线)]"""
+    regressions = []
+    print(f"\n{'基准':<28}{'当前ms':>12}{'基线ms':>12}{'比值':>8}")
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:<28}{value * 1000:>12.1f}{'-':>12}{'-':>8}")
+            continue
+        ratio = value / baseline
+        regressed = ratio > threshold and value - baseline > min_delta
+        flag = "  回退" if regressed else ""
+        print(f"{name:<28}{value * 1000:>12.1f}{baseline * 1000:>12.1f}{ratio:>8.2f}{flag}")
+        if regressed:
+            regressions.append((name, value, baseline))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="small,medium", help=f"逗号分隔，可选 {','.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=1.25, help="当前值 / 基线 超过该比值视为回退")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="小于该秒数的差值不计为回退")
+    parser.add_argument("--update-baselines", action="store_true", help="把本次结果写入基线文件")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"未知规模: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(scales, args.repeat, work_dir)
+
+    baselines = load_baselines()
+    if args.update_baselines:
+        baselines.update({name: round(value, 6) for name, value in results.items()})
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+        print(f"\n基线已更新: {BASELINES_PATH}")
+        return 0
+
+    regressions = compare(results, baselines, args.threshold, args.min_delta)
+    if regressions:
+        print(f"\n{len(regressions)} 个基准超过基线 {args.threshold:.2f} 倍")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
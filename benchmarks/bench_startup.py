@@ -0,0 +1,88 @@
+"""冷启动基准：在新的解释器中测量导入 app 以及首次请求 / 和 /status 的耗时
+
+每次运行都启动一个新的 Python 进程（相当于一次冷启动），取多次运行的中位数；同时
+对比直接导入 _9 的耗时，说明流水线依赖延迟导入省下的时间。
+--check 时如果首页或状态接口的请求过程中加载了流水线的重依赖（_9、openpyxl、docx、lxml），
+以非零状态退出。
+
+用法: python benchmarks/bench_startup.py [--repeat 5] [--check]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 首页和状态接口不应加载的模块
+HEAVY_MODULES = ['_9', 'openpyxl', 'docx', 'lxml', 'lxml.etree']
+
+# 在子进程中执行：导入 app，依次请求 / 和 /status，输出各步耗时和已加载的重依赖
+APP_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from werkzeug.test import Client
+client = Client(app.app)
+index_status = client.get('/').status_code
+index_done = time.perf_counter()
+status_status = client.get('/status').status_code
+status_done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'index_ms': (index_done - imported) * 1000,
+    'status_ms': (status_done - index_done) * 1000,
+    'http_status': [index_status, status_status],
+    'heavy_modules': [name for name in %r if name in sys.modules],
+    'module_count': len(sys.modules),
+}))
+''' % (HEAVY_MODULES,)
+
+# 对照：直接导入流水线模块
+PIPELINE_PROBE = '''
+import json, time
+started = time.perf_counter()
+import _9
+print(json.dumps({'import_ms': (time.perf_counter() - started) * 1000}))
+'''
+
+
+def run_probe(code):
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT_DIR, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='冷启动次数，取中位数')
+    parser.add_argument('--check', action='store_true', help='首页/状态接口加载了重依赖时以非零状态退出')
+    args = parser.parse_args()
+
+    app_runs = [run_probe(APP_PROBE) for _ in range(args.repeat)]
+    pipeline_runs = [run_probe(PIPELINE_PROBE) for _ in range(args.repeat)]
+
+    def median(runs, key):
+        return statistics.median(run[key] for run in runs)
+
+    print(f"{'步骤':<24}{'中位数ms':>12}")
+    print(f"{'import app':<24}{median(app_runs, 'import_ms'):>12.1f}")
+    print(f"{'GET / (首次)':<24}{median(app_runs, 'index_ms'):>12.1f}")
+    print(f"{'GET /status (首次)':<24}{median(app_runs, 'status_ms'):>12.1f}")
+    print(f"{'import _9 (对照)':<24}{median(pipeline_runs, 'import_ms'):>12.1f}")
+    last = app_runs[-1]
+    print(f"HTTP 状态: {last['http_status']}，已加载模块数: {last['module_count']}")
+
+    heavy = sorted({name for run in app_runs for name in run['heavy_modules']})
+    if heavy:
+        print(f"首页/状态接口加载了重依赖: {', '.join(heavy)}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("首页/状态接口未加载流水线依赖")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""差分等价性比对：同一组合成输入分别交给旧版流水线和当前流水线，比较生成的 word/document.xml
+
+旧版取自某个 git 提交（默认仓库的第一个提交），通过 git archive 解出到临时目录，
+与当前工作树各自在独立子进程中运行，按各自 __main__ 的调用顺序执行后处理遍历。
+比较前对 XML 做规范化：去掉所有 w:rsid* 属性，按 C14N 序列化；zip 内的时间戳不参与比较。
+
+结果分三级：IDENTICAL（规范化后逐字节相同）、TEXT-ONLY（段落和单元格文本相同，
+格式或结构不同）、DIFFERENT。出现非 IDENTICAL 时列出前几处结构差异并以非零状态退出。
+
+用法: python benchmarks/equivalence.py [--legacy-ref <提交>] [--matrix quick|full] [--parts word/document.xml,...]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from lxml import etree
+
+from synthetic import make_inputs
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+# 合成负载矩阵：(工作表数, 每表数据组数, 相邻合并组大小)
+WORKLOAD_MATRIX = {
+    "quick": [(1, 1, 2), (1, 4, 2), (2, 3, 2)],
+    "full": [(1, 1, 2), (1, 2, 1), (1, 4, 2), (1, 7, 2), (1, 6, 3), (2, 3, 2), (3, 4, 1)],
+}
+
+# 旧版 __main__ 在生成后按路径调用的后处理遍历
+PATH_POST_PASSES = ["convert_g_cm3_to_superscript", "unify_all_schedule_headings_font"]
+
+
+def export_tree(ref, directory):
+    """把某个提交的完整文件树解到 directory"""
+    archive = subprocess.run(["git", "-C", REPO_DIR, "archive", ref], check=True, capture_output=True).stdout
+    os.makedirs(directory, exist_ok=True)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return directory
+
+
+def root_commit():
+    output = subprocess.run(["git", "-C", REPO_DIR, "rev-list", "--max-parents=0", "HEAD"],
+                            check=True, capture_output=True, text=True).stdout
+    return output.split()[0]
+
+
+def run_one(tree, workbook_path, template_path, output_path, result_path):
+    """子进程入口：在 tree 中导入 _9，按其 __main__ 的方式生成报告并记录耗时"""
+    sys.path.insert(0, tree)
+    import _9
+
+    def quiet(message):
+        pass
+
+    with open(os.path.join(tree, "_9.py"), encoding="utf-8") as f:
+        main_block = f.read().split('if __name__ == "__main__":')[-1]
+    post_passes = [name for name in PATH_POST_PASSES if f"{name}(" in main_block and hasattr(_9, name)]
+
+    start = time.perf_counter()
+    _9.run_excel_to_word_automation(workbook_path, template_path, 1, output_path, quiet)
+    for name in post_passes:
+        getattr(_9, name)(output_path, quiet)
+    seconds = time.perf_counter() - start
+
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds, "post_passes": post_passes}, f)
+
+
+def run_side(tree, workbook_path, template_path, output_path):
+    result_path = output_path + ".result.json"
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", tree, workbook_path, template_path, output_path, result_path],
+        capture_output=True, text=True)
+    if completed.returncode != 0 or not os.path.exists(result_path):
+        raise RuntimeError(f"{tree} 运行失败:\n{completed.stderr[-2000:]}")
+    with open(result_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def canonical_part(docx_path, part):
+    """读取 docx 中的一个 XML 部件，去掉 rsid 属性后返回根元素"""
+    with zipfile.ZipFile(docx_path) as archive:
+        root = etree.fromstring(archive.read(part))
+    for element in root.iter():
+        for name in [name for name in element.attrib if name.startswith(f"{{{W_NS}}}rsid")]:
+            del element.attrib[name]
+    return root
+
+
+def canonical_bytes(root):
+    return etree.tostring(root, method="c14n")
+
+
+def document_texts(root):
+    """按文档顺序取出所有段落文本（含表格单元格中的段落）"""
+    return ["".join(node.text or "" for node in p.iter(f"{{{W_NS}}}t")) for p in root.iter(f"{{{W_NS}}}p")]
+
+
+def structural_diff(legacy_root, current_root, limit=5):
+    """并行遍历两棵树，返回前 limit 处差异描述"""
+    differences = []
+    legacy_tree = legacy_root.getroottree()
+    current_tree = current_root.getroottree()
+
+    def walk(a, b):
+        if len(differences) >= limit:
+            return
+        path = legacy_tree.getpath(a)
+        if a.tag != b.tag:
+            differences.append(f"{path}: 标签 {a.tag} != {current_tree.getpath(b)} {b.tag}")
+            return
+        if dict(a.attrib) != dict(b.attrib):
+            differences.append(f"{path}: 属性 {dict(a.attrib)} != {dict(b.attrib)}")
+        if (a.text or "") != (b.text or ""):
+            differences.append(f"{path}: 文本 {a.text!r} != {b.text!r}")
+        if len(a) != len(b):
+            differences.append(f"{path}: 子元素数 {len(a)} != {len(b)}")
+        for child_a, child_b in zip(a, b):
+            walk(child_a, child_b)
+
+    walk(legacy_root, current_root)
+    return differences[:limit]
+
+
+def compare_outputs(legacy_path, current_path, parts):
+    """返回 (等级, 差异列表)"""
+    level = "IDENTICAL"
+    differences = []
+    for part in parts:
+        legacy_root = canonical_part(legacy_path, part)
+        current_root = canonical_part(current_path, part)
+        if canonical_bytes(legacy_root) == canonical_bytes(current_root):
+            continue
+        part_level = "TEXT-ONLY" if document_texts(legacy_root) == document_texts(current_root) else "DIFFERENT"
+        if level != "DIFFERENT":
+            level = part_level
+        differences.extend(f"[{part}] {line}" for line in structural_diff(legacy_root, current_root))
+    return level, differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legacy-ref", help="旧版流水线所在的提交，默认仓库的第一个提交")
+    parser.add_argument("--current", default=REPO_DIR, help="当前流水线所在目录，默认工作树")
+    parser.add_argument("--matrix", choices=sorted(WORKLOAD_MATRIX), default="quick")
+    parser.add_argument("--parts", default="word/document.xml", help="逗号分隔的比较部件")
+    parser.add_argument("--keep", help="保留输入和输出到该目录")
+    parser.add_argument("--run-one", nargs=5, metavar=("TREE", "XLSX", "DOCX", "OUT", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(*args.run_one)
+        return 0
+
+    parts = [part.strip() for part in args.parts.split(",") if part.strip()]
+    legacy_ref = args.legacy_ref or root_commit()
+    failures = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.keep or temp_dir
+        legacy_tree = export_tree(legacy_ref, os.path.join(temp_dir, "legacy"))
+        print(f"旧版: {legacy_ref}  当前: {args.current}")
+        print(f"{'负载':<14}{'旧版ms':>12}{'当前ms':>12}{'加速':>8}  结果")
+        for sheets, sections, merge_every in WORKLOAD_MATRIX[args.matrix]:
+            name = f"s{sheets}x{sections}m{merge_every}"
+            inputs = make_inputs(os.path.join(work_dir, name), sheets, sections, merge_every=merge_every)
+            legacy_out = os.path.join(work_dir, name, "legacy.docx")
+            current_out = os.path.join(work_dir, name, "current.docx")
+            legacy = run_side(legacy_tree, *inputs, legacy_out)
+            current = run_side(args.current, *inputs, current_out)
+            level, differences = compare_outputs(legacy_out, current_out, parts)
+            speedup = legacy["seconds"] / current["seconds"] if current["seconds"] else float("inf")
+            print(f"{name:<14}{legacy['seconds'] * 1000:>12.1f}{current['seconds'] * 1000:>12.1f}{speedup:>7.2f}x  {level}")
+            for line in differences:
+                print(f"    {line}")
+            if level != "IDENTICAL":
+                failures += 1
+    if failures:
+        print(f"\n{failures} 个负载的输出与旧版不一致")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""合成压实度工作簿和最小 Word 模板，供基准测试和等价性比对使用
+
+工作簿按现场表格的布局生成：每个数据组占 24 行，数据在 X-AC 列第 7-16 行，
+B3/B4/B5/L3/L5/P5/T5/S4 为合并比较值和标题/日期，C8/K8 为备注中的最大干密度和最佳含水率。
+每组末尾的若干行压实度为 0.0（会被删除），最后一组之后的 AC 列写入 #DIV/0! 作为结束标记。
+公式只写在流水线不读取的汇总单元格里：openpyxl 保存的文件没有公式缓存值。
+
+用法: python benchmarks/synthetic.py 输出目录 [--sheets 2] [--sections 6]
+"""
+import argparse
+import os
+import random
+
+from openpyxl import Workbook
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn, nsdecls
+
+SECTION_ROWS = 24
+DATA_FIRST_ROW = 7
+DATA_ROWS = 10
+TEMPLATE_DATA_ROWS = 12  # 模板附表1的数据行数（表头 + 12 行数据 + 备注）
+
+APPENDIX_HEADERS = ["序号", "桩号", "湿密度", "含水率", "干密度", "最大干密度", "压实度%"]
+TABLE2_HEADERS = ["序号", "检测部位", "设计值", "平均值", "检测点数", "合格点数", "合格率", "详见附表"]
+REMARK_TEXT = "最大干密度：1.48g/cm3，最佳含水率：14.4%，检测日期：2024年7月1日；检测方法：灌砂法"
+
+
+def make_workbook(path, sheets=1, sections=3, merge_every=2, zero_rows=2, seed=0):
+    """生成 sheets 个工作表、每表 sections 个数据组的工作簿
+
+    相邻 merge_every 个数据组的比较值相同，会被合并为一个附表；
+    每组最后 zero_rows 行的压实度为 0.0。
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    wb.remove(wb.active)
+    for sheet_idx in range(sheets):
+        ws = wb.create_sheet(f"Sheet{sheet_idx + 1}")
+        for section_idx in range(sections):
+            offset = section_idx * SECTION_ROWS
+            group_idx = section_idx // max(1, merge_every)
+            ws.merge_cells(f"B{1 + offset}:F{1 + offset}")
+            ws[f"B{1 + offset}"] = "压实度检测记录表（灌砂法）"
+            ws.merge_cells(f"L{3 + offset}:N{3 + offset}")
+            ws[f"B{3 + offset}"] = f"K{sheet_idx + 1}+{group_idx * 100:03d}"
+            ws[f"B{4 + offset}"] = "路基"
+            ws[f"B{5 + offset}"] = f"{sheet_idx + 1}#承台{group_idx + 1}"
+            ws[f"L{3 + offset}"] = "回填土"
+            ws[f"L{5 + offset}"] = "灌砂法"
+            ws[f"P{5 + offset}"] = "94"
+            ws[f"T{5 + offset}"] = "第1层"
+            ws[f"S{4 + offset}"] = f"2025.{1 + group_idx % 12}.{1 + sheet_idx}"
+            ws[f"C{8 + offset}"] = round(1.45 + rng.random() * 0.1, 2)
+            ws[f"K{8 + offset}"] = round(12.5 + rng.random() * 3, 1)
+            for r in range(DATA_ROWS):
+                row = DATA_FIRST_ROW + offset + r
+                ws.cell(row=row, column=24, value=f"K{sheet_idx + 1}+{group_idx * 100 + r * 10:03d}")
+                for col, (low, high) in zip(range(25, 29), ((1.9, 2.1), (12.0, 16.0), (1.65, 1.85), (1.75, 1.95))):
+                    cell = ws.cell(row=row, column=col, value=round(rng.uniform(low, high), 2))
+                    cell.number_format = "0.00"
+                compaction = 0.0 if r >= DATA_ROWS - zero_rows else round(rng.uniform(94.0, 99.0), 1)
+                ws.cell(row=row, column=29, value=compaction).number_format = "0.0"
+            summary_row = DATA_FIRST_ROW + offset + DATA_ROWS + 1
+            ws.cell(row=summary_row, column=28, value="平均")
+            ws.cell(row=summary_row, column=29, value=f"=AVERAGE(AC{DATA_FIRST_ROW + offset}:AC{DATA_FIRST_ROW + offset + DATA_ROWS - 1})")
+        ws.cell(row=DATA_FIRST_ROW + sections * SECTION_ROWS, column=29, value="#DIV/0!")
+    wb.save(path)
+    return path
+
+
+def make_template(path, body_paragraphs=47):
+    """生成最小合规模板：表2 评定表、带编号的结论段落、独立“附表”标题和带备注行的附表1"""
+    doc = Document()
+    for i in range(body_paragraphs):
+        doc.add_paragraph(f"正文段落{i + 1}")
+    doc.add_paragraph("表2 压实度检测结果评定表")
+    table2 = doc.add_table(rows=3, cols=len(TABLE2_HEADERS))
+    for col, header in enumerate(TABLE2_HEADERS):
+        table2.cell(0, col).text = header
+        table2.cell(1, col).text = "-"
+    for i in range(3):
+        doc.add_paragraph(f"结论前段落{i + 1}")
+    conclusion = doc.add_paragraph("本次对进行压实度检测，检测点数为个，合格点数为个，合格率为100%。")
+    conclusion._p.get_or_add_pPr().append(
+        parse_xml(f'<w:numPr {nsdecls("w")}><w:ilvl w:val="0"/><w:numId w:val="1"/></w:numPr>'))
+    doc.add_paragraph("")
+    doc.add_paragraph("附表")
+    heading = doc.add_paragraph()
+    heading.add_run("附表1 压实度检测结果表（承台回填土）").bold = True
+    appendix = doc.add_table(rows=TEMPLATE_DATA_ROWS + 2, cols=len(APPENDIX_HEADERS))
+    for col, header in enumerate(APPENDIX_HEADERS):
+        appendix.cell(0, col).text = header
+    for tc in appendix._tbl.iter(qn("w:tc")):
+        tc.get_or_add_tcPr().append(parse_xml(f'<w:vAlign {nsdecls("w")} w:val="center"/>'))
+    remark_row = TEMPLATE_DATA_ROWS + 1
+    appendix.cell(remark_row, 0).text = "备注"
+    appendix.cell(remark_row, 1).merge(appendix.cell(remark_row, len(APPENDIX_HEADERS) - 1)).text = REMARK_TEXT
+    doc.save(path)
+    return path
+
+
+def make_inputs(directory, sheets=1, sections=3, **options):
+    """在 directory 下生成一组 (工作簿, 模板) 输入，返回两者路径"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"s{sheets}x{sections}"
+    workbook_path = make_workbook(os.path.join(directory, f"{name}.xlsx"), sheets, sections, **options)
+    template_path = make_template(os.path.join(directory, f"{name}.docx"))
+    return workbook_path, template_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--sections", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    workbook_path, template_path = make_inputs(args.directory, args.sheets, args.sections, seed=args.seed)
+    print(workbook_path)
+    print(template_path)
+
+
+if __name__ == "__main__":
+    main()
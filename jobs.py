@@ -0,0 +1,560 @@
+"""后台报告生成任务队列
+
+/process 只负责保存上传文件并提交任务，生成过程在有界线程池中执行，
+请求线程立即返回任务编号。任务的状态、当前阶段、完成百分比和耗时通过
+PipelineReport 的阶段事件实时更新，供 /status/<job_id> 查询；/download 按任务编号取结果。
+同样的进度以事件序列的形式提供给 /events/<job_id>（SSE），事件按时间节流，
+流水线内的进度回调只做字典更新，不会因为前端订阅而变慢。
+任务记录只保存在当前进程内存中，进程重启后丢失。
+
+执行后端：'process'（默认，支持 fork 的平台）把任务派发给长驻的预热工作进程（见 workers.py），
+'thread' 在本进程的工作线程中执行。两种后端都只开 max_workers 个并发槽位，排队任务超过
+queue_size 时 submit 抛出 JobQueueFull，由调用方返回 503 让客户端稍后重试。
+
+提交时可以附带内容键（submission_key：上传文件内容和选项的哈希）：相同键的任务
+仍在排队或运行时直接合并到该任务，已成功的结果只要还在输出存储中就直接复用。
+结果缓存最多保留 result_cache_size 个内容键，每个键自任务结束起保留 result_cache_ttl 秒。
+
+任务返回的内存结果在完成时写入 OutputStore（见 outputs.py），按任务编号分目录保存，
+由存储的容量上限、有效期和后台清扫统一管理，不再长期占用进程内存。
+"""
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+import queue
+from datetime import datetime
+
+from outputs import OutputStore
+from profiling import PipelineReport, PIPELINE_STAGES
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed')
+FINISHED_STATES = ('succeeded', 'failed')
+
+JOB_BACKENDS = ('process', 'thread')
+
+DEFAULT_MAX_WORKERS = int(os.environ.get('YASHIDU_JOB_WORKERS', str(min(4, os.cpu_count() or 1))))
+DEFAULT_BACKEND = os.environ.get('YASHIDU_JOB_BACKEND') or ('process' if hasattr(os, 'fork') else 'thread')
+DEFAULT_QUEUE_SIZE = int(os.environ.get('YASHIDU_JOB_QUEUE_SIZE', '20'))  # 排队等待的任务上限
+DEFAULT_WORKER_MAX_JOBS = int(os.environ.get('YASHIDU_WORKER_MAX_JOBS', '50'))  # 工作进程处理该数量的任务后重建
+DEFAULT_JOB_TIMEOUT = float(os.environ.get('YASHIDU_JOB_TIMEOUT', '600'))  # 单个任务的最长运行秒数
+DEFAULT_JOB_MAX_RSS_MB = int(os.environ.get('YASHIDU_JOB_MAX_RSS_MB', '1024'))  # 工作进程常驻内存上限
+DEFAULT_MAX_JOBS = 200  # 内存中保留的任务记录上限，超出时丢弃最早结束的任务
+DEFAULT_RESULT_CACHE_SIZE = int(os.environ.get('YASHIDU_RESULT_CACHE_SIZE', '100'))  # 结果缓存的条目上限
+DEFAULT_RESULT_CACHE_TTL = float(os.environ.get('YASHIDU_RESULT_CACHE_TTL', '3600'))  # 结果缓存条目的保留秒数（自任务结束起）
+PROGRESS_EVENT_INTERVAL = 0.25  # 两个进度事件之间的最小间隔（秒），状态变化不受限制
+MAX_BUFFERED_EVENTS = 50  # 每个任务保留的最近事件数，断线重连时按 Last-Event-ID 补发
+
+
+# 按数据组逐个执行的阶段，这一段的进度按已处理数据组数插值
+GROUP_LOOP_STAGES = ('table_build', 'fill', 'row_deletion', 'remarks')
+
+
+def stage_percent(stage, finished=False, progress=None):
+    """按阶段在流水线中的位置估算完成百分比；阶段开始时取该阶段起点，结束时取终点
+
+    处于逐组生成表格的阶段时，用 progress 中的 sections_done / sections_total 在这一段内插值。
+    """
+    if stage not in PIPELINE_STAGES:
+        return None
+    total = len(PIPELINE_STAGES) + 1
+    if progress and stage in GROUP_LOOP_STAGES and progress.get('sections_total'):
+        first = PIPELINE_STAGES.index(GROUP_LOOP_STAGES[0])
+        fraction = min(1.0, progress.get('sections_done', 0) / progress['sections_total'])
+        return int(100 * (first + fraction * len(GROUP_LOOP_STAGES)) / total)
+    position = PIPELINE_STAGES.index(stage) + (1 if finished else 0)
+    return int(100 * position / total)
+
+
+def content_digest(source, chunk_size=1024 * 1024):
+    """输入内容的 sha256：source 为 bytes、文件路径，或上传时已算好摘要的对象（带 sha256 属性）"""
+    if hasattr(source, 'sha256'):
+        return source.sha256
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def submission_key(sources, options=None):
+    """按各输入内容的摘要（按顺序）和选项计算任务内容键；同样的内容无论以哪种形式提交，键都相同"""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(content_digest(source).encode('ascii'))
+        digest.update(b'\0')
+    digest.update(json.dumps(options or {}, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def resolve_target(target):
+    """任务目标可以是函数，也可以是 '模块:函数' 字符串；字符串在执行时才导入，
+    提交任务的进程（Web 进程）因此不必加载流水线的重依赖"""
+    if isinstance(target, str):
+        module_name, _, name = target.partition(':')
+        return getattr(importlib.import_module(module_name), name)
+    return target
+
+
+def remove_paths(paths):
+    """删除文件或目录，不存在时忽略"""
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def report_stages(report):
+    """运行中的报告可能正被工作线程修改，读取失败时返回空列表，下次查询再取"""
+    if report is None:
+        return []
+    try:
+        return report.to_dict()['stages']
+    except RuntimeError:
+        return []
+
+
+class JobQueueFull(Exception):
+    """排队任务数已达上限"""
+
+
+class JobQueue:
+    """有界并发、有界排队的任务队列
+
+    submit 的 target 必须是模块级函数或 '模块:函数' 字符串（process 后端需要按引用传给工作进程），以
+    target(report=..., status_callback=..., template_cache=..., **kwargs) 调用：返回 bytes 时
+    作为结果写入输出存储，否则应把结果写到 output_path；正常返回即视为成功，抛出异常视为失败。
+    工作线程/进程和输出存储的清扫线程在第一次提交时才启动。
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_jobs=DEFAULT_MAX_JOBS, backend=DEFAULT_BACKEND,
+                 queue_size=DEFAULT_QUEUE_SIZE, worker_max_jobs=DEFAULT_WORKER_MAX_JOBS,
+                 job_timeout=DEFAULT_JOB_TIMEOUT, max_rss_mb=DEFAULT_JOB_MAX_RSS_MB, output_store=None,
+                 result_cache_size=DEFAULT_RESULT_CACHE_SIZE, result_cache_ttl=DEFAULT_RESULT_CACHE_TTL):
+        if backend not in JOB_BACKENDS:
+            raise ValueError(f"未知的任务执行后端: {backend}")
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.backend = backend
+        self.queue_size = queue_size
+        self.worker_max_jobs = worker_max_jobs
+        self.job_timeout = job_timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.output_store = output_store or OutputStore()
+        self.result_cache_size = result_cache_size
+        self.result_cache_ttl = result_cache_ttl
+        self._by_key = {}  # 内容键 -> 排队/运行中或已缓存的任务编号
+        self._result_cache = OrderedDict()  # 内容键 -> 成功任务编号，输出是否仍可用以输出存储为准
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._slots = []
+        self._context = None
+        self._template_cache = None
+
+    def start(self):
+        """启动 max_workers 个执行槽位；process 后端同时预先启动工作进程"""
+        with self._lock:
+            if self._slots:
+                return
+            self.output_store.start_sweeper()
+            if self.backend == 'process':
+                from workers import process_context
+                self._context = process_context()
+            else:
+                from _9 import TemplateCache
+                self._template_cache = TemplateCache()
+            for index in range(self.max_workers):
+                slot = threading.Thread(target=self._slot_loop, name=f'yashidu-job-{index}', daemon=True)
+                self._slots.append(slot)
+                slot.start()
+
+    def submit(self, target, kwargs, output_path=None, download_name=None, cleanup_paths=(), cache_key=None):
+        """提交任务，返回 (任务编号, 复用方式)；排队已满时抛出 JobQueueFull
+
+        复用方式为 None（新任务）、'coalesced'（合并到相同内容的进行中任务）或 'cached'
+        （复用缓存的结果）；复用时本次的 cleanup_paths 立即删除。
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'state': 'queued',
+            'stage': None,
+            'percent': 0,
+            'message': None,
+            'error': None,
+            'output_path': output_path,
+            'result': None,  # target 返回的内存结果，完成时转存到输出存储
+            'stored': False,  # 输出是否在输出存储中
+            'cache_key': cache_key,
+            'download_name': download_name or os.path.basename(output_path or 'output.docx'),
+            'cleanup_paths': list(cleanup_paths),
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'report': None,
+            'stages': [],
+            'progress': {},
+            'events': deque(maxlen=MAX_BUFFERED_EVENTS),
+            'event_seq': 0,
+            'last_event_at': 0.0,
+        }
+        with self._lock:
+            if cache_key is not None:
+                # 查找与入队在同一把锁内，两个相同的提交同时到达时只有一个入队
+                reused_job_id, reused = self._find_reusable(cache_key)
+                if reused_job_id is not None:
+                    job = None
+            if job is not None:
+                try:
+                    self._pending.put_nowait((job, target, kwargs))
+                except queue.Full:
+                    raise JobQueueFull(f"排队任务已达上限 {self.queue_size}，请稍后重试")
+                self._jobs[job_id] = job
+                if cache_key is not None:
+                    self._by_key[cache_key] = job_id
+                self._evict()
+        if job is None:
+            remove_paths(cleanup_paths)
+            return reused_job_id, reused
+        return job_id, None
+
+    def _find_reusable(self, cache_key):
+        """查找可复用的任务（调用方持有锁），返回 (任务编号, 复用方式) 或 (None, None)"""
+        job = self._jobs.get(self._by_key.get(cache_key))
+        if job is None:
+            return None, None
+        if job['state'] not in FINISHED_STATES:
+            return job['id'], 'coalesced'
+        self._trim_result_cache()
+        if cache_key in self._result_cache:
+            if self._has_output(job):
+                self._result_cache.move_to_end(cache_key)
+                return job['id'], 'cached'
+            # 输出已被存储淘汰
+            self._drop_result(cache_key)
+        return None, None
+
+    def _has_output(self, job):
+        if job['stored']:
+            return self.output_store.has(job['id'])
+        if job['result'] is not None:
+            return True
+        return bool(job['output_path']) and os.path.exists(job['output_path'])
+
+    def _drop_result(self, key):
+        """移出结果缓存并删除输出（调用方持有锁）"""
+        job_id = self._forget_result(key)
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._discard_output(job)
+
+    def _forget_result(self, key):
+        """只移出结果缓存，不删除输出（调用方持有锁），返回原来的任务编号"""
+        job_id = self._result_cache.pop(key, None)
+        if job_id is not None and self._by_key.get(key) == job_id:
+            del self._by_key[key]
+        return job_id
+
+    def _trim_result_cache(self):
+        """移除超过保留时间的条目，再按最近最少使用移除超出条目上限的部分（调用方持有锁）
+
+        被移除的只是内容键到任务的映射：任务输出仍按输出存储的期限清理，已拿到任务编号的客户端照常下载，
+        之后相同内容的提交重新执行。
+        """
+        if self.result_cache_ttl:
+            now = time.time()
+            for key, job_id in list(self._result_cache.items()):
+                job = self._jobs.get(job_id)
+                if job is None or now - job['finished_at'] > self.result_cache_ttl:
+                    self._forget_result(key)
+        while len(self._result_cache) > self.result_cache_size:
+            self._forget_result(next(iter(self._result_cache)))
+
+    def _discard_output(self, job):
+        job['result'] = None
+        if job['stored']:
+            self.output_store.delete(job['id'])
+        elif job['output_path']:
+            remove_paths([job['output_path']])
+
+    def _evict(self):
+        """超过上限时丢弃最早结束的任务记录（调用方持有锁）"""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job['state'] in FINISHED_STATES]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            cache_key = self._jobs[job_id]['cache_key']
+            if cache_key is not None and self._by_key.get(cache_key) == job_id:
+                self._drop_result(cache_key)
+                self._by_key.pop(cache_key, None)
+            # 记录被丢弃后输出无法再按任务编号下载，一并删除
+            self._discard_output(self._jobs.pop(job_id))
+
+    def _publish(self, job, event_type='progress', force=False):
+        """记录一个进度事件并唤醒订阅者（调用方持有锁）；非强制事件按 PROGRESS_EVENT_INTERVAL 节流"""
+        now = time.monotonic()
+        if not force and now - job['last_event_at'] < PROGRESS_EVENT_INTERVAL:
+            return
+        job['last_event_at'] = now
+        job['event_seq'] += 1
+        data = {
+            'state': job['state'],
+            'stage': job['stage'],
+            'percent': job['percent'],
+            'message': job['message'],
+            'error': job['error'],
+        }
+        data.update(job['progress'])
+        job['events'].append((job['event_seq'], event_type, data))
+        self._changed.notify_all()
+
+    def _slot_loop(self):
+        """一个执行槽位：依次取出排队的任务执行；process 后端在槽位内复用一个工作进程"""
+        worker = None
+        while True:
+            job, target, kwargs = self._pending.get()
+            self._start_job(job)
+            try:
+                if self.backend == 'process':
+                    worker, state, error = self._run_in_process(worker, job, target, kwargs)
+                else:
+                    state, error = self._run_in_thread(job, target, kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                state, error = 'failed', str(e)
+                if worker is not None:
+                    worker.terminate()
+                    worker = None
+            self._finish_job(job, state, error)
+
+    def _record_event(self, job, event, stage, progress, message=None, stages=None):
+        """把一次阶段/进度事件合并进任务状态并按节流发布"""
+        with self._lock:
+            if stage is not None:
+                job['stage'] = stage
+            job['progress'] = progress
+            if message is not None:
+                job['message'] = message
+            if stages is not None:
+                job['stages'] = stages
+            percent = stage_percent(job['stage'], finished=(event == 'stage_end'), progress=progress)
+            if percent is not None:
+                job['percent'] = max(job['percent'], percent)
+            self._publish(job)
+
+    def _run_in_thread(self, job, target, kwargs):
+        report = PipelineReport()
+
+        def on_event(event, name, report):
+            if event != 'finish':
+                self._record_event(job, event, name, dict(report.progress_state))
+
+        def status_callback(message):
+            job['message'] = message
+            print(f"处理状态[{job['id'][:8]}]: {message}")
+
+        report.add_listener(on_event)
+        job['report'] = report
+        try:
+            result = resolve_target(target)(report=report, status_callback=status_callback,
+                                            template_cache=self._template_cache, **kwargs)
+            if isinstance(result, bytes):
+                job['result'] = result
+        except Exception as e:
+            print(f"任务 {job['id']} 执行失败: {e}")
+            traceback.print_exc()
+            return 'failed', str(e)
+        return 'succeeded', None
+
+    def _run_in_process(self, worker, job, target, kwargs):
+        """在工作进程中执行任务，返回 (仍可复用的工作进程或 None, 状态, 错误)"""
+        from workers import WorkerProcess
+        if worker is not None and (not worker.is_alive() or worker.jobs_done >= self.worker_max_jobs):
+            print(f"回收工作进程 {worker.pid}（已处理 {worker.jobs_done} 个任务）")
+            worker.stop()
+            worker = None
+        if worker is None:
+            worker = WorkerProcess(self._context)
+
+        def on_event(event, stage, progress, message, stages):
+            self._record_event(job, event, stage, progress, message, stages)
+
+        ok, error, progress, stages, result = worker.run(target, kwargs, on_event, timeout=self.job_timeout,
+                                                         max_rss_bytes=self.max_rss_bytes)
+        with self._lock:
+            if isinstance(result, bytes):
+                job['result'] = result
+            if progress:
+                job['progress'] = progress
+            if stages:
+                job['stages'] = stages
+        if not worker.is_alive():
+            worker = None
+        if not ok:
+            print(f"任务 {job['id']} 执行失败: {error}")
+            return worker, 'failed', error
+        return worker, 'succeeded', None
+
+    def _start_job(self, job):
+        with self._lock:
+            job['state'] = 'running'
+            job['started_at'] = time.time()
+            self._publish(job, force=True)
+
+    def _finish_job(self, job, state, error):
+        if state == 'succeeded' and job['result'] is not None:
+            try:
+                self.output_store.put(job['id'], job['result'], job['download_name'])
+                job['stored'] = True
+            except OSError as e:
+                traceback.print_exc()
+                state, error = 'failed', f"保存任务输出失败: {e}"
+            job['result'] = None
+        if state == 'succeeded' and not self._has_output(job):
+            state, error = 'failed', f"任务完成但没有输出: {job['output_path'] or '内存结果为空'}"
+        remove_paths(job['cleanup_paths'])
+        with self._lock:
+            job['state'] = state
+            job['error'] = error
+            job['finished_at'] = time.time()
+            if state == 'succeeded':
+                job['percent'] = 100
+            if job['cache_key'] is not None:
+                if state == 'succeeded':
+                    self._result_cache[job['cache_key']] = job['id']
+                    self._result_cache.move_to_end(job['cache_key'])
+                    self._trim_result_cache()
+                elif self._by_key.get(job['cache_key']) == job['id']:
+                    del self._by_key[job['cache_key']]
+            self._publish(job, event_type='done', force=True)
+
+    def events(self, job_id, after=0, heartbeat=15.0):
+        """依次产出任务的 (序号, 事件类型, 数据)，只包含序号大于 after 的事件
+
+        等待超过 heartbeat 秒没有新事件时产出 None，供调用方发送心跳；
+        产出 'done' 事件后结束。任务不存在时直接结束。
+        """
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                pending = [event for event in job['events'] if event[0] > after]
+                if not pending and job['state'] not in FINISHED_STATES:
+                    self._changed.wait(heartbeat)
+                    pending = [event for event in job['events'] if event[0] > after]
+                finished = job['state'] in FINISHED_STATES
+            if not pending:
+                if finished:
+                    return
+                yield None
+                continue
+            for event in pending:
+                yield event
+                after = event[0]
+            if pending[-1][1] == 'done':
+                return
+
+    def wait_finished(self, job_ids, timeout=None):
+        """等待 job_ids 中至少一个任务结束，返回其中已结束（或记录已不存在）的任务编号列表
+
+        超时仍没有任务结束时返回空列表。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                finished = [job_id for job_id in job_ids
+                            if job_id not in self._jobs or self._jobs[job_id]['state'] in FINISHED_STATES]
+                if finished or not job_ids:
+                    return finished
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def output(self, job_id):
+        """返回成功任务的输出信息 {'path', 'name', 'size', 'etag', 'last_modified'}
+
+        任务不存在时返回 None，任务未完成或输出已过期/被淘汰时返回 False。
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job['state'] != 'succeeded':
+                return False
+            snapshot = dict(job)
+        if snapshot['stored']:
+            entry = self.output_store.get(job_id)
+            if entry is None:
+                return False
+            return {'path': entry['path'], 'name': snapshot['download_name'], 'size': entry['size'],
+                    'etag': entry['etag'], 'last_modified': entry['created_at'],
+                    'expires_at': self.output_store.expires_at(entry)}
+        try:
+            stat = os.stat(snapshot['output_path'])
+        except (OSError, TypeError):
+            return False
+        return {'path': snapshot['output_path'], 'name': snapshot['download_name'], 'size': stat.st_size,
+                'etag': None, 'last_modified': stat.st_mtime, 'expires_at': None}
+
+    def status(self, job_id):
+        """返回可直接序列化为 JSON 的任务状态，任务不存在时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+        now = time.time()
+        started_at = snapshot['started_at']
+        finished_at = snapshot['finished_at'] or now
+        report = snapshot['report']
+        return {
+            'job_id': snapshot['id'],
+            'state': snapshot['state'],
+            'stage': snapshot['stage'],
+            'percent': snapshot['percent'],
+            'progress': dict(snapshot['progress']),
+            'message': snapshot['message'],
+            'error': snapshot['error'],
+            'submitted_at': datetime.fromtimestamp(snapshot['submitted_at']).isoformat(timespec='seconds'),
+            'timings': {
+                'queued_ms': round(((started_at or now) - snapshot['submitted_at']) * 1000, 1),
+                'running_ms': None if started_at is None else round((finished_at - started_at) * 1000, 1),
+                'stages': report_stages(report) if report is not None else snapshot['stages'],
+            },
+            'download_name': snapshot['download_name'] if snapshot['state'] == 'succeeded' else None,
+        }
+
+    def summary(self):
+        """各状态的任务数量"""
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job['state']] += 1
+            cached_results = len(self._result_cache)
+        return {'backend': self.backend, 'workers': self.max_workers, 'queued': self._pending.qsize(),
+                'queue_size': self.queue_size, 'jobs': counts,
+                'result_cache': {'entries': cached_results, 'max_entries': self.result_cache_size,
+                                 'ttl': self.result_cache_ttl}, 'outputs': self.output_store.usage()}
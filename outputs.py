@@ -0,0 +1,144 @@
+"""任务输出存储
+
+每个成功任务的输出写入存储根目录下以任务编号命名的独立目录（任务编号是随机的 uuid，
+无法按文件名猜测），同时记录内容哈希（用作 ETag）、大小和生成时间。
+存储按总容量（quota）和有效期（TTL）淘汰：写入时超出容量先淘汰最久未访问的输出，
+后台清扫线程定期删除过期输出，以及根目录下不属于任何记录、超过有效期的遗留目录
+（例如进程重启前留下的输出）。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_OUTPUT_ROOT = os.environ.get('YASHIDU_OUTPUT_DIR') or os.path.join(tempfile.gettempdir(), 'yashidu-outputs')
+DEFAULT_OUTPUT_TTL = float(os.environ.get('YASHIDU_OUTPUT_TTL', '3600'))  # 输出保留秒数
+DEFAULT_OUTPUT_QUOTA_MB = int(os.environ.get('YASHIDU_OUTPUT_QUOTA_MB', '1024'))  # 输出总大小上限
+DEFAULT_SWEEP_INTERVAL = 60  # 后台清扫间隔（秒）
+
+
+class OutputStore:
+    """按任务编号保存输出文件，带容量上限、有效期和后台清扫"""
+
+    def __init__(self, root=DEFAULT_OUTPUT_ROOT, ttl=DEFAULT_OUTPUT_TTL, quota_mb=DEFAULT_OUTPUT_QUOTA_MB,
+                 sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self.root = root
+        self.ttl = ttl
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # 任务编号 -> 记录，按最近访问排序
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def start_sweeper(self):
+        """启动后台清扫线程（重复调用无副作用）"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='yashidu-output-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"清扫输出目录时出错: {e}")
+            time.sleep(self.sweep_interval)
+
+    def put(self, job_id, data, name='output.docx'):
+        """保存一个任务的输出，返回记录；先写临时文件再改名，读者不会看到写了一半的文件"""
+        directory = os.path.join(self.root, job_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'output' + os.path.splitext(name)[1])
+        temp_path = path + '.part'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        now = time.time()
+        entry = {
+            'job_id': job_id,
+            'path': path,
+            'name': name,
+            'size': len(data),
+            'etag': hashlib.sha256(data).hexdigest()[:32],
+            'created_at': now,
+            'accessed_at': now,
+        }
+        with self._lock:
+            self._entries[job_id] = entry
+            evicted = self._enforce_quota()
+        self._remove(evicted)
+        return entry
+
+    def get(self, job_id):
+        """返回未过期的输出记录并刷新访问时间，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return None
+            if time.time() - entry['created_at'] > self.ttl or not os.path.exists(entry['path']):
+                self._entries.pop(job_id)
+                evicted = [entry]
+            else:
+                entry['accessed_at'] = time.time()
+                self._entries.move_to_end(job_id)
+                return dict(entry)
+        self._remove(evicted)
+        return None
+
+    def has(self, job_id):
+        return self.get(job_id) is not None
+
+    def expires_at(self, entry):
+        return entry['created_at'] + self.ttl
+
+    def delete(self, job_id):
+        with self._lock:
+            entry = self._entries.pop(job_id, None)
+        self._remove([entry] if entry else [])
+
+    def usage(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': sum(entry['size'] for entry in self._entries.values()),
+                    'quota_bytes': self.quota_bytes, 'ttl': self.ttl}
+
+    def _enforce_quota(self):
+        """超出容量时按最久未访问淘汰（调用方持有锁），返回被淘汰的记录；最新写入的输出总是保留"""
+        evicted = []
+        total = sum(entry['size'] for entry in self._entries.values())
+        while total > self.quota_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry['size']
+            evicted.append(entry)
+        return evicted
+
+    def sweep(self):
+        """删除过期输出和根目录下超过有效期的遗留目录，返回删除的数量"""
+        now = time.time()
+        with self._lock:
+            expired = [entry for entry in self._entries.values() if now - entry['created_at'] > self.ttl]
+            for entry in expired:
+                del self._entries[entry['job_id']]
+            known = set(self._entries)
+        self._remove(expired)
+        removed = len(expired)
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                directory = os.path.join(self.root, name)
+                if name in known or not os.path.isdir(directory):
+                    continue
+                try:
+                    if now - os.path.getmtime(directory) > self.ttl:
+                        shutil.rmtree(directory, ignore_errors=True)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _remove(self, entries):
+        for entry in entries:
+            shutil.rmtree(os.path.dirname(entry['path']), ignore_errors=True)
@@ -0,0 +1,464 @@
+"""流水线分阶段计时与内存统计
+
+run_excel_to_word_automation 把处理过程划分为若干命名阶段，每个阶段记录
+墙钟时间、CPU 时间和 tracemalloc 峰值（可选），同一阶段多次进入时累加。
+驱动开销的数量（工作表、数据组、分组、行、表格、段落）一并记录在 counts 中。
+OperationCounter 可选地统计 python-docx/lxml 热点操作在各阶段的调用次数，
+DeepProfiler 可选地为单个任务导出函数级剖析结果。
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# 阶段名称按流水线顺序排列，报告中的阶段也按此顺序输出
+PIPELINE_STAGES = [
+    'workbook_load',         # 加载工作簿和 Word 模板
+    'section_discovery',     # 探测每个工作表的数据组范围
+    'extraction',            # 读取数据组和合并比较值
+    'grouping',              # 合并分组
+    'template_discovery',    # 查找附表1及其表格模板
+    'table_build',           # 生成新附表标题和空表格
+    'fill',                  # 填充数据和更新标题
+    'row_deletion',          # 删除空/0.0行
+    'remarks',               # 备注行处理
+    'save',                  # 保存并验证输出文件
+    'summary_table',         # 表2 汇总表
+    'conclusion_paragraphs', # 结论段落
+    'post_passes',           # g/cm3 上标、附表标题字体、空白段落清理
+]
+
+
+class PipelineReport:
+    """一次流水线运行的阶段报告
+
+    trace_memory 为 True 时使用 tracemalloc 记录每个阶段的内存峰值（会明显拖慢运行，
+    默认关闭）。阶段不应嵌套；同名阶段多次进入时时间累加、峰值取最大。
+    add_listener 注册的回调在阶段开始/结束时以 (事件, 阶段名, 报告) 调用，
+    事件为 'stage_start'、'stage_end'、'progress' 或 'finish'，用于后台任务上报进度；
+    进度字段（已处理数据组、已生成表格、已写入字节数等）保存在 progress_state 中。
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counts = {}
+        self.current_stage = None
+        self.operations = None  # 启用操作计数时为 OperationCounter
+        self.listeners = []
+        self.progress_state = {}
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @contextmanager
+    def stage(self, name):
+        """统计一个阶段的耗时与内存峰值"""
+        record = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'peak_bytes': None})
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+        else:
+            base_memory = None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self.current_stage = name
+        self._notify('stage_start', name)
+        try:
+            yield record
+        finally:
+            self.current_stage = None
+            record['wall'] += time.perf_counter() - wall_start
+            record['cpu'] += time.process_time() - cpu_start
+            record['calls'] += 1
+            if base_memory is not None and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1] - base_memory
+                record['peak_bytes'] = max(record['peak_bytes'] or 0, peak)
+            self._notify('stage_end', name)
+
+    def progress(self, **fields):
+        """更新进度字段并通知监听者；没有监听者时只是一次字典更新"""
+        self.progress_state.update(fields)
+        if self.listeners:
+            self._notify('progress', self.current_stage)
+
+    def add_listener(self, callback):
+        """注册阶段事件回调，回调中的异常不会影响流水线"""
+        self.listeners.append(callback)
+
+    def _notify(self, event, name):
+        for callback in self.listeners:
+            try:
+                callback(event, name, self)
+            except Exception:
+                pass
+
+    def count(self, name, amount=1):
+        """累加一个计数"""
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def set_count(self, name, value):
+        self.counts[name] = value
+
+    def finish(self):
+        """结束统计，记录总耗时；由本报告启动的 tracemalloc 在此停止"""
+        self.total_wall = time.perf_counter() - self._wall_start
+        self.total_cpu = time.process_time() - self._cpu_start
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._notify('finish', None)
+        return self
+
+    def ordered_stage_names(self):
+        known = [name for name in PIPELINE_STAGES if name in self.stages]
+        return known + [name for name in self.stages if name not in PIPELINE_STAGES]
+
+    def to_dict(self):
+        stages = []
+        for name in self.ordered_stage_names():
+            record = self.stages[name]
+            stages.append({
+                'name': name,
+                'wall_ms': round(record['wall'] * 1000, 3),
+                'cpu_ms': round(record['cpu'] * 1000, 3),
+                'calls': record['calls'],
+                'peak_kb': None if record['peak_bytes'] is None else round(record['peak_bytes'] / 1024, 1),
+            })
+        result = {
+            'started_at': self.started_at,
+            'total_wall_ms': round(self.total_wall * 1000, 3),
+            'total_cpu_ms': round(self.total_cpu * 1000, 3),
+            'trace_memory': self.trace_memory,
+            'stages': stages,
+            'counts': dict(self.counts),
+        }
+        if self.operations is not None:
+            result['operations'] = self.operations.to_list()
+        return result
+
+    def write_json(self, path):
+        """把报告写为 JSON 文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def format_table(self):
+        """格式化为便于阅读的文本表格"""
+        lines = [f"{'阶段':<24}{'墙钟ms':>12}{'CPU ms':>12}{'次数':>8}{'峰值KB':>12}"]
+        for stage in self.to_dict()['stages']:
+            peak = '-' if stage['peak_kb'] is None else f"{stage['peak_kb']:.1f}"
+            lines.append(f"{stage['name']:<24}{stage['wall_ms']:>12.1f}{stage['cpu_ms']:>12.1f}{stage['calls']:>8}{peak:>12}")
+        lines.append(f"{'total':<24}{self.total_wall * 1000:>12.1f}{self.total_cpu * 1000:>12.1f}")
+        if self.counts:
+            lines.append("计数: " + ", ".join(f"{name}={value}" for name, value in self.counts.items()))
+        return "\n".join(lines)
+
+
+def report_stage(report, name):
+    """report 为 None 时返回空上下文，便于在可选报告的函数中统一书写"""
+    if report is None:
+        return nullcontext()
+    return report.stage(name)
+
+
+def report_progress(report, **fields):
+    """report 为 None 时忽略进度"""
+    if report is not None:
+        report.progress(**fields)
+
+
+def default_report_path(output_path):
+    """报告 JSON 默认写在输出文件旁边"""
+    return os.path.splitext(output_path)[0] + '.report.json'
+
+
+# 操作计数：运行期间临时替换 python-docx/lxml 的热点入口，按“阶段 × 操作 × 调用位置”计数。
+# 替换是进程级的，只用于单个任务的诊断，不要在并发处理多个任务时启用。
+_COUNTER_SKIP_PATHS = (os.sep + 'docx' + os.sep, os.sep + 'lxml' + os.sep, os.path.abspath(__file__))
+
+
+def caller_site():
+    """返回第一个不在 python-docx/lxml/本模块内的调用位置，如 '_9.py:812 run_excel_to_word_automation'"""
+    frame = sys._getframe(1)
+    while frame is not None and any(path in frame.f_code.co_filename for path in _COUNTER_SKIP_PATHS):
+        frame = frame.f_back
+    if frame is None:
+        return '-'
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class OperationCounter:
+    """统计一次运行中的热点操作
+
+    计数的操作：doc.paragraphs / doc.tables（每次重建代理列表）、Table.cell 与 Table._cells
+    （每次重建单元格网格）、etree.tostring / etree.fromstring（序列化再解析）、
+    按字符串调用的 .xpath()（每次编译）、预编译 XPATH 表达式的调用和 doc.save（重写整个文件）。
+    """
+
+    def __init__(self, report, xpath_registry=None, call_sites=True):
+        self.report = report
+        self.xpath_registry = xpath_registry
+        self.call_sites = call_sites
+        self.counts = {}
+        self._restore = []
+
+    def record(self, operation):
+        key = (self.report.current_stage or '-', operation, caller_site() if self.call_sites else '-')
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _wrap_function(self, owner, name, operation):
+        """owner 可以是类、模块或字典（如 XPATH 注册表）"""
+        if isinstance(owner, dict):
+            original = owner[name]
+        elif isinstance(owner, type):
+            original = owner.__dict__[name]
+        else:
+            original = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            self.record(operation)
+            return original(*args, **kwargs)
+
+        if isinstance(owner, dict):
+            owner[name] = wrapper
+        else:
+            setattr(owner, name, wrapper)
+        self._restore.append((owner, name, original))
+
+    def _wrap_property(self, owner, name, operation):
+        original = owner.__dict__[name]
+
+        def getter(instance):
+            self.record(operation)
+            return original.fget(instance)
+
+        setattr(owner, name, property(getter, original.fset, original.fdel, original.__doc__))
+        self._restore.append((owner, name, original))
+
+    def install(self):
+        from lxml import etree
+        from docx.document import Document
+        from docx.table import Table
+        from docx.oxml.xmlchemy import BaseOxmlElement
+
+        self._wrap_property(Document, 'paragraphs', 'doc.paragraphs')
+        self._wrap_property(Document, 'tables', 'doc.tables')
+        self._wrap_function(Document, 'save', 'doc.save')
+        self._wrap_function(Table, 'cell', 'Table.cell')
+        self._wrap_property(Table, '_cells', 'Table._cells 网格重建')
+        self._wrap_function(etree, 'tostring', 'etree.tostring')
+        self._wrap_function(etree, 'fromstring', 'etree.fromstring')
+        self._wrap_function(BaseOxmlElement, 'xpath', '.xpath() 字符串')
+        if self.xpath_registry is not None:
+            for name in list(self.xpath_registry):
+                self._wrap_function(self.xpath_registry, name, f"XPATH['{name}']")
+        self.report.operations = self
+        return self
+
+    def uninstall(self):
+        while self._restore:
+            owner, name, original = self._restore.pop()
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def totals(self, by_site=False):
+        """按 (阶段, 操作) 或 (阶段, 操作, 调用位置) 汇总"""
+        totals = {}
+        for (stage, operation, site), count in self.counts.items():
+            key = (stage, operation, site) if by_site else (stage, operation)
+            totals[key] = totals.get(key, 0) + count
+        return totals
+
+    def to_list(self):
+        return [{'stage': stage, 'operation': operation, 'site': site, 'count': count}
+                for (stage, operation, site), count in sorted(self.counts.items(), key=lambda item: -item[1])]
+
+    def format_top(self, limit=15):
+        """按调用次数排序的热点表"""
+        rows = sorted(self.totals(by_site=True).items(), key=lambda item: -item[1])[:limit]
+        lines = [f"{'次数':>8}  {'阶段':<22}{'操作':<26}调用位置"]
+        for (stage, operation, site), count in rows:
+            lines.append(f"{count:>8}  {stage:<22}{operation:<26}{site}")
+        return "\n".join(lines)
+
+
+# 深度剖析：deterministic 使用 cProfile 记录每次函数调用；sampling 由后台线程定时
+# 采样目标线程的调用栈，开销低，适合在生产环境复现慢任务。两种模式都把结果写到
+# 单个任务的产物目录：profile.pstats（仅 deterministic）、flamegraph.json
+# （d3-flame-graph 的 {name, value, children} 格式）、stacks.folded（flamegraph.pl 的折叠栈格式）
+# 和 summary.txt。
+PROFILE_MODES = ('deterministic', 'sampling')
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def stacks_to_flame_tree(stacks, root_name='all'):
+    """把 {(根..叶): 值} 转换为 {name, value, children} 树"""
+    root = {'name': root_name, 'value': 0, 'children': {}}
+    for stack, value in stacks.items():
+        root['value'] += value
+        node = root
+        for name in stack:
+            node = node['children'].setdefault(name, {'name': name, 'value': 0, 'children': {}})
+            node['value'] += value
+
+    def finalize(node):
+        return {'name': node['name'], 'value': node['value'],
+                'children': [finalize(child) for child in sorted(node['children'].values(), key=lambda n: -n['value'])]}
+
+    return finalize(root)
+
+
+def pstats_to_flame_tree(stats, max_depth=40, min_fraction=0.001):
+    """按 pstats 的调用者关系展开火焰图树，值为累计秒数（近似，与 flameprof 的做法相同）"""
+    callees = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    roots = {func: entry[3] for func, entry in stats.stats.items() if not entry[4]}
+    total = sum(roots.values()) or 1.0
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def expand(func, value, path, depth):
+        children = []
+        if depth < max_depth:
+            for child, child_value in sorted(callees.get(func, {}).items(), key=lambda item: -item[1]):
+                if child in path or child_value < total * min_fraction:
+                    continue
+                children.append(expand(child, min(child_value, value), path | {child}, depth + 1))
+        return {'name': label(func), 'value': round(value, 6), 'children': children}
+
+    return {'name': 'all', 'value': round(total, 6),
+            'children': [expand(func, value, {func}, 1) for func, value in sorted(roots.items(), key=lambda item: -item[1])]}
+
+
+class SamplingProfiler:
+    """后台线程按固定间隔采样目标线程的调用栈"""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        import threading
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='yashidu-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class DeepProfiler:
+    """一次任务的函数级剖析，mode 为 'deterministic' 或 'sampling'"""
+
+    def __init__(self, mode='deterministic', interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"未知的剖析模式: {mode}，可选 {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self._profiler = None
+
+    def start(self):
+        if self.mode == 'deterministic':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(self.interval)
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        if self.mode == 'deterministic':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        return self
+
+    def write(self, directory):
+        """把剖析结果写到 directory，返回 {产物名: 路径}"""
+        import io
+        import pstats
+        os.makedirs(directory, exist_ok=True)
+        artifacts = {}
+        summary = io.StringIO()
+        if self.mode == 'deterministic':
+            artifacts['pstats'] = os.path.join(directory, 'profile.pstats')
+            self._profiler.dump_stats(artifacts['pstats'])
+            stats = pstats.Stats(self._profiler, stream=summary)
+            stats.sort_stats('cumulative').print_stats(40)
+            flame_tree = pstats_to_flame_tree(stats)
+        else:
+            stacks = self._profiler.stacks
+            artifacts['folded'] = os.path.join(directory, 'stacks.folded')
+            with open(artifacts['folded'], 'w', encoding='utf-8') as f:
+                for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                    f.write(";".join(name.replace(';', ',') for name in stack) + f" {count}\n")
+            flame_tree = stacks_to_flame_tree(stacks)
+            summary.write(f"采样间隔 {self.interval * 1000:.1f} ms，共 {self._profiler.samples} 个样本\n\n")
+            leaf_counts = {}
+            for stack, count in stacks.items():
+                if stack:
+                    leaf_counts[stack[-1]] = leaf_counts.get(stack[-1], 0) + count
+            for name, count in sorted(leaf_counts.items(), key=lambda item: -item[1])[:40]:
+                summary.write(f"{count:>8}  {name}\n")
+        artifacts['flamegraph'] = os.path.join(directory, 'flamegraph.json')
+        with open(artifacts['flamegraph'], 'w', encoding='utf-8') as f:
+            json.dump(flame_tree, f, ensure_ascii=False)
+        artifacts['summary'] = os.path.join(directory, 'summary.txt')
+        with open(artifacts['summary'], 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        return artifacts
+
+
+def default_profile_dir(output_path):
+    """剖析产物默认写在输出文件旁边的 <输出名>.profile-<时间戳>-<进程号>-<随机后缀> 目录
+
+    内存模式的任务共用同一个输出名，同一秒内并发的任务（包括同一进程中的多个工作线程）各自使用独立目录。
+    """
+    return (os.path.splitext(output_path)[0] + '.profile-' + datetime.now().strftime('%Y%m%d-%H%M%S')
+            + f'-{os.getpid()}-{uuid.uuid4().hex[:8]}')
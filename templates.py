@@ -0,0 +1,132 @@
+"""已注册的 Word 模板
+
+模板注册一次即可在之后的 /process、/batch 请求中按编号引用，不必每次重新上传。
+注册时检查文件结构并用 compile_template 预编译（附表1段落和表格的位置、备注行位置、标题字体，
+并检查报告锚点），模板缺少必需部分时直接拒绝，不会等到任务执行时才失败。
+模板文件和预编译结果按内容摘要保存在注册目录（<编号>.docx / <编号>.json），同一份模板
+重复注册得到同一个编号；目录可由多个 Web 进程和工作进程共享。工作进程的 TemplateCache 以
+模板摘要为键缓存解析好的文档，跨请求复用。
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+
+DEFAULT_TEMPLATE_ROOT = os.environ.get('YASHIDU_TEMPLATE_DIR') or os.path.join(tempfile.gettempdir(), 'yashidu-templates')
+TEMPLATE_ID_LENGTH = 16  # 模板编号：内容 sha256 的前 16 位
+TEMPLATE_ID_PATTERN = re.compile(r'^[0-9a-f]{%d}$' % TEMPLATE_ID_LENGTH)
+
+
+class TemplateError(Exception):
+    """模板无效或不存在"""
+
+
+class TemplateRegistry:
+    """按内容摘要保存模板文件及其预编译结果"""
+
+    def __init__(self, root=DEFAULT_TEMPLATE_ROOT):
+        self.root = root
+        self._entries = {}  # 模板编号 -> 元数据（注册目录中 .json 的内存副本）
+        self._lock = threading.Lock()
+
+    def _paths(self, template_id):
+        if not TEMPLATE_ID_PATTERN.match(template_id or ''):
+            raise TemplateError(f"无效的模板编号: {template_id}")
+        base = os.path.join(self.root, template_id)
+        return base + '.docx', base + '.json'
+
+    def register(self, data, name=None):
+        """注册模板，返回 (元数据, 是否新注册)；模板无效时抛出 TemplateError"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        template_id = sha256[:TEMPLATE_ID_LENGTH]
+        existing = self.get(template_id)
+        if existing is not None:
+            return existing, False
+
+        # 预编译需要 python-docx，只在注册时才导入
+        from _9 import compile_template, open_docx
+        try:
+            compiled = compile_template(open_docx(io.BytesIO(data)))
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            raise TemplateError(f"模板无效: {e}")
+        compiled['sha256'] = sha256
+        entry = {
+            'template_id': template_id,
+            'name': name or f"{template_id}.docx",
+            'size': len(data),
+            'sha256': sha256,
+            'registered_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'compiled': compiled,
+        }
+        docx_path, json_path = self._paths(template_id)
+        os.makedirs(self.root, exist_ok=True)
+        # 先写临时文件再改名，其他进程不会读到写了一半的模板；临时文件名唯一，并发注册同一模板互不干扰
+        for path, content in ((docx_path, data),
+                              (json_path, json.dumps(entry, ensure_ascii=False, indent=2).encode('utf-8'))):
+            fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=template_id, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+            except Exception:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+        with self._lock:
+            self._entries[template_id] = entry
+        return entry, True
+
+    def get(self, template_id):
+        """返回模板元数据，不存在时返回 None"""
+        docx_path, json_path = self._paths(template_id)
+        with self._lock:
+            entry = self._entries.get(template_id)
+        if entry is not None and os.path.exists(docx_path):
+            return entry
+        try:
+            with open(json_path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(docx_path):
+            return None
+        with self._lock:
+            self._entries[template_id] = entry
+        return entry
+
+    def path(self, template_id):
+        return self._paths(template_id)[0]
+
+    def list(self):
+        """所有已注册模板的元数据，按注册时间排序"""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for filename in os.listdir(self.root):
+            template_id, extension = os.path.splitext(filename)
+            if extension == '.json' and TEMPLATE_ID_PATTERN.match(template_id):
+                entry = self.get(template_id)
+                if entry is not None:
+                    entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['registered_at'])
+
+    def delete(self, template_id):
+        """删除模板，返回是否存在"""
+        docx_path, json_path = self._paths(template_id)
+        with self._lock:
+            self._entries.pop(template_id, None)
+        existed = False
+        for path in (docx_path, json_path):
+            try:
+                os.remove(path)
+                existed = True
+            except OSError:
+                pass
+        return existed
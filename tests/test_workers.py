@@ -0,0 +1,40 @@
+"""WorkerProcess 的超时终止"""
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workers import WorkerProcess  # noqa: E402
+
+
+def chatty_target(report=None, status_callback=None, template_cache=None, duration=30.0):
+    """在 duration 秒内不断切换阶段，每次切换都会向父进程发送一个事件"""
+    deadline = time.monotonic() + duration
+    index = 0
+    while time.monotonic() < deadline:
+        with report.stage(f'stage_{index % 2}'):
+            time.sleep(0.05)
+        index += 1
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="需要 fork 启动方式")
+def test_timeout_terminates_worker_that_keeps_sending_events():
+    worker = WorkerProcess(multiprocessing.get_context('fork'), modules=[])
+    events = []
+    started = time.monotonic()
+    try:
+        ok, error, _, _, _ = worker.run(chatty_target, {}, lambda *event: events.append(event), timeout=1.0)
+    finally:
+        if worker.is_alive():
+            worker.terminate()
+    elapsed = time.monotonic() - started
+
+    assert not ok
+    assert "任务超时" in error
+    assert events, "任务在超时前应当持续发送事件"
+    assert elapsed < 5.0
+    assert not worker.is_alive()
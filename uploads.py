@@ -0,0 +1,129 @@
+"""流式上传：multipart 解析时边接收边计算摘要、检查文件结构
+
+UploadRequest 替换 Flask 的请求类，上传文件不再由 werkzeug 先整体缓冲，而是直接写入
+SpooledUpload：写入时更新 sha256 摘要，收到开头几个字节就检查是否为 ZIP 容器
+（.xlsx / .docx / .zip），格式不对立即中止解析；小于 SPOOL_MEMORY_BYTES 的上传保留在内存中，
+超过后转存到本次请求的独立目录，单个请求占用的内存因此与上传大小无关。
+解析结束后 validate() 只读取 ZIP 中央目录，确认工作簿/模板包含必需的部件。
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+
+from flask import Request
+
+MAX_UPLOAD_MB = int(os.environ.get('YASHIDU_MAX_UPLOAD_MB', '16'))  # 单个请求的上传大小上限
+SPOOL_MEMORY_BYTES = int(float(os.environ.get('YASHIDU_UPLOAD_SPOOL_MB', '4')) * 1024 * 1024)  # 超过后转存到磁盘
+UPLOAD_ROOT = os.environ.get('YASHIDU_UPLOAD_DIR') or os.path.join(tempfile.gettempdir(), 'yashidu-uploads')
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+# 扩展名 -> 必需的 ZIP 部件
+REQUIRED_PARTS = {
+    '.xlsx': ('[Content_Types].xml', 'xl/workbook.xml'),
+    '.docx': ('[Content_Types].xml', 'word/document.xml'),
+    '.zip': (),
+}
+
+
+class UploadError(Exception):
+    """上传文件格式不正确（不继承 ValueError：werkzeug 解析表单时会静默吞掉 ValueError）"""
+
+
+class SpooledUpload:
+    """可写可读的上传缓冲：先写内存，超过 max_memory 后转存为 directory 下的文件"""
+
+    def __init__(self, filename, directory_factory, max_memory=SPOOL_MEMORY_BYTES):
+        self.filename = filename or ''
+        self.extension = os.path.splitext(self.filename)[1].lower()
+        self.size = 0
+        self.path = None
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._directory_factory = directory_factory
+        self._max_memory = max_memory
+        self._file = io.BytesIO()
+
+    def write(self, data):
+        if len(self._head) < len(ZIP_MAGIC):
+            self._head += bytes(data[:len(ZIP_MAGIC) - len(self._head)])
+            if self.extension in REQUIRED_PARTS and not ZIP_MAGIC.startswith(self._head):
+                raise UploadError(f"{self.filename} 不是有效的 {self.extension} 文件")
+        self._digest.update(data)
+        self.size += len(data)
+        written = self._file.write(data)
+        if self.path is None and self.size > self._max_memory:
+            self._rollover()
+        return written
+
+    def _rollover(self):
+        directory = self._directory_factory()
+        self.path = os.path.join(directory, f"{uuid.uuid4().hex}{self.extension}")
+        spooled = open(self.path, 'w+b')
+        spooled.write(self._file.getvalue())
+        self._file = spooled
+
+    def __getattr__(self, name):
+        # read / readline / seek / tell / flush / close 等直接交给当前的缓冲
+        return getattr(self._file, name)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def validate(self):
+        """上传结束后检查：内容不为空、是完整的 ZIP、包含该类型必需的部件"""
+        if len(self._head) < len(ZIP_MAGIC) and self.extension in REQUIRED_PARTS:
+            raise UploadError(f"{self.filename} 为空或不完整")
+        if self.extension not in REQUIRED_PARTS:
+            return
+        self._file.seek(0)
+        try:
+            names = set(zipfile.ZipFile(self._file).namelist())
+        except zipfile.BadZipFile:
+            raise UploadError(f"{self.filename} 不是有效的 {self.extension} 文件")
+        missing = [part for part in REQUIRED_PARTS[self.extension] if part not in names]
+        if missing:
+            raise UploadError(f"{self.filename} 缺少 {', '.join(missing)}，不是有效的 {self.extension} 文件")
+        self._file.seek(0)
+
+    def job_source(self):
+        """提交给任务的输入：仍在内存中时为 bytes，已转存时为文件路径"""
+        if self.path is None:
+            return self._file.getvalue()
+        self._file.flush()
+        return self.path
+
+
+class UploadRequest(Request):
+    """上传文件写入 SpooledUpload 的请求类"""
+
+    upload_dir = None  # 本次请求的转存目录，第一次需要时才创建
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(filename, self.ensure_upload_dir)
+
+    def ensure_upload_dir(self):
+        if self.upload_dir is None:
+            self.upload_dir = os.path.join(UPLOAD_ROOT, uuid.uuid4().hex)
+            os.makedirs(self.upload_dir, exist_ok=True)
+        return self.upload_dir
+
+    def discard_uploads(self):
+        """删除本次请求的转存目录（未提交任务或任务不再需要时调用）"""
+        if self.upload_dir is not None:
+            shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+
+def uploaded_file(request, field):
+    """取出表单中的上传文件并完成结构检查，返回 SpooledUpload"""
+    storage = request.files.get(field)
+    if storage is None or not storage.filename:
+        raise UploadError(f"缺少上传文件: {field}")
+    upload = storage.stream
+    upload.validate()
+    return upload
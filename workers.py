@@ -0,0 +1,178 @@
+"""长驻的报告生成工作进程
+
+每个工作进程在启动时（forkserver 预加载，或 spawn 后的初始化）导入 _9 及其依赖，
+并持有一份 TemplateCache，之后通过管道逐个接收任务执行，避免多个任务在同一进程里争抢 GIL。
+父进程一侧的 WorkerProcess 负责派发任务、转发阶段/进度事件，并在任务超时或
+常驻内存（RSS）超限时终止工作进程；工作进程处理满 max_jobs 个任务后由父进程回收重建，
+以限制内存增长。
+"""
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# 工作进程启动时预先导入的模块
+PRELOAD_MODULES = ['_9', 'openpyxl', 'docx', 'lxml.etree', 'profiling']
+
+# 工作进程向父进程转发进度事件的最小间隔（秒），阶段变化不受限制
+WORKER_EVENT_INTERVAL = 0.1
+
+_template_cache = None
+
+
+def worker_template_cache():
+    """当前进程的模板缓存（每个工作进程一份）"""
+    global _template_cache
+    if _template_cache is None:
+        from _9 import TemplateCache
+        _template_cache = TemplateCache()
+    return _template_cache
+
+
+def preload(modules=PRELOAD_MODULES):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"预加载模块 {name} 失败: {e}")
+
+
+def process_context():
+    """优先使用 forkserver：服务进程预加载模块后再 fork 出工作进程，既省去重复导入，
+    又不会从多线程的 Flask 进程直接 fork；不支持时（Windows）使用 spawn"""
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def read_rss_bytes(pid):
+    """读取进程的常驻内存；无法读取（非 Linux）时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def worker_main(conn, modules):
+    """工作进程主循环：接收 (target, kwargs)，执行后回传 ('done', 是否成功, 错误, 进度, 阶段耗时, 结果)
+
+    target 返回 bytes 时作为内存结果随 'done' 消息回传，否则结果为 None。
+    """
+    preload(modules)
+    from jobs import resolve_target
+    from profiling import PipelineReport
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if task is None:
+            return
+        target, kwargs = task
+        report = PipelineReport()
+        state = {'last_sent': 0.0, 'stage': None, 'message': None}
+
+        def on_event(event, name, report):
+            if event == 'finish':
+                return
+            now = time.monotonic()
+            stage_changed = name is not None and name != state['stage']
+            if name is not None:
+                state['stage'] = name
+            if not stage_changed and now - state['last_sent'] < WORKER_EVENT_INTERVAL:
+                return
+            state['last_sent'] = now
+            conn.send(('event', event, state['stage'], dict(report.progress_state), state['message'],
+                       report.to_dict()['stages']))
+
+        def status_callback(message):
+            state['message'] = message
+            print(f"处理状态[{os.getpid()}]: {message}")
+
+        report.add_listener(on_event)
+        result = None
+        try:
+            result = resolve_target(target)(report=report, status_callback=status_callback,
+                                            template_cache=worker_template_cache(), **kwargs)
+            ok, error = True, None
+        except Exception as e:
+            traceback.print_exc()
+            ok, error = False, str(e)
+        sys.stdout.flush()
+        conn.send(('done', ok, error, dict(report.progress_state), report.to_dict()['stages'],
+                   result if isinstance(result, bytes) else None))
+
+
+class WorkerProcess:
+    """父进程一侧的工作进程句柄"""
+
+    def __init__(self, context, modules=PRELOAD_MODULES):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_conn, modules), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def run(self, target, kwargs, on_event, timeout=None, max_rss_bytes=None, poll_interval=0.2):
+        """执行一个任务，阻塞直到完成；返回 (是否成功, 错误, 进度, 阶段耗时, 内存结果)
+
+        超时或内存超限时终止工作进程并返回失败，调用方需要丢弃这个句柄。
+        """
+        self.conn.send((target, kwargs))
+        started = time.monotonic()
+        while True:
+            if self.conn.poll(poll_interval):
+                try:
+                    message = self.conn.recv()
+                except EOFError:
+                    return False, f"工作进程意外退出（退出码 {self.process.exitcode}）", {}, [], None
+                if message[0] != 'event':
+                    self.jobs_done += 1
+                    return message[1:]
+                # 事件之后同样检查超时和内存：持续发送事件的任务不能因此逃过终止
+                on_event(*message[1:])
+            if not self.process.is_alive():
+                return False, f"工作进程意外退出（退出码 {self.process.exitcode}）", {}, [], None
+            if timeout and time.monotonic() - started > timeout:
+                self.terminate()
+                return False, f"任务超时（超过 {timeout} 秒）", {}, [], None
+            if max_rss_bytes:
+                rss = read_rss_bytes(self.pid)
+                if rss is not None and rss > max_rss_bytes:
+                    self.terminate()
+                    return False, f"任务内存超限（{rss // (1024 * 1024)}MB > {max_rss_bytes // (1024 * 1024)}MB）", {}, [], None
+
+    def stop(self, timeout=5):
+        """通知工作进程退出，超时未退出则强制终止"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.terminate()
+        self.conn.close()
+
+    def terminate(self):
+        self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()